@@ -1,12 +1,13 @@
 from datetime import timedelta
+from typing import Union
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.security import create_access_token, create_refresh_token
 from app.core.rate_limit import rate_limit
-from app.db.database import get_db
-from app.schemas.token import Token, RefreshTokenRequest, TokenRevoke
+from app.db.database import get_audit_db, get_db, unit_of_work
+from app.schemas.token import Token, TwoFactorChallenge, RefreshTokenRequest, TokenRevoke
 from app.schemas.user import UserLogin, UserCreate, User
 from app.schemas.password_reset import PasswordResetRequest, PasswordReset
 from app.services import user as user_service
@@ -16,54 +17,45 @@ from app.services.email_verification import email_verification_service
 from app.services.password_reset import password_reset_service
 from app.services.two_factor_auth import two_factor_auth_service
 from app.services.device_management import device_management_service
-from app.api.deps import get_current_user
+from app.services.risk import risk_service
+from app.api.deps import get_current_user, get_pending_2fa_user
 
 router = APIRouter()
 
 
+DUPLICATE_FIELD_MESSAGES = {
+    "email": "Email already registered",
+    "username": "Username already registered",
+    "phone": "Phone number already registered",
+}
+
+
 @router.post("/register", response_model=User, dependencies=[Depends(rate_limit(max_requests=3, window_seconds=300))])
 async def register(
     user_in: UserCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    # Check email
-    user = await user_service.get_user_by_email(db, email=str(user_in.email))
-    if user:
-        raise HTTPException(
-            status_code=400,
-            detail="Email already registered"
-        )
-    
-    # Check username
-    user = await user_service.get_user_by_username(db, username=user_in.username)
-    if user:
+    # email/username/phone conflicts surface as DuplicateUserError
+    try:
+        user = await user_service.create_user(db=db, user=user_in)
+    except user_service.DuplicateUserError as e:
         raise HTTPException(
             status_code=400,
-            detail="Username already registered"
+            detail=DUPLICATE_FIELD_MESSAGES[e.field]
         )
     
-    # Check phone if provided
-    if user_in.phone:
-        user = await user_service.get_user_by_phone(db, phone=user_in.phone)
-        if user:
-            raise HTTPException(
-                status_code=400,
-                detail="Phone number already registered"
-            )
-    
-    user = await user_service.create_user(db=db, user=user_in)
-    
     # Send verification email
     await email_verification_service.send_verification_email(db, user.id)
     
     return user
 
 
-@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit(max_requests=5, window_seconds=60))])
+@router.post("/login", response_model=Union[Token, TwoFactorChallenge], dependencies=[Depends(rate_limit(max_requests=5, window_seconds=60))])
 async def login(
     user_credentials: UserLogin,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    audit_db: AsyncSession = Depends(get_audit_db)
 ):
     # Get device info
     client_host = request.client.host if request.client else "Unknown"
@@ -77,8 +69,9 @@ async def login(
         # Record failed login attempt
         user_by_email = await user_service.get_user_by_email(db, str(user_credentials.email))
         if user_by_email:
+            risk_service.record_failure(user_by_email.id)
             await device_management_service.record_login_attempt(
-                db=db,
+                db=audit_db,
                 user_id=user_by_email.id,
                 ip_address=client_host,
                 user_agent=user_agent,
@@ -92,75 +85,98 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Register device
-    device = await device_management_service.register_device(
-        db=db,
-        user_id=user.id,
-        user_agent=user_agent,
-        ip_address=client_host
-    )
-    
-    # Check if 2FA is enabled
-    is_2fa_enabled = await two_factor_auth_service.is_2fa_enabled(db, user.id)
-    if is_2fa_enabled:
-        # Return a partial token that requires 2FA verification
-        partial_token = create_access_token(
-            data={"sub": str(user.id), "requires_2fa": True},
-            expires_delta=timedelta(minutes=5)  # Short expiry for 2FA verification
+    # Everything below runs in a single transaction and commits once
+    async with unit_of_work(db):
+        # Register device
+        device = await device_management_service.register_device(
+            db=db,
+            user_id=user.id,
+            user_agent=user_agent,
+            ip_address=client_host
         )
         
-        # Record login attempt (pending 2FA)
+        risk = await risk_service.assess(audit_db, user.id, device, client_host)
+        if risk.blocked:
+            await device_management_service.record_login_attempt(
+                db=audit_db,
+                user_id=user.id,
+                ip_address=client_host,
+                user_agent=user_agent,
+                login_method="password",
+                status="blocked",
+                failure_reason="high_risk",
+                device_id=device.device_id
+            )
+            # Keep the device and the attempt although the login is refused
+            await db.commit()
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Login blocked due to unusual activity"
+            )
+        
+        # 2FA users always verify a code (the flag is denormalized onto the user
+        # row, so no extra query). Users without 2FA have no code to give, so a
+        # risky login of theirs goes through and is only logged by assess()
+        if user.two_factor_enabled:
+            # Return a partial token that requires 2FA verification
+            partial_token = create_access_token(
+                data={"sub": str(user.email), "requires_2fa": True},
+                expires_delta=timedelta(minutes=5)  # Short expiry for 2FA verification
+            )
+            
+            # Record login attempt (pending 2FA)
+            await device_management_service.record_login_attempt(
+                db=audit_db,
+                user_id=user.id,
+                ip_address=client_host,
+                user_agent=user_agent,
+                login_method="password",
+                status="pending_2fa",
+                device_id=device.device_id
+            )
+            
+            return {
+                "access_token": partial_token,
+                "token_type": "bearer",
+                "requires_2fa": True,
+                "device_id": device.device_id
+            }
+        
+        # Update last login
+        await user_service.update_last_login(db, user.id)
+        risk_service.record_success(user.id, device.device_id, client_host)
+        
+        # Record successful login
         await device_management_service.record_login_attempt(
-            db=db,
+            db=audit_db,
             user_id=user.id,
             ip_address=client_host,
             user_agent=user_agent,
             login_method="password",
-            status="pending_2fa",
+            status="success",
             device_id=device.device_id
         )
         
-        return {
-            "access_token": partial_token,
-            "token_type": "bearer",
-            "requires_2fa": True,
-            "device_id": device.device_id
-        }
-    
-    # Update last login
-    await user_service.update_last_login(db, user.id)
-    
-    # Record successful login
-    await device_management_service.record_login_attempt(
-        db=db,
-        user_id=user.id,
-        ip_address=client_host,
-        user_agent=user_agent,
-        login_method="password",
-        status="success",
-        device_id=device.device_id
-    )
-    
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.email)}, expires_delta=access_token_expires
-    )
-    
-    # Create refresh token
-    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token_jwt = create_refresh_token(
-        data={"sub": str(user.email)}, expires_delta=refresh_token_expires
-    )
-    
-    # Store refresh token in database
-    await refresh_token_service.create_refresh_token(
-        db=db,
-        user_id=user.id,
-        token=refresh_token_jwt,
-        device_info=user_agent[:255],  # Limit to 255 chars
-        ip_address=client_host
-    )
+        # Create access token
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = create_access_token(
+            data={"sub": str(user.email)}, expires_delta=access_token_expires
+        )
+        
+        # Create refresh token
+        refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        refresh_token_jwt = create_refresh_token(
+            data={"sub": str(user.email)}, expires_delta=refresh_token_expires
+        )
+        
+        # Store refresh token in database
+        await refresh_token_service.create_refresh_token(
+            db=db,
+            user_id=user.id,
+            token=refresh_token_jwt,
+            device_info=user_agent[:255],  # Limit to 255 chars
+            ip_address=client_host
+        )
     
     return {
         "access_token": access_token,
@@ -176,42 +192,44 @@ async def refresh_token(
     db: AsyncSession = Depends(get_db)
 ):
     """Refresh access token using refresh token"""
-    # Validate refresh token in database
-    user = await refresh_token_service.validate_and_get_user(db, token_request.refresh_token)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token",
-            headers={"WWW-Authenticate": "Bearer"},
+    # Validation, revocation and the new token commit together
+    async with unit_of_work(db):
+        # Validate refresh token in database
+        user = await refresh_token_service.validate_and_get_user(db, token_request.refresh_token)
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Create new access token
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = create_access_token(
+            data={"sub": str(user.email)}, expires_delta=access_token_expires
+        )
+        
+        # Create new refresh token
+        refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        new_refresh_token = create_refresh_token(
+            data={"sub": str(user.email)}, expires_delta=refresh_token_expires
+        )
+        
+        # Revoke old refresh token
+        await refresh_token_service.revoke_token(db, token_request.refresh_token)
+        
+        # Store new refresh token
+        client_host = request.client.host if request.client else None
+        user_agent = request.headers.get("User-Agent", "Unknown")
+        
+        await refresh_token_service.create_refresh_token(
+            db=db,
+            user_id=user.id,
+            token=new_refresh_token,
+            device_info=user_agent[:255],
+            ip_address=client_host
         )
-    
-    # Create new access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.email)}, expires_delta=access_token_expires
-    )
-    
-    # Create new refresh token
-    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    new_refresh_token = create_refresh_token(
-        data={"sub": str(user.email)}, expires_delta=refresh_token_expires
-    )
-    
-    # Revoke old refresh token
-    await refresh_token_service.revoke_token(db, token_request.refresh_token)
-    
-    # Store new refresh token
-    client_host = request.client.host if request.client else None
-    user_agent = request.headers.get("User-Agent", "Unknown")
-    
-    await refresh_token_service.create_refresh_token(
-        db=db,
-        user_id=user.id,
-        token=new_refresh_token,
-        device_info=user_agent[:255],
-        ip_address=client_host
-    )
     
     return {
         "access_token": access_token,
@@ -223,8 +241,8 @@ async def refresh_token(
 @router.post("/logout")
 async def logout(
     token_revoke: TokenRevoke,
-    db: AsyncSession = Depends(get_db),
-    _: User = Depends(get_current_user)  # Ensures user is authenticated
+    _: User = Depends(get_current_user),  # Ensures user is authenticated
+    db: AsyncSession = Depends(get_db)
 ):
     """Logout user by revoking refresh token"""
     # Revoke the specific refresh token
@@ -342,12 +360,11 @@ async def validate_reset_token(
 async def verify_2fa(
     code: str,
     request: Request,
-    current_user: UserModel = Depends(get_current_user),
+    current_user: UserModel = Depends(get_pending_2fa_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Verify 2FA code and complete login"""
-    # Check if the token requires 2FA
-    # This will be handled by the dependency that checks the token
+    # Only the partial token from /login is accepted here
     
     # Verify 2FA code
     is_valid = await two_factor_auth_service.verify_2fa(
@@ -360,35 +377,41 @@ async def verify_2fa(
             detail="Invalid 2FA code"
         )
     
-    # Update last login
-    await user_service.update_last_login(db, current_user.id)
-    
-    # Create full access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(current_user.email)}, expires_delta=access_token_expires
-    )
-    
-    # Create refresh token
-    refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token_jwt = create_refresh_token(
-        data={"sub": str(current_user.email)}, expires_delta=refresh_token_expires
-    )
-    
-    # Store refresh token in database
     client_host = request.client.host if request.client else None
     user_agent = request.headers.get("User-Agent", "Unknown")
     
-    await refresh_token_service.create_refresh_token(
-        db=db,
-        user_id=current_user.id,
-        token=refresh_token_jwt,
-        device_info=user_agent[:255],
-        ip_address=client_host
-    )
+    async with unit_of_work(db):
+        # Update last login
+        await user_service.update_last_login(db, current_user.id)
+        risk_service.record_success(
+            current_user.id,
+            device_management_service.generate_device_id(user_agent, client_host),
+            client_host
+        )
+        
+        # Create full access token
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = create_access_token(
+            data={"sub": str(current_user.email)}, expires_delta=access_token_expires
+        )
+        
+        # Create refresh token
+        refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        refresh_token_jwt = create_refresh_token(
+            data={"sub": str(current_user.email)}, expires_delta=refresh_token_expires
+        )
+        
+        # Store refresh token in database
+        await refresh_token_service.create_refresh_token(
+            db=db,
+            user_id=current_user.id,
+            token=refresh_token_jwt,
+            device_info=user_agent[:255],
+            ip_address=client_host
+        )
     
     return {
         "access_token": access_token,
         "refresh_token": refresh_token_jwt,
         "token_type": "bearer"
-    }
+    }
\ No newline at end of file
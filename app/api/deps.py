@@ -1,10 +1,11 @@
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.response_cache import CacheLookup, NotModified, response_cache
 from app.core.security import verify_token
 from app.db.database import get_db
 from app.models.user import User
@@ -14,28 +15,53 @@ from app.services import user as user_service
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    token = credentials.credentials
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, Any]:
+    """Validate the bearer token without touching the database
     
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
-    
+    Partial tokens issued while a login waits for its 2FA code are refused;
+    they are only accepted by ``get_pending_2fa_user``.
+    """
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None or payload.get("requires_2fa"):
+        raise _credentials_exception()
+    return payload
+
+
+async def get_current_user(
+    payload: Dict[str, Any] = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    # payload is declared first so invalid tokens are rejected before a
+    # session is opened; endpoints should likewise declare auth before db
     email: str = payload.get("sub")
-    if email is None:
-        raise credentials_exception
-    
     user = await user_service.get_user_by_email(db, email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    
+    return user
+
+
+async def get_pending_2fa_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """The user of a partial token waiting for its 2FA code"""
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None or not payload.get("requires_2fa"):
+        raise _credentials_exception()
+    user = await user_service.get_user_by_email(db, payload["sub"])
+    if user is None:
+        raise _credentials_exception()
     
     return user
 
@@ -56,4 +82,22 @@ async def get_current_superuser(
             status_code=403,
             detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def cached_response(scope: str):
+    """Dependency looking up the caller's cached response for ``scope``
+    
+    Declare it before the user dependency: a matching If-None-Match raises
+    NotModified (answered with 304) before the user is loaded.
+    """
+    async def lookup(
+        request: Request,
+        payload: Dict[str, Any] = Depends(get_token_payload)
+    ) -> CacheLookup:
+        cached = response_cache.lookup(scope, payload["sub"], request.url.query)
+        if cached.entry is not None and cached.entry.etag in request.headers.get("if-none-match", ""):
+            raise NotModified(cached.entry.etag)
+        return cached
+    
+    return lookup
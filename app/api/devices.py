@@ -1,14 +1,16 @@
 """
 Device Management API endpoints
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime
 
-from app.api.deps import get_current_active_user
-from app.db.database import get_db
+from app.api.deps import cached_response, get_current_active_user
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.response_cache import DEVICES, LOGIN_HISTORY, CacheLookup, response_cache
+from app.db.database import get_audit_db, get_db
 from app.models.user import User as UserModel
 from app.services.device_management import device_management_service
 
@@ -38,15 +40,24 @@ class LoginHistoryResponse(BaseModel):
     created_at: datetime
 
 
+DeviceList = TypeAdapter(List[DeviceResponse])
+LoginHistoryList = TypeAdapter(List[LoginHistoryResponse])
+
+
 @router.get("/devices", response_model=List[DeviceResponse])
 async def get_user_devices(
+    cached: CacheLookup = Depends(cached_response(DEVICES)),
     current_user: UserModel = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all devices for current user"""
+    """Get all devices for current user; supports If-None-Match"""
+    entry = cached.entry_for(current_user.id)
+    if entry:
+        return entry.to_response()
+    
     devices = await device_management_service.get_user_devices(db, current_user.id)
     
-    return [
+    return response_cache.store(cached, current_user.id, DeviceList.dump_json([
         DeviceResponse(
             device_id=device.device_id,
             device_name=device.device_name,
@@ -58,7 +69,7 @@ async def get_user_devices(
             created_at=device.created_at
         )
         for device in devices
-    ]
+    ]))
 
 
 @router.post("/devices/{device_id}/trust")
@@ -98,16 +109,34 @@ async def remove_device(
 @router.get("/login-history", response_model=List[LoginHistoryResponse])
 async def get_login_history(
     limit: int = 50,
-    offset: int = 0,
+    offset: int = Query(0, deprecated=True),
+    cursor: Optional[str] = None,
+    cached: CacheLookup = Depends(cached_response(LOGIN_HISTORY)),
     current_user: UserModel = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    audit_db: AsyncSession = Depends(get_audit_db)
 ):
-    """Get login history for current user"""
+    """Get login history for current user; the next page cursor is returned in the X-Next-Cursor header
+    
+    Supports If-None-Match.
+    """
+    entry = cached.entry_for(current_user.id)
+    if entry:
+        return entry.to_response()
+    
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     history = await device_management_service.get_login_history(
-        db, current_user.id, limit=limit, offset=offset
+        audit_db, current_user.id, limit=limit + 1, offset=offset, cursor=position
     )
+    headers = {}
+    if len(history) > limit:
+        history = history[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(history[-1].created_at, history[-1].id)
     
-    return [
+    return response_cache.store(cached, current_user.id, LoginHistoryList.dump_json([
         LoginHistoryResponse(
             id=record.id,
             device_id=record.device_id,
@@ -119,4 +148,4 @@ async def get_login_history(
             created_at=record.created_at
         )
         for record in history
-    ]
\ No newline at end of file
+    ]), headers)
\ No newline at end of file
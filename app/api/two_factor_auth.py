@@ -1,13 +1,17 @@
 """
 Two-Factor Authentication API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.api.deps import get_current_active_user
+from app.api.deps import cached_response, get_current_active_user
+from app.core.response_cache import TWO_FACTOR_STATUS, CacheLookup, response_cache
 from app.db.database import get_db
 from app.models.user import User as UserModel
+from app.services.qr_code import QRFormat
 from app.services.two_factor_auth import two_factor_auth_service
 
 
@@ -24,7 +28,10 @@ class Verify2FARequest(BaseModel):
 
 class TwoFactorSetupResponse(BaseModel):
     secret: str
-    qr_code: str
+    # PNG or SVG data URL; None when the matrix was requested
+    qr_code: Optional[str] = None
+    # Hex row per line of modules, see app.services.qr_code
+    qr_matrix: Optional[List[str]] = None
     backup_codes: list[str]
 
 
@@ -35,29 +42,37 @@ class TwoFactorStatusResponse(BaseModel):
 
 @router.get("/status", response_model=TwoFactorStatusResponse)
 async def get_2fa_status(
+    cached: CacheLookup = Depends(cached_response(TWO_FACTOR_STATUS)),
     current_user: UserModel = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get 2FA status for current user"""
+    """Get 2FA status for current user; supports If-None-Match"""
+    entry = cached.entry_for(current_user.id)
+    if entry:
+        return entry.to_response()
+    
     two_fa = await two_factor_auth_service.get_2fa_by_user_id(db, current_user.id)
     
-    return TwoFactorStatusResponse(
+    return response_cache.store(cached, current_user.id, TwoFactorStatusResponse(
         enabled=two_fa.is_enabled if two_fa else False,
         enabled_at=two_fa.enabled_at.isoformat() if two_fa and two_fa.enabled_at else None
-    )
+    ).model_dump_json().encode())
 
 
 @router.post("/setup", response_model=TwoFactorSetupResponse)
 async def setup_2fa(
+    qr_format: QRFormat = Query("png", description="png (default), svg or matrix"),
     current_user: UserModel = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Setup 2FA for current user"""
     try:
         secret, qr_code, backup_codes = await two_factor_auth_service.setup_2fa(
-            db, current_user.id
+            db, current_user.id, qr_format=qr_format
         )
         
+        if qr_format == "matrix":
+            return TwoFactorSetupResponse(secret=secret, qr_matrix=qr_code, backup_codes=backup_codes)
         return TwoFactorSetupResponse(
             secret=secret,
             qr_code=qr_code,
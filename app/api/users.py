@@ -1,13 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_active_user, get_current_superuser
+from app.core.pagination import encode_cursor, decode_cursor
 from app.db.database import get_db
 from app.models.user import User as UserModel
 from app.schemas.user import User, UserUpdate, UserProfile
 from app.services import user as user_service
 from app.services.file_upload import file_upload_service
+from app.services.user_export import EXPORT_FORMATS, export_query, stream_users
 
 router = APIRouter()
 
@@ -31,15 +35,61 @@ async def update_user_me(
 
 @router.get("/", response_model=List[User])
 async def read_users(
-    skip: int = 0,
+    response: Response,
+    skip: int = Query(0, deprecated=True),
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: UserModel = Depends(get_current_superuser),
     db: AsyncSession = Depends(get_db)
 ):
-    users = await user_service.get_users(db, skip=skip, limit=limit)
+    """List users; the next page cursor is returned in the X-Next-Cursor header"""
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    users = await user_service.get_users(db, skip=skip, limit=limit + 1, cursor=position)
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(users[-1].created_at, users[-1].id)
     return users
 
 
+# Registered before /{user_id} so "export" is not parsed as an id
+@router.get("/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    is_superuser: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: UserModel = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream every user matching the filters as NDJSON or CSV, optionally gzipped"""
+    query = export_query(
+        is_active=is_active,
+        is_verified=is_verified,
+        is_superuser=is_superuser,
+        created_after=created_after,
+        created_before=created_before
+    )
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"users.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+    
+    # The request's session is closed before the body is sent, so the export
+    # streams from a connection of its own on the same engine
+    return StreamingResponse(
+        stream_users(db.bind, query, export_format=format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/{user_id}", response_model=User)
 async def read_user(
     user_id: int,
@@ -0,0 +1,125 @@
+"""
+Per-user response cache with ETags
+
+Read endpoints that the dashboard polls keep their serialized JSON body and
+an ETag per (scope, user, query string). Services invalidate a user's scope
+when they change the underlying rows. A request whose ``If-None-Match``
+matches the cached ETag is answered with 304 before the user is loaded from
+the database.
+
+Caches are per worker: a write invalidates the worker it ran on, other
+workers may serve the previous body for up to RESPONSE_CACHE_TTL seconds.
+The same bound applies to a user deactivated on another worker.
+"""
+import hashlib
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Response
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+DEVICES = "devices"
+LOGIN_HISTORY = "login_history"
+TWO_FACTOR_STATUS = "2fa_status"
+SCOPES = (DEVICES, LOGIN_HISTORY, TWO_FACTOR_STATUS)
+# Query string variants (pages) kept per user and scope
+MAX_VARIANTS = 8
+
+
+class NotModified(Exception):
+    """Raised to answer a conditional request with 304 Not Modified"""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            media_type="application/json",
+            headers={**self.headers, "ETag": self.etag}
+        )
+
+
+class CacheLookup(NamedTuple):
+    """What a cached endpoint needs from its cache dependency"""
+    scope: str
+    subject: str
+    variant: str
+    entry: Optional[CachedResponse]
+    # The user the subject mapped to when the entry was found
+    user_id: Optional[int] = None
+
+    def entry_for(self, user_id: int) -> Optional[CachedResponse]:
+        """The cached entry, if it belongs to ``user_id``
+        
+        Subjects are emails, which can move to another account; serve a body
+        only to the user it was stored for.
+        """
+        return self.entry if self.user_id == user_id else None
+
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl: float):
+        # (scope, user_id) -> {query string: CachedResponse}
+        self.entries = LRUCache(max_size, ttl=ttl)
+        # Token subject -> user id, so conditional requests skip the user lookup
+        self.subjects = LRUCache(max_size)
+
+    def lookup(self, scope: str, subject: str, variant: str = "") -> CacheLookup:
+        entry = None
+        user_id = self.subjects.get(subject)
+        if user_id is not None:
+            entry = self.entries.get((scope, user_id), {}).get(variant)
+        return CacheLookup(scope, subject, variant, entry, user_id)
+
+    def store(
+        self,
+        lookup: CacheLookup,
+        user_id: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Cache a serialized body for the user and return it as a response"""
+        entry = CachedResponse(
+            body=body,
+            etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+            headers=headers or {}
+        )
+        self.subjects.set(lookup.subject, user_id)
+        variants = self.entries.get((lookup.scope, user_id)) or {}
+        variants.pop(lookup.variant, None)
+        variants[lookup.variant] = entry
+        if len(variants) > MAX_VARIANTS:
+            del variants[next(iter(variants))]
+        self.entries.set((lookup.scope, user_id), variants)
+        return entry.to_response()
+
+    def invalidate(self, user_id: int, *scopes: str) -> None:
+        for scope in scopes:
+            self.entries.pop((scope, user_id))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached response of a deactivated or deleted user
+        
+        Conditional requests are answered from the token alone, so without
+        this they would keep getting 304s until the entries expire.
+        """
+        self.invalidate(user_id, *SCOPES)
+
+    def forget_subject(self, subject: str) -> None:
+        """Drop a token subject, e.g. the old email after an email change"""
+        self.subjects.pop(subject)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+# Global response cache
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
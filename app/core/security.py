@@ -2,6 +2,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import secrets
 import base64
+import hashlib
+import hmac
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -34,7 +36,8 @@ def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti keeps tokens issued in the same second unique
+    to_encode.update({"exp": expire, "type": "refresh", "jti": generate_token()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -54,6 +57,21 @@ def generate_token() -> str:
     return secrets.token_urlsafe(32)
 
 
+def hash_token(token: str) -> str:
+    """SHA-256 hex digest of a token, used as its database lookup key"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def hash_backup_code(user_id: int, code: str) -> str:
+    """Keyed SHA-256 of a 2FA backup code, salted with the user id
+
+    Deterministic so the digest can be looked up through an index; the
+    server secret keeps a leaked table from being brute forced offline.
+    """
+    message = f"{user_id}:{code.strip().lower()}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
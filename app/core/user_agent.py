@@ -0,0 +1,76 @@
+"""
+Memoized user-agent parsing
+
+``user_agents.parse`` runs dozens of regular expressions per call, while the
+set of distinct User-Agent headers seen in practice is small. Results are
+kept in a bounded LRU cache as immutable records, so a repeated header costs
+a dictionary lookup.
+"""
+import hashlib
+from functools import lru_cache
+from typing import Dict, NamedTuple
+
+from user_agents import parse
+
+from app.core.config import settings
+
+# Longer headers are truncated before parsing so cache keys stay small
+MAX_USER_AGENT_LENGTH = 512
+
+
+class ParsedUserAgent(NamedTuple):
+    device_type: str
+    browser: str
+    browser_version: str
+    os: str
+    os_version: str
+    # Hash of browser and OS family plus version, used as the device id
+    fingerprint: str
+
+    @property
+    def device_name(self) -> str:
+        return f"{self.browser} on {self.os}"
+
+
+@lru_cache(maxsize=settings.USER_AGENT_CACHE_SIZE)
+def _parse(user_agent: str) -> ParsedUserAgent:
+    ua = parse(user_agent)
+
+    if ua.is_mobile:
+        device_type = "mobile"
+    elif ua.is_tablet:
+        device_type = "tablet"
+    else:
+        device_type = "desktop"
+
+    fingerprint = f"{ua.browser.family}:{ua.browser.version_string}:{ua.os.family}:{ua.os.version_string}"
+    return ParsedUserAgent(
+        device_type=device_type,
+        browser=ua.browser.family,
+        browser_version=ua.browser.version_string,
+        os=ua.os.family,
+        os_version=ua.os.version_string,
+        fingerprint=hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+    )
+
+
+def parse_user_agent(user_agent: str) -> ParsedUserAgent:
+    """Parse a User-Agent header, cached"""
+    return _parse(user_agent[:MAX_USER_AGENT_LENGTH])
+
+
+def user_agent_cache_stats() -> Dict[str, float]:
+    """Hits, misses, current size and hit rate of the parse cache"""
+    info = _parse.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
+def clear_user_agent_cache() -> None:
+    _parse.cache_clear()
@@ -0,0 +1,53 @@
+"""
+Chunked set-based deletes for maintenance jobs
+"""
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+
+async def delete_in_chunks(
+    db: AsyncSession,
+    model,
+    *criteria,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    deadline: Optional[float] = None
+) -> int:
+    """Delete the rows matching ``criteria`` in bounded chunks
+
+    Each chunk selects up to ``batch_size`` primary keys, deletes them by key
+    and commits, so no single transaction holds locks on a large backlog. The
+    loop sleeps ``pause`` seconds between chunks to let other work through and
+    stops early once ``deadline`` (a ``time.monotonic()`` value) has passed;
+    whatever is left is picked up by the next run. Returns the number of rows
+    deleted.
+    """
+    batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+    pause = settings.CLEANUP_BATCH_PAUSE if pause is None else pause
+
+    total = 0
+    while True:
+        result = await db.execute(select(model.id).where(*criteria).limit(batch_size))
+        ids = result.scalars().all()
+        if not ids:
+            break
+
+        await db.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        total += len(ids)
+
+        if len(ids) < batch_size:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(pause)
+
+    return total
@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
@@ -9,6 +11,10 @@ class DatabaseManager:
     def __init__(self):
         self.engine: AsyncEngine | None = None
         self.async_session_maker: async_sessionmaker | None = None
+        # Separate engine for audit data; without AUDIT_DATABASE_URL the audit
+        # session maker is the main one
+        self.audit_engine: AsyncEngine | None = None
+        self.audit_session_maker: async_sessionmaker | None = None
 
     async def initialize(self):
         if settings.DATABASE_TYPE == "sqlite":
@@ -34,15 +40,42 @@ class DatabaseManager:
             class_=AsyncSession,
             expire_on_commit=False
         )
+        
+        self.audit_session_maker = self.async_session_maker
+        if settings.AUDIT_DATABASE_URL:
+            if settings.AUDIT_DATABASE_URL.startswith("sqlite"):
+                self.audit_engine = create_async_engine(
+                    settings.AUDIT_DATABASE_URL,
+                    connect_args={"check_same_thread": False}
+                )
+            else:
+                self.audit_engine = create_async_engine(
+                    settings.AUDIT_DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_size=settings.AUDIT_POOL_SIZE,
+                    max_overflow=settings.AUDIT_MAX_OVERFLOW
+                )
+            self.audit_session_maker = async_sessionmaker(
+                self.audit_engine,
+                class_=AsyncSession,
+                expire_on_commit=False
+            )
 
     async def create_tables(self):
         from app.models import user  # Import models to register them
+        from app.db.migrations import run_migrations, create_audit_tables
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+        if self.audit_engine:
+            async with self.audit_engine.begin() as conn:
+                await conn.run_sync(create_audit_tables)
 
     async def close(self):
         if self.engine:
             await self.engine.dispose()
+        if self.audit_engine:
+            await self.audit_engine.dispose()
 
 
 db_manager = DatabaseManager()
@@ -52,8 +85,57 @@ AsyncSessionLocal = None  # Will be set after initialization
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    # AsyncSession checks out a pool connection on its first query, not here,
+    # so requests rejected before any query never touch the pool
     async with db_manager.async_session_maker() as session:
         try:
             yield session
         finally:
             await session.close()
+
+
+async def get_audit_db(db: AsyncSession = Depends(get_db)) -> AsyncGenerator[AsyncSession, None]:
+    """Session for audit data: the request's main session unless a separate
+    audit database is configured"""
+    if db_manager.audit_engine is None:
+        yield db
+        return
+    async with db_manager.audit_session_maker() as session:
+        yield session
+
+
+UNIT_OF_WORK_KEY = "unit_of_work"
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession) -> AsyncGenerator[AsyncSession, None]:
+    """Run several service calls in a single transaction
+    
+    Services use ``maybe_commit`` instead of ``db.commit()``, so inside this
+    block their writes are only flushed and committed once on exit. Nested
+    blocks join the outer transaction.
+    """
+    if db.info.get(UNIT_OF_WORK_KEY):
+        yield db
+        return
+    
+    db.info[UNIT_OF_WORK_KEY] = True
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        db.info.pop(UNIT_OF_WORK_KEY, None)
+
+
+async def maybe_commit(db: AsyncSession) -> bool:
+    """Commit unless the session is inside ``unit_of_work``
+    
+    Returns True if a commit was issued.
+    """
+    if db.info.get(UNIT_OF_WORK_KEY):
+        return False
+    await db.commit()
+    return True
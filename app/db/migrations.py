@@ -0,0 +1,272 @@
+"""
+Lightweight schema migrations
+
+``Base.metadata.create_all`` only creates missing tables, so changes to
+existing tables (new indexes, columns) are applied here on startup. Every
+step must be idempotent.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, false, func, inspect, select, text, Boolean, String, MetaData, Table
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from app.db.base import Base
+from app.db.partitions import add_months, detached_table, login_history_partitions, month_start
+from app.models.login_history import LoginHistory
+from app.models.refresh_token import RefreshToken
+from app.models.two_factor_backup_code import TwoFactorBackupCode
+from app.core.security import decrypt_data, hash_backup_code, hash_token
+from app.core.logging import app_logger as logger
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def ensure_indexes(conn: Connection) -> None:
+    """Create model indexes that are missing from already existing tables"""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                logger.info(f"Created index {index.name} on {table.name}")
+
+
+def normalize_user_created_at(conn: Connection) -> None:
+    """Rewrite second-precision ``users.created_at`` values on SQLite
+    
+    Rows inserted while the column used the CURRENT_TIMESTAMP server default
+    are stored as 'YYYY-MM-DD HH:MM:SS', which sorts before the
+    'YYYY-MM-DD HH:MM:SS.ffffff' strings the keyset cursor binds, so a page
+    boundary inside such a second could skip or repeat rows.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    if "users" not in inspect(conn).get_table_names():
+        return
+    
+    result = conn.execute(text(
+        "UPDATE users SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    ))
+    if result.rowcount:
+        logger.info(f"Normalized created_at of {result.rowcount} users")
+
+
+def migrate_refresh_token_digests(conn: Connection) -> None:
+    """Replace the legacy ``refresh_tokens.token`` column with ``token_hash``
+    
+    Existing rows are backfilled with the SHA-256 digest of their JWT,
+    ``token_hash`` is made NOT NULL, then the plaintext column and its index
+    are dropped. SQLite cannot alter a column, so there the table is rebuilt
+    from the model instead. The unique index on ``token_hash`` is created
+    afterwards by ``ensure_indexes``.
+    """
+    inspector = inspect(conn)
+    if "refresh_tokens" not in inspector.get_table_names():
+        return
+    
+    columns = {column["name"] for column in inspector.get_columns("refresh_tokens")}
+    if "token" not in columns:
+        return
+    
+    logger.info("Migrating refresh tokens to SHA-256 digests")
+    if "token_hash" not in columns:
+        column_type = String(64).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE refresh_tokens ADD COLUMN token_hash {column_type}"))
+    
+    # Backfill in primary key order, one batch at a time, so large tables
+    # are neither loaded at once nor rescanned for every batch
+    migrated = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, token FROM refresh_tokens "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        
+        conn.execute(
+            text("UPDATE refresh_tokens SET token_hash = :token_hash WHERE id = :id"),
+            [{"id": row.id, "token_hash": hash_token(row.token)} for row in rows]
+        )
+        migrated += len(rows)
+        last_id = rows[-1].id
+    
+    if conn.dialect.name == "sqlite":
+        _rebuild_sqlite_table(conn, RefreshToken.__table__)
+    else:
+        column_type = String(64).compile(dialect=conn.dialect)
+        if conn.dialect.name == "mysql":
+            conn.execute(text(f"ALTER TABLE refresh_tokens MODIFY token_hash {column_type} NOT NULL"))
+        else:
+            conn.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL"))
+        
+        # Drop indexes on the plaintext column before the column itself
+        table = Table("refresh_tokens", MetaData(), autoload_with=conn)
+        for index in list(table.indexes):
+            if "token" in index.columns:
+                index.drop(conn)
+        
+        conn.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+    logger.info(f"Migrated {migrated} refresh tokens to SHA-256 digests")
+
+
+def _rebuild_sqlite_table(conn: Connection, model_table: Table) -> None:
+    """Recreate a SQLite table with the model's columns and constraints
+    
+    Columns the model no longer has are dropped with the old table, as are
+    its indexes; ``ensure_indexes`` creates the model's ones afterwards.
+    """
+    metadata = MetaData()
+    # Tables referenced by foreign keys must be known to compile the DDL
+    for foreign_key in model_table.foreign_keys:
+        foreign_key.column.table.to_metadata(metadata)
+    rebuilt = model_table.to_metadata(metadata, name=f"{model_table.name}_rebuilt")
+    
+    columns = ", ".join(column.name for column in model_table.columns)
+    conn.execute(CreateTable(rebuilt))
+    conn.execute(text(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {model_table.name}"))
+    conn.execute(text(f"DROP TABLE {model_table.name}"))
+    conn.execute(text(f"ALTER TABLE {rebuilt.name} RENAME TO {model_table.name}"))
+
+
+def migrate_backup_codes(conn: Connection) -> None:
+    """Move the legacy encrypted ``two_factor_auth.backup_codes`` blobs into
+    ``two_factor_backup_codes``, one hashed row per unused code
+    
+    The blob column is dropped once every record has been converted. Blobs
+    that cannot be decrypted (the secret key changed) are discarded; those
+    users can regenerate their codes.
+    """
+    inspector = inspect(conn)
+    if "two_factor_auth" not in inspector.get_table_names():
+        return
+    
+    columns = {column["name"] for column in inspector.get_columns("two_factor_auth")}
+    if "backup_codes" not in columns:
+        return
+    
+    logger.info("Migrating 2FA backup codes to hashed rows")
+    migrated = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, user_id, backup_codes FROM two_factor_auth "
+                "WHERE backup_codes IS NOT NULL ORDER BY id LIMIT :limit"
+            ),
+            {"limit": BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        
+        codes = []
+        for row in rows:
+            try:
+                plain_codes = json.loads(decrypt_data(row.backup_codes))
+            except Exception as e:
+                logger.warning(f"Discarding unreadable backup codes for user {row.user_id}: {e}")
+                continue
+            codes.extend(
+                {"two_factor_auth_id": row.id, "code_hash": hash_backup_code(row.user_id, code)}
+                for code in set(plain_codes)
+            )
+        if codes:
+            conn.execute(TwoFactorBackupCode.__table__.insert(), codes)
+        conn.execute(
+            text("UPDATE two_factor_auth SET backup_codes = NULL WHERE id = :id"),
+            [{"id": row.id} for row in rows]
+        )
+        migrated += len(rows)
+    
+    conn.execute(text("ALTER TABLE two_factor_auth DROP COLUMN backup_codes"))
+    logger.info(f"Migrated backup codes of {migrated} 2FA records")
+
+
+def migrate_user_two_factor_flag(conn: Connection) -> None:
+    """Add ``users.two_factor_enabled`` and backfill it from ``two_factor_auth``"""
+    inspector = inspect(conn)
+    if "users" not in inspector.get_table_names():
+        return
+    
+    columns = {column["name"] for column in inspector.get_columns("users")}
+    if "two_factor_enabled" in columns:
+        return
+    
+    logger.info("Adding users.two_factor_enabled")
+    column_type = Boolean().compile(dialect=conn.dialect)
+    default = false().compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE users ADD COLUMN two_factor_enabled {column_type} NOT NULL DEFAULT {default}"))
+    result = conn.execute(text(
+        "UPDATE users SET two_factor_enabled = :enabled WHERE id IN "
+        "(SELECT user_id FROM two_factor_auth WHERE is_enabled = :enabled)"
+    ), {"enabled": True})
+    logger.info(f"Backfilled two_factor_enabled for {result.rowcount} users")
+
+
+def migrate_login_history_partitions(conn: Connection) -> None:
+    """Move login history into monthly partitions when partitioning is enabled
+    
+    On SQLite rows still in the unpartitioned ``login_history`` table are
+    copied into their month's table (keeping their ids) and removed from it.
+    On MySQL the table is converted to RANGE partitions and the current and
+    next month's partitions are created.
+    """
+    if not login_history_partitions.enabled(conn):
+        return
+    
+    if conn.dialect.name == "mysql":
+        through = add_months(datetime.utcnow(), 1)
+        login_history_partitions.mysql_partition_table(conn, through)
+        login_history_partitions.mysql_add_months(conn, through)
+        return
+    
+    base = login_history_partitions.base
+    months = conn.execute(
+        select(func.min(base.c.created_at), func.max(base.c.created_at))
+    ).one()
+    if months[0] is None:
+        return
+    
+    moved = 0
+    month = month_start(months[0])
+    while month <= months[1]:
+        upper = add_months(month, 1)
+        in_month = and_(base.c.created_at >= month, base.c.created_at < upper)
+        table = login_history_partitions.ensure(conn, month)
+        columns = [column.name for column in base.columns]
+        result = conn.execute(table.insert().from_select(columns, select(base).where(in_month)))
+        conn.execute(base.delete().where(in_month))
+        moved += result.rowcount
+        month = upper
+    logger.info(f"Moved {moved} login history rows into monthly partitions")
+
+
+def create_audit_tables(conn: Connection) -> None:
+    """Create the audit tables in a separate audit database
+    
+    The users table is not there, so login history is created without its
+    foreign key.
+    """
+    detached_table(LoginHistory.__table__, MetaData()).create(conn, checkfirst=True)
+    migrate_login_history_partitions(conn)
+
+
+def run_migrations(conn: Connection) -> None:
+    """Apply all migrations in order"""
+    normalize_user_created_at(conn)
+    migrate_refresh_token_digests(conn)
+    migrate_backup_codes(conn)
+    migrate_user_two_factor_flag(conn)
+    ensure_indexes(conn)
+    migrate_login_history_partitions(conn)
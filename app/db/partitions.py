@@ -0,0 +1,263 @@
+"""
+Monthly partitions for append-only history tables
+
+On SQLite every month lives in its own table (``login_history_202610``) with
+the same columns and indexes as the model's table; dropping a month is a
+``DROP TABLE``. On MySQL the model's table itself is RANGE-partitioned by
+month (``p202610``) and a month is removed with ``ALTER TABLE ... DROP
+PARTITION``. In both cases reads and writes go through ``MonthlyPartitions``
+so callers do not need to know which layout is in use.
+"""
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import Column, Index, MetaData, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.models.login_history import LoginHistory
+
+MYSQL_FUTURE_PARTITION = "p_future"
+# Seconds a connection trusts its cached list of partition tables
+PARTITION_LIST_TTL = 300
+
+
+def month_start(at: datetime) -> datetime:
+    return datetime(at.year, at.month, 1)
+
+
+def add_months(at: datetime, months: int) -> datetime:
+    """First day of the month ``months`` away from ``at``'s month"""
+    index = at.year * 12 + at.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def detached_table(base: Table, metadata: MetaData, name: Optional[str] = None, **kwargs) -> Table:
+    """Copy of ``base``'s columns and indexes without its foreign keys
+
+    Used where the referenced tables are not available, such as month tables
+    and the separate audit database. Index names are rewritten for ``name``.
+    """
+    name = name or base.name
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            autoincrement=column.autoincrement
+        )
+        for column in base.columns
+    ]
+    indexes = [
+        Index(
+            index.name.replace(base.name, name, 1),
+            *[column.name for column in index.columns]
+        )
+        for index in base.indexes
+    ]
+    return Table(name, metadata, *columns, *indexes, **kwargs)
+
+
+class MonthlyPartitions:
+    """Route a model's rows to per-month partitions"""
+
+    def __init__(self, base: Table):
+        self.base = base
+        self.prefix = f"{base.name}_"
+        self._pattern = re.compile(rf"^{re.escape(self.prefix)}(\d{{6}})$")
+        self._metadata = MetaData()
+        self._tables: Dict[str, Table] = {}
+
+    def enabled(self, conn: Connection) -> bool:
+        return settings.LOGIN_HISTORY_PARTITIONING and conn.dialect.name in ("sqlite", "mysql")
+
+    def uses_tables(self, conn: Connection) -> bool:
+        """Whether months are separate tables (SQLite) rather than native partitions"""
+        return self.enabled(conn) and conn.dialect.name == "sqlite"
+
+    def name_for(self, at: datetime) -> str:
+        return f"{self.prefix}{at:%Y%m}"
+
+    def month_of(self, name: str) -> datetime:
+        """Month a partition table name (or MySQL partition name) covers"""
+        digits = name[len(self.prefix):] if name.startswith(self.prefix) else name.lstrip("p")
+        return datetime.strptime(digits, "%Y%m")
+
+    def table(self, name: str) -> Table:
+        """Table object for a monthly partition, indexes renamed per table"""
+        table = self._tables.get(name)
+        if table is None:
+            # AUTOINCREMENT keeps a per-table sequence that new months seed
+            # from the previous maximum, so ids stay unique across months
+            table = detached_table(self.base, self._metadata, name, sqlite_autoincrement=True)
+            self._tables[name] = table
+        return table
+
+    def _known(self, conn: Connection, refresh: bool = False) -> Set[str]:
+        """Partition tables cached per connection
+
+        The listing is reloaded after PARTITION_LIST_TTL seconds, or while the
+        current month is missing, to pick up tables other workers created.
+        """
+        loaded_at, names = conn.info.get("partitions", (0.0, set()))
+        current = self.name_for(datetime.utcnow())
+        if refresh or time.monotonic() - loaded_at > PARTITION_LIST_TTL or current not in names:
+            names = {name for name in inspect(conn).get_table_names() if self._pattern.match(name)}
+            conn.info["partitions"] = (time.monotonic(), names)
+        return names
+
+    def list(self, conn: Connection, refresh: bool = False) -> List[str]:
+        """Existing partition names, newest first"""
+        if self.uses_tables(conn):
+            names = self._known(conn, refresh)
+        elif self.enabled(conn):
+            names = self._mysql_partitions(conn)
+        else:
+            names = []
+        return sorted(names, reverse=True)
+
+    def read_tables(self, conn: Connection, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Table]:
+        """Tables to read, newest first, limited to months overlapping [since, until]"""
+        if not self.uses_tables(conn):
+            return [self.base]
+
+        tables = []
+        for name in self.list(conn):
+            month = self.month_of(name)
+            if until is not None and month > until:
+                continue
+            if since is not None and add_months(month, 1) <= since:
+                break
+            tables.append(self.table(name))
+        return tables
+
+    def ensure(self, conn: Connection, at: datetime) -> Table:
+        """Table that rows created at ``at`` are written to"""
+        if not self.uses_tables(conn):
+            return self.base
+
+        name = self.name_for(at)
+        table = self.table(name)
+        if name in self._known(conn):
+            return table
+
+        if not inspect(conn).has_table(name):
+            table.create(conn)
+            # Seed the new table's sequence above every id handed out so far
+            highest = 0
+            for other in [self.base.name, *self.list(conn, refresh=True)]:
+                source = self.base if other == self.base.name else self.table(other)
+                highest = max(highest, conn.execute(select(func.max(source.c.id))).scalar() or 0)
+            if highest:
+                conn.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                    {"name": name, "seq": highest}
+                )
+            logger.info(f"Created partition {name}")
+        self._known(conn).add(name)
+        return table
+
+    def drop(self, conn: Connection, name: str) -> None:
+        """Drop a whole month"""
+        if self.uses_tables(conn):
+            self.table(name).drop(conn)
+            self._known(conn).discard(name)
+        else:
+            conn.execute(text(f"ALTER TABLE {self.base.name} DROP PARTITION {name}"))
+        logger.info(f"Dropped partition {name}")
+
+    def month_rows(self, conn: Connection, name: str):
+        """Table and WHERE clause selecting one partition's rows"""
+        month = self.month_of(name)
+        table = self.table(name) if self.uses_tables(conn) else self.base
+        return table, (table.c.created_at >= month) & (table.c.created_at < add_months(month, 1))
+
+    # MySQL native partitions
+
+    def _mysql_partitions(self, conn: Connection) -> List[str]:
+        rows = conn.execute(
+            text(
+                "SELECT partition_name FROM information_schema.partitions "
+                "WHERE table_schema = DATABASE() AND table_name = :table "
+                "AND partition_name IS NOT NULL"
+            ),
+            {"table": self.base.name}
+        ).scalars().all()
+        return [name for name in rows if name != MYSQL_FUTURE_PARTITION]
+
+    def mysql_partition_table(self, conn: Connection, through: datetime) -> None:
+        """Convert the MySQL table to RANGE partitions by month, once
+
+        Partitions are created from the month of the oldest row through
+        ``through``, so existing rows are spread over their own months and
+        expire with them.
+        """
+        partitioned = conn.execute(
+            text(
+                "SELECT COUNT(*) FROM information_schema.partitions "
+                "WHERE table_schema = DATABASE() AND table_name = :table "
+                "AND partition_name IS NOT NULL"
+            ),
+            {"table": self.base.name}
+        ).scalar()
+        if partitioned:
+            return
+
+        oldest = conn.execute(select(func.min(self.base.c.created_at))).scalar()
+        foreign_keys = [foreign_key["name"] for foreign_key in inspect(conn).get_foreign_keys(self.base.name)]
+        for statement in self.mysql_partition_statements(foreign_keys, oldest or datetime.utcnow(), through):
+            conn.execute(text(statement))
+        logger.info(f"Partitioned {self.base.name} by month")
+
+    def mysql_partition_statements(self, foreign_keys: List[str], first: datetime, through: datetime) -> List[str]:
+        """DDL converting the table to monthly partitions from ``first`` through ``through``
+
+        Partitioned InnoDB tables cannot have foreign keys and every unique
+        key must contain the partitioning column, so the foreign keys are
+        dropped and the primary key becomes (id, created_at).
+        """
+        table = self.base.name
+        statements = [f"ALTER TABLE {table} DROP FOREIGN KEY {name}" for name in foreign_keys]
+        statements.append(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+
+        partitions = []
+        month = month_start(first)
+        while month <= through:
+            partitions.append(self._mysql_month_partition(month))
+            month = add_months(month, 1)
+        partitions.append(f"PARTITION {MYSQL_FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+        statements.append(
+            f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(partitions)})"
+        )
+        return statements
+
+    def mysql_add_months(self, conn: Connection, through: datetime) -> None:
+        """Split monthly partitions off p_future up to and including ``through``"""
+        existing = set(self._mysql_partitions(conn))
+        oldest = min((self.month_of(name) for name in existing), default=None)
+        if oldest is None:
+            # Only p_future exists; start from the oldest row it holds
+            first = conn.execute(select(func.min(self.base.c.created_at))).scalar()
+            oldest = month_start(first or datetime.utcnow())
+        month = oldest
+        while month <= through:
+            name = f"p{month:%Y%m}"
+            if name not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE {self.base.name} REORGANIZE PARTITION {MYSQL_FUTURE_PARTITION} INTO ("
+                    f"{self._mysql_month_partition(month)}, "
+                    f"PARTITION {MYSQL_FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)"
+                ))
+                logger.info(f"Added partition {name} to {self.base.name}")
+            month = add_months(month, 1)
+
+    @staticmethod
+    def _mysql_month_partition(month: datetime) -> str:
+        return f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))"
+
+
+login_history_partitions = MonthlyPartitions(LoginHistory.__table__)
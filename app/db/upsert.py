@@ -0,0 +1,114 @@
+"""
+Dialect-native upsert helper
+"""
+from typing import Any, Dict, Sequence, Type, TypeVar
+
+from sqlalchemy import Column, and_, case, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.visitors import iterate
+
+ModelT = TypeVar("ModelT")
+
+POPULATE_EXISTING = {"populate_existing": True}
+
+
+async def upsert(
+    db: AsyncSession,
+    model: Type[ModelT],
+    values: Dict[str, Any],
+    conflict_columns: Sequence[str],
+    set_: Dict[str, Any],
+    where=None
+) -> ModelT:
+    """Insert a row, or update it in place when it collides on a unique key
+
+    ``values`` is the full row to insert; ``set_`` holds the columns written
+    when a row with the same ``conflict_columns`` already exists, and
+    ``where`` optionally restricts that update to rows matching it. Emits
+    ``INSERT ... ON CONFLICT DO UPDATE`` on SQLite and ``INSERT ... ON
+    DUPLICATE KEY UPDATE`` on MySQL, and an UPDATE followed by an INSERT on
+    other backends. Returns the resulting row as a persistent instance. When
+    ``where`` rejects the update the existing row is returned unchanged.
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        stmt = sqlite_insert(model).values(**values).on_conflict_do_update(
+            index_elements=list(conflict_columns),
+            set_=set_,
+            where=where
+        ).returning(model)
+        result = await db.scalars(stmt, execution_options=POPULATE_EXISTING)
+        instance = result.one_or_none()
+        if instance is not None:
+            return instance
+    elif dialect == "mysql":
+        await db.execute(mysql_insert(model).values(**values).on_duplicate_key_update(
+            _mysql_assignments(model, set_, where)
+        ))
+    else:
+        await _update_or_insert(db, model, values, conflict_columns, set_, where)
+
+    # MySQL has no RETURNING, and SQLite returns nothing when ``where`` blocked
+    # the update; read the row back by its unique key
+    query = select(model).where(_key(model, values, conflict_columns))
+    result = await db.scalars(query, execution_options=POPULATE_EXISTING)
+    return result.one()
+
+
+def _key(model, values: Dict[str, Any], conflict_columns: Sequence[str]):
+    table = model.__table__
+    return and_(*(table.c[name] == values[name] for name in conflict_columns))
+
+
+async def _update_or_insert(
+    db: AsyncSession,
+    model,
+    values: Dict[str, Any],
+    conflict_columns: Sequence[str],
+    set_: Dict[str, Any],
+    where=None
+) -> None:
+    """Portable upsert for backends without a native statement
+
+    Updates the existing row first and inserts only when nothing matched.
+    The insert runs in a savepoint; if it hits the unique constraint (the row
+    exists but ``where`` rejected the update, or a concurrent insert won) the
+    update is tried once more against the now existing row.
+    """
+    table = model.__table__
+    criteria = [_key(model, values, conflict_columns)]
+    if where is not None:
+        criteria.append(where)
+    stmt = update(table).where(*criteria).values(**set_)
+
+    if (await db.execute(stmt)).rowcount:
+        return
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(table).values(**values))
+    except IntegrityError:
+        await db.execute(stmt)
+
+
+def _mysql_assignments(model, set_: Dict[str, Any], where):
+    """Build ordered ON DUPLICATE KEY UPDATE assignments
+
+    MySQL has no WHERE clause here, so each assignment keeps the current value
+    unless ``where`` holds. Assignments are evaluated left to right against the
+    already-updated row, so columns referenced by ``where`` are written last.
+    """
+    table = model.__table__
+    if where is None:
+        return list(set_.items())
+
+    referenced = {element.key for element in iterate(where) if isinstance(element, Column)}
+    ordered = sorted(set_.items(), key=lambda item: item[0] in referenced)
+    return [
+        (name, case((where, value), else_=table.c[name]))
+        for name, value in ordered
+    ]
+
@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -8,8 +8,12 @@ from app.api import auth, users, oauth, two_factor_auth, devices
 from app.core.config import settings
 from app.core import rate_limit
 from app.core.logging import app_logger as logger, setup_uvicorn_logging
+from app.core.response_cache import NotModified
 from app.db.database import db_manager
-from app.tasks import cleanup
+from app.tasks.scheduler import scheduler
+from app.services.activity_buffer import activity_buffer
+from app.services.audit import login_history_ingestor
+from app.services.geoip import geoip_service
 from app.middleware.logging import setup_logging_middleware
 
 
@@ -27,15 +31,23 @@ async def lifespan(app: FastAPI):
     database.AsyncSessionLocal = db_manager.async_session_maker
     
     # Start background tasks
-    cleanup.start_background_tasks()
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start(db_manager.async_session_maker)
     await rate_limit.rate_limit_store.start_cleanup()
+    await activity_buffer.start(db_manager.async_session_maker)
+    await login_history_ingestor.start(db_manager.audit_session_maker)
+    geoip_service.open()
     
     logger.info("Application startup complete")
     yield
     
     # Shutdown
     logger.info("Application shutdown started")
+    await scheduler.stop()
     await rate_limit.rate_limit_store.stop_cleanup()
+    await activity_buffer.stop()  # Flush pending activity timestamps
+    await login_history_ingestor.stop()  # Write queued login history
+    geoip_service.close()
     await db_manager.close()
     logger.info("Application shutdown complete")
 
@@ -54,6 +66,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Add rate limiting middleware
@@ -75,6 +88,11 @@ setup_logging_middleware(app)
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified):
+    return Response(status_code=304, headers={"ETag": exc.etag})
+
+
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(oauth.router, prefix="/api/v1/oauth", tags=["oauth"])
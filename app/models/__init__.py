@@ -4,7 +4,9 @@ from app.models.email_verification import EmailVerification
 from app.models.password_reset import PasswordReset
 from app.models.oauth_account import OAuthAccount
 from app.models.two_factor_auth import TwoFactorAuth
+from app.models.two_factor_backup_code import TwoFactorBackupCode
 from app.models.user_device import UserDevice
 from app.models.login_history import LoginHistory
+from app.models.job_lease import JobLease
 
-__all__ = ["User", "RefreshToken", "EmailVerification", "PasswordReset", "OAuthAccount", "TwoFactorAuth", "UserDevice", "LoginHistory"]
+__all__ = ["User", "RefreshToken", "EmailVerification", "PasswordReset", "OAuthAccount", "TwoFactorAuth", "TwoFactorBackupCode", "UserDevice", "LoginHistory", "JobLease"]
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+
+from app.db.base import Base
+
+
+class JobLease(Base):
+    __tablename__ = "job_leases"
+    
+    # One row per scheduled job; whoever moves expires_at forward owns the
+    # current run, everyone else waits until it passes
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(255), nullable=False)  # host:pid/claim of the last claimant
+    expires_at = Column(DateTime(timezone=True), nullable=False)
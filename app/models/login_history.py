@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -20,4 +20,10 @@ class LoginHistory(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     
     # Relationships
-    user = relationship("User", back_populates="login_history")
\ No newline at end of file
+    user = relationship("User", back_populates="login_history")
+    
+    # History listing and failed-attempt counting both filter by user and sort/range on time
+    __table_args__ = (
+        Index('ix_login_history_user_created', 'user_id', 'created_at'),
+        Index('ix_login_history_user_status_created', 'user_id', 'status', 'created_at'),
+    )
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -10,14 +10,19 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    token = Column(String(255), unique=True, index=True, nullable=False)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256 hex of the JWT
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     device_info = Column(String(255), nullable=True)  # Device/Browser info
     ip_address = Column(String(45), nullable=True)  # IPv4/IPv6
-    is_active = Column(Boolean, default=True, nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False, index=True)  # Revoked tokens are purged by cleanup
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
     last_used_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationship
-    user = relationship("User", back_populates="refresh_tokens")
\ No newline at end of file
+    user = relationship("User", back_populates="refresh_tokens")
+    
+    # Covers the active-token listing for a user (user_id + is_active + expires_at)
+    __table_args__ = (
+        Index('ix_refresh_tokens_user_active_expires', 'user_id', 'is_active', 'expires_at'),
+    )
\ No newline at end of file
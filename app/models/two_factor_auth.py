@@ -11,7 +11,6 @@ class TwoFactorAuth(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     secret = Column(String(255), nullable=False)  # Encrypted TOTP secret
-    backup_codes = Column(String(1000), nullable=True)  # JSON encoded backup codes
     is_enabled = Column(Boolean, default=False, nullable=False)
     enabled_at = Column(DateTime(timezone=True), nullable=True)
     last_used_at = Column(DateTime(timezone=True), nullable=True)
@@ -19,4 +18,5 @@ class TwoFactorAuth(Base):
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
-    user = relationship("User", back_populates="two_factor_auth")
\ No newline at end of file
+    user = relationship("User", back_populates="two_factor_auth")
+    backup_codes = relationship("TwoFactorBackupCode", back_populates="two_factor_auth", cascade="all, delete-orphan")
\ No newline at end of file
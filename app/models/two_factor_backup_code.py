@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class TwoFactorBackupCode(Base):
+    __tablename__ = "two_factor_backup_codes"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    two_factor_auth_id = Column(Integer, ForeignKey("two_factor_auth.id"), nullable=False)
+    code_hash = Column(String(64), nullable=False)  # hash_backup_code(user_id, code)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
+    
+    # Relationship
+    two_factor_auth = relationship("TwoFactorAuth", back_populates="backup_codes")
+    
+    # A code is verified and consumed with one UPDATE on (two_factor_auth_id, code_hash)
+    __table_args__ = (
+        Index('ix_two_factor_backup_codes_auth_hash', 'two_factor_auth_id', 'code_hash', unique=True),
+    )
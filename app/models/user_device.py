@@ -20,7 +20,7 @@ class UserDevice(Base):
     ip_address = Column(String(45), nullable=True)
     location = Column(String(255), nullable=True)  # City, Country
     is_trusted = Column(Boolean, default=False, nullable=False)
-    last_active = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    last_active = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     
     # Relationships
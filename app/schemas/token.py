@@ -8,6 +8,14 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class TwoFactorChallenge(BaseModel):
+    """Partial login: the access token is only good for /auth/verify-2fa"""
+    access_token: str
+    token_type: str = "bearer"
+    requires_2fa: bool = True
+    device_id: str
+
+
 class TokenData(BaseModel):
     email: str
 
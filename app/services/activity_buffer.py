@@ -0,0 +1,129 @@
+"""
+Write-behind buffer for activity timestamps
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
+
+from sqlalchemy import Table, update, case
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.db.base import Base
+
+
+class ActivityBuffer:
+    """Coalesce "last seen" timestamp updates and write them in batches
+    
+    ``touch`` records the newest timestamp per row in memory; a background
+    task flushes all pending rows every ``flush_interval`` seconds with one
+    ``UPDATE ... SET column = CASE id ... END`` statement per column and batch.
+    ``defer`` does the same for values that are costly to compute; they are
+    resolved in the flush task instead of on the request path.
+    """
+    
+    def __init__(self, flush_interval: float, batch_size: int = 500):
+        self._pending: Dict[Tuple[Type[Base], str], Dict[int, datetime]] = defaultdict(dict)
+        self._deferred: Dict[Tuple[Union[Type[Base], Table], str], Dict[int, Callable[[], Any]]] = defaultdict(dict)
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._session_maker: Optional[async_sessionmaker] = None
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+    
+    def touch(self, model: Type[Base], row_id: int, column: str, at: Optional[datetime] = None) -> None:
+        """Record that ``column`` of row ``row_id`` should be set to ``at``"""
+        at = at or datetime.utcnow()
+        rows = self._pending[(model, column)]
+        current = rows.get(row_id)
+        if current is None or at > current:
+            rows[row_id] = at
+    
+    def defer(self, model: Union[Type[Base], Table], row_id: int, column: str, resolve: Callable[[], Any]) -> None:
+        """Record that ``column`` of row ``row_id`` should be set to ``resolve()``
+        
+        ``model`` may also be a Table. The row must live in the main
+        database, the only one the buffer flushes to. A None result leaves
+        the column unchanged.
+        """
+        self._deferred[(model, column)][row_id] = resolve
+    
+    @property
+    def pending_count(self) -> int:
+        return sum(len(rows) for rows in self._pending.values()) + sum(len(rows) for rows in self._deferred.values())
+    
+    async def start(self, session_maker: async_sessionmaker):
+        """Start the background flush task"""
+        self._session_maker = session_maker
+        self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop(self):
+        """Stop the background task and flush whatever is still pending"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+    
+    async def _flush_loop(self):
+        """Background task to flush pending timestamps"""
+        while True:
+            try:
+                await asyncio.sleep(self._flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error flushing activity timestamps: {e}")
+    
+    async def flush(self, session_maker: Optional[async_sessionmaker] = None) -> int:
+        """Write all pending timestamps, returns the number of rows updated"""
+        session_maker = session_maker or self._session_maker
+        if session_maker is None or not (self._pending or self._deferred):
+            return 0
+        
+        async with self._flush_lock:
+            pending, self._pending = self._pending, defaultdict(dict)
+            deferred, self._deferred = self._deferred, defaultdict(dict)
+            values = dict(pending)
+            for key, rows in deferred.items():
+                resolved = {row_id: resolve() for row_id, resolve in rows.items()}
+                values[key] = {row_id: value for row_id, value in resolved.items() if value is not None}
+            count = 0
+            try:
+                async with session_maker() as db:
+                    for (model, column), rows in values.items():
+                        table = getattr(model, "__table__", model)
+                        items = list(rows.items())
+                        for start in range(0, len(items), self._batch_size):
+                            batch = dict(items[start:start + self._batch_size])
+                            await db.execute(
+                                update(table)
+                                .where(table.c.id.in_(batch.keys()))
+                                .values({column: case(batch, value=table.c.id)})
+                            )
+                            count += len(batch)
+                    await db.commit()
+            except Exception:
+                # Put the entries back so the next flush retries them
+                for (model, column), rows in pending.items():
+                    for row_id, at in rows.items():
+                        self.touch(model, row_id, column, at)
+                for (model, column), rows in deferred.items():
+                    for row_id, resolve in rows.items():
+                        self._deferred[(model, column)].setdefault(row_id, resolve)
+                raise
+        
+        return count
+
+
+# Global activity buffer
+activity_buffer = ActivityBuffer(flush_interval=settings.ACTIVITY_FLUSH_INTERVAL)
+
+
+__all__ = ["activity_buffer", "ActivityBuffer"]
@@ -0,0 +1,193 @@
+"""
+Login history ingestion
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.core.response_cache import LOGIN_HISTORY, response_cache
+from app.db.partitions import login_history_partitions, month_start
+from app.services.geoip import geoip_service
+
+_STOP = object()
+
+
+async def login_history_table(db: AsyncSession, created_at: datetime) -> Table:
+    """Table (monthly partition when enabled) a record created at ``created_at`` goes to"""
+    return await db.run_sync(
+        lambda session: login_history_partitions.ensure(session.connection(), created_at)
+    )
+
+
+async def write_login_history(db: AsyncSession, records: List[Dict[str, Any]]) -> None:
+    """Bulk-insert records, one executemany INSERT per target table
+    
+    Records without a location get one from GeoIP here, so queued records
+    are resolved in the background rather than on the request path.
+    """
+    by_month = defaultdict(list)
+    for record in records:
+        if not record.get("location"):
+            record["location"] = geoip_service.lookup(record.get("ip_address"))
+        by_month[month_start(record["created_at"])].append(record)
+    
+    for month, rows in by_month.items():
+        table = await login_history_table(db, month)
+        await db.execute(insert(table), rows)
+
+
+class LoginHistoryIngestor:
+    """Queue login history records and bulk-insert them in the background
+    
+    Records are written with a single ``executemany`` INSERT per batch, once
+    ``batch_size`` records are queued or ``batch_timeout`` seconds after the
+    first record of a batch arrived. ``overflow_policy`` decides what happens
+    when the queue is full.
+    
+    A batch that fails to write is retried with exponential backoff from
+    ``retry_delay`` up to ``max_retry_delay`` seconds, while new records keep
+    queuing behind it. It is only given up (and counted in ``dropped``) when
+    the policy says so: with drop_oldest once the queue is full, since the
+    batch holds the oldest records, and on shutdown.
+    """
+    
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        batch_timeout: float,
+        overflow_policy: str = "block",
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.overflow_policy = overflow_policy
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._session_maker: Optional[async_sessionmaker] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task = None
+    
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+    
+    async def start(self, session_maker: async_sessionmaker):
+        """Start the background writer"""
+        self._session_maker = session_maker
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Write everything still queued and stop the background writer
+        
+        Batches that fail to write during shutdown are dropped, not retried.
+        """
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+    
+    async def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a record, returns False if it was dropped"""
+        if self.overflow_policy == "block":
+            await self._queue.put(record)
+            return True
+        
+        if self.overflow_policy == "drop_newest":
+            try:
+                self._queue.put_nowait(record)
+                return True
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return False
+        
+        # drop_oldest
+        while True:
+            try:
+                self._queue.put_nowait(record)
+                return True
+            except asyncio.QueueFull:
+                self._queue.get_nowait()
+                self.dropped += 1
+    
+    async def _run(self):
+        """Collect records into batches and write them"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            
+            batch = [item]
+            deadline = loop.time() + self.batch_timeout
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._write(batch)
+    
+    async def _write(self, batch: List[Dict[str, Any]]):
+        """Bulk-insert one batch, retrying until it is written or given up"""
+        delay = self.retry_delay
+        while True:
+            try:
+                async with self._session_maker() as db:
+                    await write_login_history(db, batch)
+                    await db.commit()
+                break
+            except Exception as e:
+                if self._stopping.is_set() or (self.overflow_policy == "drop_oldest" and self._queue.full()):
+                    self.dropped += len(batch)
+                    logger.error(f"Dropped {len(batch)} login history records after a failed write: {e}")
+                    return
+                logger.warning(f"Failed to write {len(batch)} login history records, retrying in {delay:g}s: {e}")
+                try:
+                    # Woken early by stop()
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self.max_retry_delay)
+        
+        self.written += len(batch)
+        for user_id in {record["user_id"] for record in batch}:
+            response_cache.invalidate(user_id, LOGIN_HISTORY)
+
+
+# Global login history ingestor
+login_history_ingestor = LoginHistoryIngestor(
+    max_queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    batch_timeout=settings.AUDIT_BATCH_TIMEOUT,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    retry_delay=settings.AUDIT_RETRY_DELAY,
+    max_retry_delay=settings.AUDIT_MAX_RETRY_DELAY
+)
+
+
+__all__ = ["login_history_ingestor", "LoginHistoryIngestor", "login_history_table", "write_login_history"]
@@ -1,53 +1,61 @@
 """
 Device Management Service
 """
-import hashlib
 import json
+from functools import partial
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, update
-from user_agents import parse
+from sqlalchemy import select, and_, or_, update, func, insert, delete, lambda_stmt
+from sqlalchemy.orm import aliased
 
 from app.models.user_device import UserDevice
 from app.models.login_history import LoginHistory
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.pagination import Cursor
+from app.core.response_cache import DEVICES, LOGIN_HISTORY, response_cache
+from app.core.user_agent import parse_user_agent
+from app.db.database import maybe_commit
+from app.db.bulk import delete_in_chunks
+from app.db.upsert import upsert
+from app.db.partitions import login_history_partitions
+from app.services.activity_buffer import activity_buffer
+from app.services.audit import login_history_ingestor, login_history_table
+from app.services.geoip import geoip_service
 from app.core.logging import app_logger as logger
 
 
+def _login_history_entity(table):
+    """LoginHistory mapped onto a monthly partition table"""
+    if table is LoginHistory.__table__:
+        return LoginHistory
+    return aliased(LoginHistory, table, adapt_on_names=True)
+
+
 class DeviceManagementService:
     """Service for managing user devices and login history"""
     
+    def __init__(self):
+        # When this worker last wrote a device, and from which IP and location,
+        # keyed by (user_id, device_id); only used to skip repeat writes
+        self.recent_devices = LRUCache(settings.DEVICE_CACHE_SIZE)
+    
     def generate_device_id(self, user_agent: str, ip_address: str) -> str:
         """Generate a unique device ID based on user agent and IP"""
-        # Parse user agent
-        ua = parse(user_agent)
-        
-        # Create device fingerprint
-        fingerprint = f"{ua.browser.family}:{ua.browser.version_string}:{ua.os.family}:{ua.os.version_string}"
-        
-        # Hash the fingerprint for consistency
-        return hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+        # Hash of the browser and OS, computed once per distinct user agent
+        return parse_user_agent(user_agent).fingerprint
     
     def parse_user_agent(self, user_agent: str) -> Dict[str, Any]:
         """Parse user agent string to extract device info"""
-        ua = parse(user_agent)
-        
-        # Determine device type
-        if ua.is_mobile:
-            device_type = "mobile"
-        elif ua.is_tablet:
-            device_type = "tablet"
-        else:
-            device_type = "desktop"
-        
+        ua = parse_user_agent(user_agent)
         return {
-            "device_type": device_type,
-            "browser": ua.browser.family,
-            "browser_version": ua.browser.version_string,
-            "os": ua.os.family,
-            "os_version": ua.os.version_string,
-            "device_name": f"{ua.browser.family} on {ua.os.family}"
+            "device_type": ua.device_type,
+            "browser": ua.browser,
+            "browser_version": ua.browser_version,
+            "os": ua.os,
+            "os_version": ua.os_version,
+            "device_name": ua.device_name
         }
     
     async def register_device(
@@ -58,37 +66,66 @@ class DeviceManagementService:
         ip_address: str,
         location: Optional[str] = None
     ) -> UserDevice:
-        """Register or update a user device"""
-        device_id = self.generate_device_id(user_agent, ip_address)
-        device_info = self.parse_user_agent(user_agent)
+        """Register or update a user device
         
-        # Check if device exists
-        device = await self.get_device(db, user_id, device_id)
+        A device this worker wrote less than DEVICE_TOUCH_INTERVAL seconds ago
+        from the same IP is not written again, only read back, so repeat logins
+        cost no database write. Trust status always comes from the database,
+        since another worker may have trusted or removed the device since.
+        """
+        ua = parse_user_agent(user_agent)
+        device_id = ua.fingerprint
+        key = (user_id, device_id)
         
-        if device:
-            # Update last active
-            device.last_active = datetime.utcnow()
-            device.ip_address = ip_address
-            if location:
-                device.location = location
-        else:
-            # Create new device
-            device = UserDevice(
-                user_id=user_id,
-                device_id=device_id,
-                device_name=device_info["device_name"],
-                device_type=device_info["device_type"],
-                browser=device_info["browser"],
-                browser_version=device_info["browser_version"],
-                os=device_info["os"],
-                os_version=device_info["os_version"],
-                ip_address=ip_address,
-                location=location
-            )
-            db.add(device)
+        now = datetime.utcnow()
+        cached = self.recent_devices.get(key)
+        if (
+            cached is not None
+            and cached["ip_address"] == ip_address
+            and (location is None or cached["location"] == location)
+            and now - cached["written_at"] < timedelta(seconds=settings.DEVICE_TOUCH_INTERVAL)
+        ):
+            device = await self.get_device(db, user_id, device_id)
+            if device is not None:
+                return device
         
-        await db.commit()
-        await db.refresh(device)
+        changes = {"last_active": now, "ip_address": ip_address}
+        if location:
+            changes["location"] = location
+        
+        # Insert the device or refresh its activity in a single statement;
+        # the (user_id, device_id) unique constraint arbitrates concurrent logins
+        device = await upsert(
+            db,
+            UserDevice,
+            values={
+                "user_id": user_id,
+                "device_id": device_id,
+                "device_name": ua.device_name,
+                "device_type": ua.device_type,
+                "browser": ua.browser,
+                "browser_version": ua.browser_version,
+                "os": ua.os,
+                "os_version": ua.os_version,
+                "ip_address": ip_address,
+                "location": location,
+                "last_active": now,
+                "created_at": now
+            },
+            conflict_columns=["user_id", "device_id"],
+            set_=changes
+        )
+        
+        await maybe_commit(db)
+        response_cache.invalidate(user_id, DEVICES)
+        if not location:
+            # GeoIP is resolved by the activity buffer's flush, off the request path
+            activity_buffer.defer(UserDevice, device.id, "location", partial(geoip_service.lookup, ip_address))
+        self.recent_devices.set(key, {
+            "ip_address": ip_address,
+            "location": device.location,
+            "written_at": now
+        })
         
         logger.info(f"Device registered/updated for user {user_id}: {device_id}")
         return device
@@ -100,12 +137,10 @@ class DeviceManagementService:
         device_id: str
     ) -> Optional[UserDevice]:
         """Get a specific device"""
-        query = select(UserDevice).where(
-            and_(
-                UserDevice.user_id == user_id,
-                UserDevice.device_id == device_id
-            )
-        )
+        query = lambda_stmt(lambda: select(UserDevice).where(
+            UserDevice.user_id == user_id,
+            UserDevice.device_id == device_id
+        ))
         result = await db.execute(query)
         return result.scalar_one_or_none()
     
@@ -135,6 +170,8 @@ class DeviceManagementService:
         
         device.is_trusted = True
         await db.commit()
+        self.recent_devices.pop((user_id, device_id))
+        response_cache.invalidate(user_id, DEVICES)
         
         logger.info(f"Device {device_id} marked as trusted for user {user_id}")
         return True
@@ -152,6 +189,8 @@ class DeviceManagementService:
         
         await db.delete(device)
         await db.commit()
+        self.recent_devices.pop((user_id, device_id))
+        response_cache.invalidate(user_id, DEVICES)
         
         logger.info(f"Device {device_id} removed for user {user_id}")
         return True
@@ -168,21 +207,38 @@ class DeviceManagementService:
         location: Optional[str] = None,
         failure_reason: Optional[str] = None
     ) -> LoginHistory:
-        """Record a login attempt"""
-        login_record = LoginHistory(
-            user_id=user_id,
-            device_id=device_id,
-            ip_address=ip_address,
-            user_agent=user_agent[:500],  # Limit to 500 chars
-            location=location,
-            login_method=login_method,
-            status=status,
-            failure_reason=failure_reason
-        )
+        """Record a login attempt
         
-        db.add(login_record)
-        await db.commit()
-        await db.refresh(login_record)
+        When the login history ingestor is running the record is queued and
+        bulk-inserted in the background; the returned object is not persisted yet.
+        """
+        record = {
+            "user_id": user_id,
+            "device_id": device_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent[:500],  # Limit to 500 chars
+            "location": location,
+            "login_method": login_method,
+            "status": status,
+            "failure_reason": failure_reason,
+            "created_at": datetime.utcnow()
+        }
+        
+        if login_history_ingestor.is_running:
+            await login_history_ingestor.submit(record)
+            logger.info(f"Login attempt queued for user {user_id}: {status}")
+            return LoginHistory(**record)
+        
+        # Resolved before the insert rather than deferred to the activity
+        # buffer: ``db`` may be the audit database, which the buffer does not
+        # flush to
+        if not location:
+            record["location"] = geoip_service.lookup(ip_address)
+        table = await login_history_table(db, record["created_at"])
+        result = await db.execute(insert(table).values(**record))
+        login_record = LoginHistory(id=result.inserted_primary_key[0], **record)
+        await maybe_commit(db)
+        response_cache.invalidate(user_id, LOGIN_HISTORY)
         
         logger.info(f"Login attempt recorded for user {user_id}: {status}")
         return login_record
@@ -192,17 +248,49 @@ class DeviceManagementService:
         db: AsyncSession,
         user_id: int,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[Cursor] = None
     ) -> List[LoginHistory]:
-        """Get login history for a user"""
-        query = select(LoginHistory).where(
-            LoginHistory.user_id == user_id
-        ).order_by(
-            LoginHistory.created_at.desc()
-        ).limit(limit).offset(offset)
+        """Get login history for a user, newest first
         
-        result = await db.execute(query)
-        return result.scalars().all()
+        Pass ``cursor`` (the position of the last record of the previous page)
+        for keyset pagination; ``offset`` is only kept for backward compatibility.
+        Monthly partitions are read newest first until the page is full.
+        """
+        until = cursor[0] if cursor else None
+        tables = await db.run_sync(
+            lambda session: login_history_partitions.read_tables(session.connection(), until=until)
+        )
+        # Across several partitions the offset is applied after merging
+        partitioned_offset = offset if len(tables) > 1 and not cursor else 0
+        wanted = limit + partitioned_offset
+        
+        records = []
+        for table in tables:
+            history = _login_history_entity(table)
+            query = select(history).where(
+                history.user_id == user_id
+            ).order_by(
+                history.created_at.desc(),
+                history.id.desc()
+            ).limit(wanted - len(records))
+            
+            if cursor:
+                created_at, record_id = cursor
+                # The redundant upper bound lets the planner use a range scan on the index
+                query = query.where(
+                    history.created_at <= created_at,
+                    or_(history.created_at < created_at, history.id < record_id)
+                )
+            elif not partitioned_offset:
+                query = query.offset(offset)
+            
+            result = await db.execute(query)
+            records.extend(result.scalars().all())
+            if len(records) >= wanted:
+                break
+        
+        return records[partitioned_offset:]
     
     async def get_recent_failed_attempts(
         self,
@@ -212,17 +300,43 @@ class DeviceManagementService:
     ) -> int:
         """Get count of recent failed login attempts"""
         since = datetime.utcnow() - timedelta(minutes=minutes)
+        tables = await db.run_sync(
+            lambda session: login_history_partitions.read_tables(session.connection(), since=since)
+        )
         
-        query = select(LoginHistory).where(
-            and_(
-                LoginHistory.user_id == user_id,
-                LoginHistory.status == "failed",
-                LoginHistory.created_at > since
+        count = 0
+        for table in tables:
+            query = select(func.count()).select_from(table).where(
+                and_(
+                    table.c.user_id == user_id,
+                    table.c.status == "failed",
+                    table.c.created_at > since
+                )
             )
+            result = await db.execute(query)
+            count += result.scalar_one()
+        return count
+    
+    async def delete_login_history(self, db: AsyncSession, user_id: int) -> int:
+        """Delete a user's login history from every partition
+        
+        Month tables, partitioned MySQL tables and a separate audit database
+        have no foreign key to users, so deleting a user does not cascade to
+        them. Call this with the audit session when a user is deleted.
+        """
+        tables = await db.run_sync(
+            lambda session: login_history_partitions.read_tables(session.connection())
         )
+        if LoginHistory.__table__ not in tables:
+            tables.append(LoginHistory.__table__)
         
-        result = await db.execute(query)
-        return len(result.scalars().all())
+        deleted = 0
+        for table in tables:
+            result = await db.execute(delete(table).where(table.c.user_id == user_id))
+            deleted += result.rowcount
+        await db.commit()
+        response_cache.invalidate(user_id, LOGIN_HISTORY)
+        return deleted
     
     async def is_device_trusted(
         self,
@@ -237,25 +351,22 @@ class DeviceManagementService:
     async def cleanup_inactive_devices(
         self,
         db: AsyncSession,
-        days: int = 90
+        days: int = 90,
+        deadline: Optional[float] = None
     ) -> int:
-        """Remove devices inactive for specified days"""
+        """Remove devices inactive for specified days in chunks"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        query = select(UserDevice).where(
-            UserDevice.last_active < cutoff_date
+        count = await delete_in_chunks(
+            db,
+            UserDevice,
+            UserDevice.last_active < cutoff_date,
+            deadline=deadline
         )
         
-        result = await db.execute(query)
-        devices = result.scalars().all()
-        
-        count = len(devices)
-        for device in devices:
-            await db.delete(device)
-        
-        await db.commit()
-        
         if count > 0:
+            # Deleted rows span many users; drop every cached response
+            response_cache.clear()
             logger.info(f"Cleaned up {count} inactive devices")
         
         return count
@@ -4,6 +4,8 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.db.bulk import delete_in_chunks
+from app.db.upsert import upsert
 from app.models.email_verification import EmailVerification
 from app.models.user import User
 from app.services.email import email_service
@@ -23,29 +25,24 @@ class EmailVerificationService:
         # Set expiry (24 hours)
         expires_at = datetime.utcnow() + timedelta(hours=24)
         
-        # Check if verification already exists
-        query = select(EmailVerification).where(EmailVerification.user_id == user_id)
-        result = await db.execute(query)
-        existing = result.scalar_one_or_none()
-        
-        if existing:
-            # Update existing token
-            existing.token = token
-            existing.expires_at = expires_at
-            existing.verified_at = None
-            await db.commit()
-            return existing
-        else:
-            # Create new verification
-            verification = EmailVerification(
-                user_id=user_id,
-                token=token,
-                expires_at=expires_at
-            )
-            db.add(verification)
-            await db.commit()
-            await db.refresh(verification)
-            return verification
+        # Create the verification or replace its token in one statement
+        verification = await upsert(
+            db,
+            EmailVerification,
+            values={
+                "user_id": user_id,
+                "token": token,
+                "expires_at": expires_at
+            },
+            conflict_columns=["user_id"],
+            set_={
+                "token": token,
+                "expires_at": expires_at,
+                "verified_at": None
+            }
+        )
+        await db.commit()
+        return verification
     
     @staticmethod
     async def verify_email(
@@ -85,10 +82,8 @@ class EmailVerificationService:
         user_id: int
     ) -> bool:
         """Send verification email to user"""
-        # Get user
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
+        # Get user (served from the identity map right after registration)
+        user = await db.get(User, user_id)
         
         if not user or user.is_verified:
             return False
@@ -122,6 +117,24 @@ class EmailVerificationService:
             return False
         
         return await EmailVerificationService.send_verification_email(db, user.id)
+    
+    @staticmethod
+    async def cleanup_stale_verifications(db: AsyncSession, deadline: Optional[float] = None) -> int:
+        """Delete verified and expired verification tokens in chunks"""
+        # Two passes so each one can walk its own index
+        verified = await delete_in_chunks(
+            db,
+            EmailVerification,
+            EmailVerification.verified_at.isnot(None),
+            deadline=deadline
+        )
+        expired = await delete_in_chunks(
+            db,
+            EmailVerification,
+            EmailVerification.expires_at <= datetime.utcnow(),
+            deadline=deadline
+        )
+        return verified + expired
 
 
 email_verification_service = EmailVerificationService()
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+GeoIP location lookups against a local MaxMind-format database
+"""
+import ipaddress
+from typing import Any, Dict, Optional
+
+import maxminddb
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+
+
+def format_location(record: Optional[Dict[str, Any]]) -> Optional[str]:
+    """"City, Country" from a GeoLite2/GeoIP2 City or Country record"""
+    if not record:
+        return None
+    city = record.get("city", {}).get("names", {}).get("en")
+    country = record.get("country", {}).get("names", {}).get("en")
+    return ", ".join(name for name in (city, country) if name) or None
+
+
+class GeoIPService:
+    """Resolve IP addresses to a "City, Country" location
+
+    The database file is memory-mapped through libmaxminddb (MODE_MMAP_EXT,
+    falling back to the pure Python MODE_MMAP reader when the C extension is
+    missing), so the OS page cache holds it once for every worker on the
+    host. Results, including misses, are kept in an LRU cache. Lookups return
+    None when GEOIP_DATABASE_PATH is not set or the file is missing.
+    """
+
+    def __init__(self, database_path: str, cache_size: int):
+        self.database_path = database_path
+        self.cache = LRUCache(cache_size)
+        self._reader: Optional[maxminddb.Reader] = None
+        self._opened = False
+
+    def open(self, database_path: Optional[str] = None) -> bool:
+        """Open the database, returns whether lookups are available"""
+        self.close()
+        self.database_path = database_path or self.database_path
+        self._opened = True
+        if not self.database_path:
+            return False
+        try:
+            try:
+                # libmaxminddb over mmap; about 20x faster than the pure Python reader
+                self._reader = maxminddb.open_database(self.database_path, mode=maxminddb.MODE_MMAP_EXT)
+            except ValueError:
+                # The C extension is not installed
+                self._reader = maxminddb.open_database(self.database_path, mode=maxminddb.MODE_MMAP)
+        except (OSError, maxminddb.InvalidDatabaseError) as e:
+            logger.warning(f"GeoIP database {self.database_path} unavailable: {e}")
+            return False
+        logger.info(f"GeoIP database loaded: {self._reader.metadata().database_type}")
+        return True
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+        self._reader = None
+        self._opened = False
+        self.cache.clear()
+
+    def lookup(self, ip_address: Optional[str]) -> Optional[str]:
+        """Location for an IP address, or None if unknown"""
+        if not ip_address:
+            return None
+        if not self._opened:
+            self.open()
+        if self._reader is None:
+            return None
+
+        location = self.cache.get(ip_address, default=False)
+        if location is not False:
+            return location
+
+        try:
+            address = ipaddress.ip_address(ip_address)
+            # Private, loopback and link-local ranges are not in the database
+            location = None if not address.is_global else format_location(self._reader.get(address))
+        except ValueError:
+            # Not an IP address, or IPv6 against an IPv4-only database
+            location = None
+        self.cache.set(ip_address, location)
+        return location
+
+
+# Global GeoIP service
+geoip_service = GeoIPService(settings.GEOIP_DATABASE_PATH, settings.GEOIP_CACHE_SIZE)
+
+
+__all__ = ["geoip_service", "GeoIPService", "format_location"]
@@ -330,7 +330,6 @@ class OAuthService:
         )
         db.add(oauth_account)
         await db.commit()
-        await db.refresh(oauth_account)
         return oauth_account
 
 
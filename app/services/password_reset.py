@@ -4,6 +4,7 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 
+from app.db.bulk import delete_in_chunks
 from app.models.password_reset import PasswordReset
 from app.models.user import User
 from app.services.email import email_service
@@ -125,18 +126,16 @@ class PasswordResetService:
         return reset_token is not None
     
     @staticmethod
-    async def cleanup_expired_tokens(db: AsyncSession) -> int:
-        """Clean up expired reset tokens"""
+    async def cleanup_expired_tokens(db: AsyncSession, deadline: Optional[float] = None) -> int:
+        """Clean up expired reset tokens in chunks"""
         cutoff = datetime.utcnow() - timedelta(days=7)
         
-        query = PasswordReset.__table__.delete().where(
-            PasswordReset.created_at < cutoff
+        return await delete_in_chunks(
+            db,
+            PasswordReset,
+            PasswordReset.created_at < cutoff,
+            deadline=deadline
         )
-        
-        result = await db.execute(query)
-        await db.commit()
-        
-        return result.rowcount
 
 
 password_reset_service = PasswordResetService()
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+QR code rendering off the event loop
+"""
+import asyncio
+import base64
+import io
+from typing import List, Literal, Optional, Union
+from urllib.parse import quote
+
+import qrcode
+
+QRFormat = Literal["png", "svg", "matrix"]
+
+# The SVG and matrix formats use a fixed mask instead of scoring all eight,
+# which is most of the cost of building the symbol. Any mask is valid, the
+# scoring only avoids patterns that are slightly harder to scan.
+FIXED_MASK = 0
+
+
+def _qr(data: str, border: int, mask_pattern: Optional[int] = None) -> qrcode.QRCode:
+    qr = qrcode.QRCode(version=1, box_size=10, border=border, mask_pattern=mask_pattern)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def _png(data: str) -> str:
+    img = _qr(data, border=5).make_image(fill_color="black", back_color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
+def _svg(data: str) -> str:
+    """One stroked path with a horizontal line per run of dark modules"""
+    matrix = _qr(data, border=4, mask_pattern=FIXED_MASK).get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x, pen = 0, None
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            # Absolute move to the first run of a row, relative after that
+            path.append(f"M{start},{y}.5h{x - start}" if pen is None else f"m{start - pen},0h{x - start}")
+            pen = x
+    svg = (
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {size} {size}' shape-rendering='crispEdges'>"
+        f"<path fill='#fff' d='M0,0h{size}v{size}H0z'/><path stroke='#000' d='{''.join(path)}'/></svg>"
+    )
+    # Only characters that are unsafe in a data URL are escaped
+    return "data:image/svg+xml," + quote(svg, safe=" ,.=:/'")
+
+
+def _matrix(data: str) -> List[str]:
+    """One hex string per row of modules, without the quiet zone
+
+    The leftmost module is the most significant bit, a set bit is dark, and
+    each row is padded with light modules to a multiple of four. The matrix
+    is square, so its width is the number of rows.
+    """
+    matrix = _qr(data, border=0, mask_pattern=FIXED_MASK).get_matrix()
+    size = len(matrix)
+    digits = (size + 3) // 4
+    return [
+        format(int("".join("1" if module else "0" for module in row), 2) << (digits * 4 - size), f"0{digits}x")
+        for row in matrix
+    ]
+
+
+RENDERERS = {"png": _png, "svg": _svg, "matrix": _matrix}
+
+
+def render_qr_code(data: str, qr_format: QRFormat = "png") -> Union[str, List[str]]:
+    """A PNG or SVG data URL, or the module matrix, for ``data``"""
+    return RENDERERS[qr_format](data)
+
+
+async def render_qr_code_async(data: str, qr_format: QRFormat = "png") -> Union[str, List[str]]:
+    """``render_qr_code`` on the default executor
+
+    Keeps the handler from blocking the event loop for the whole render.
+    The work is pure Python and holds the GIL, so it still competes with the
+    loop for CPU; the cheaper svg and matrix formats are what reduce that.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, render_qr_code, data, qr_format)
+
+
+__all__ = ["render_qr_code", "render_qr_code_async", "QRFormat"]
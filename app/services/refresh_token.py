@@ -1,12 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, delete
+from sqlalchemy import select, and_, or_, lambda_stmt
 
 from app.models.refresh_token import RefreshToken
 from app.models.user import User
-from app.core.security import generate_token
+from app.core.security import hash_token
 from app.core.config import settings
+from app.db.bulk import delete_in_chunks
+from app.db.database import maybe_commit
+from app.services.activity_buffer import activity_buffer
 
 
 class RefreshTokenService:
@@ -24,7 +27,7 @@ class RefreshTokenService:
         
         # Create refresh token record
         refresh_token = RefreshToken(
-            token=token,
+            token_hash=hash_token(token),
             user_id=user_id,
             device_info=device_info,
             ip_address=ip_address,
@@ -32,29 +35,27 @@ class RefreshTokenService:
         )
         
         db.add(refresh_token)
-        await db.commit()
-        await db.refresh(refresh_token)
+        await maybe_commit(db)
         
         return refresh_token
     
     @staticmethod
     async def get_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
         """Get a refresh token by token string"""
-        query = select(RefreshToken).where(
-            and_(
-                RefreshToken.token == token,
-                RefreshToken.is_active == True,
-                RefreshToken.expires_at > datetime.utcnow()
-            )
-        )
+        token_hash = hash_token(token)
+        now = datetime.utcnow()
+        query = lambda_stmt(lambda: select(RefreshToken).where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.is_active == True,
+            RefreshToken.expires_at > now
+        ))
         result = await db.execute(query)
         return result.scalar_one_or_none()
     
     @staticmethod
     async def update_last_used(db: AsyncSession, refresh_token: RefreshToken) -> None:
-        """Update the last used timestamp of a refresh token"""
-        refresh_token.last_used_at = datetime.utcnow()
-        await db.commit()
+        """Update the last used timestamp of a refresh token (written behind)"""
+        activity_buffer.touch(RefreshToken, refresh_token.id, "last_used_at")
     
     @staticmethod
     async def revoke_token(db: AsyncSession, token: str) -> bool:
@@ -62,7 +63,7 @@ class RefreshTokenService:
         refresh_token = await RefreshTokenService.get_refresh_token(db, token)
         if refresh_token:
             refresh_token.is_active = False
-            await db.commit()
+            await maybe_commit(db)
             return True
         return False
     
@@ -111,14 +112,17 @@ class RefreshTokenService:
         return result.scalars().all()
     
     @staticmethod
-    async def cleanup_expired_tokens(db: AsyncSession) -> int:
-        """Delete expired refresh tokens from the database"""
-        query = delete(RefreshToken).where(
-            RefreshToken.expires_at <= datetime.utcnow()
+    async def cleanup_expired_tokens(db: AsyncSession, deadline: Optional[float] = None) -> int:
+        """Delete expired and revoked refresh tokens in chunks"""
+        return await delete_in_chunks(
+            db,
+            RefreshToken,
+            or_(
+                RefreshToken.expires_at <= datetime.utcnow(),
+                RefreshToken.is_active.is_(False)
+            ),
+            deadline=deadline
         )
-        result = await db.execute(query)
-        await db.commit()
-        return result.rowcount
     
     @staticmethod
     async def validate_and_get_user(
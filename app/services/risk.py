@@ -0,0 +1,173 @@
+"""
+Login risk scoring
+"""
+import ipaddress
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.models.user_device import UserDevice
+from app.services.device_management import device_management_service
+
+# Points added per signal
+NEW_DEVICE_SCORE = 40
+NEW_NETWORK_SCORE = 30
+UNUSUAL_HOUR_SCORE = 15
+FAILED_ATTEMPT_SCORE = 5
+MAX_FAILED_ATTEMPTS_SCORE = 15
+
+# Successful logins needed before devices, networks and hours are judged
+MIN_BASELINE_LOGINS = 3
+# Devices and networks remembered per user, oldest forgotten first
+MAX_PROFILE_ITEMS = 20
+
+
+@lru_cache(maxsize=4096)
+def network_of(ip_address: str) -> str:
+    """The /24 (IPv4) or /48 (IPv6) network an address belongs to"""
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return ip_address
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def _remember(items: Dict[str, None], key: str) -> None:
+    items.pop(key, None)
+    items[key] = None
+    if len(items) > MAX_PROFILE_ITEMS:
+        del items[next(iter(items))]
+
+
+@dataclass
+class LoginProfile:
+    """What a user's successful logins usually look like"""
+
+    # Insertion-ordered sets, most recent last
+    devices: Dict[str, None] = field(default_factory=dict)
+    networks: Dict[str, None] = field(default_factory=dict)
+    # Successful logins per UTC hour of day
+    hours: List[int] = field(default_factory=lambda: [0] * 24)
+    logins: int = 0
+    # Failed password attempts since the last successful login
+    failures: int = 0
+
+    def observe(self, device_id: Optional[str], ip_address: str, at: datetime) -> None:
+        if device_id:
+            _remember(self.devices, device_id)
+        _remember(self.networks, network_of(ip_address))
+        self.hours[at.hour] += 1
+        self.logins += 1
+        self.failures = 0
+
+
+@dataclass
+class RiskAssessment:
+    score: int
+    reasons: List[str]
+
+    @property
+    def requires_2fa(self) -> bool:
+        return self.score >= settings.RISK_2FA_THRESHOLD
+
+    @property
+    def blocked(self) -> bool:
+        return self.score >= settings.RISK_BLOCK_THRESHOLD
+
+
+class RiskService:
+    """Score logins against an in-memory profile of each user's past logins
+
+    Profiles live in a bounded LRU cache per worker and are updated as logins
+    happen, so scoring is a handful of dictionary lookups. A profile missing
+    from the cache (after a restart, on another worker or after eviction) is
+    rebuilt from the user's recent login history inside that login: one
+    indexed query, paid once per user and worker. Scoring the login with an
+    empty profile instead would wave it through unscored.
+    """
+
+    def __init__(self, cache_size: int):
+        self.profiles = LRUCache(cache_size)
+
+    async def get_profile(self, db: AsyncSession, user_id: int) -> LoginProfile:
+        profile = self.profiles.get(user_id)
+        if profile is None:
+            profile = LoginProfile()
+            history = await device_management_service.get_login_history(
+                db, user_id, limit=settings.RISK_PROFILE_HISTORY
+            )
+            # Oldest first, so the most recent devices and networks are kept
+            for record in reversed(history):
+                if record.status == "success":
+                    profile.observe(record.device_id, record.ip_address, record.created_at)
+                elif record.status == "failed":
+                    profile.failures += 1
+            self.profiles.set(user_id, profile)
+        return profile
+
+    async def assess(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        device: UserDevice,
+        ip_address: str,
+        at: Optional[datetime] = None
+    ) -> RiskAssessment:
+        """Score a login that passed the password check"""
+        if not settings.RISK_SCORING_ENABLED:
+            return RiskAssessment(score=0, reasons=[])
+
+        profile = await self.get_profile(db, user_id)
+        hour = (at or datetime.utcnow()).hour
+        score, reasons = 0, []
+
+        if profile.logins >= MIN_BASELINE_LOGINS:
+            if device.device_id not in profile.devices and not device.is_trusted:
+                score += NEW_DEVICE_SCORE
+                reasons.append("new_device")
+            if network_of(ip_address) not in profile.networks:
+                score += NEW_NETWORK_SCORE
+                reasons.append("new_network")
+            if not any(profile.hours[(hour + offset) % 24] for offset in (-1, 0, 1)):
+                score += UNUSUAL_HOUR_SCORE
+                reasons.append("unusual_hour")
+
+        if profile.failures:
+            score += min(profile.failures * FAILED_ATTEMPT_SCORE, MAX_FAILED_ATTEMPTS_SCORE)
+            reasons.append("failed_attempts")
+
+        if score >= settings.RISK_2FA_THRESHOLD:
+            logger.warning(f"Risky login for user {user_id}: score {score} ({', '.join(reasons)})")
+        return RiskAssessment(score=score, reasons=reasons)
+
+    def record_success(
+        self,
+        user_id: int,
+        device_id: Optional[str],
+        ip_address: str,
+        at: Optional[datetime] = None
+    ) -> None:
+        """Fold a completed login into the user's profile, if it is loaded"""
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            profile.observe(device_id, ip_address, at or datetime.utcnow())
+
+    def record_failure(self, user_id: int) -> None:
+        """Count a failed password attempt, if the profile is loaded"""
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            profile.failures += 1
+
+
+# Global risk service
+risk_service = RiskService(cache_size=settings.RISK_PROFILE_CACHE_SIZE)
+
+
+__all__ = ["risk_service", "RiskService", "RiskAssessment", "LoginProfile"]
@@ -2,21 +2,22 @@
 Two-Factor Authentication Service
 """
 import pyotp
-import qrcode
-import io
-import base64
-import json
 import secrets
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, insert, select, update, lambda_stmt
 
+from app.db.upsert import upsert
 from app.models.two_factor_auth import TwoFactorAuth
+from app.models.two_factor_backup_code import TwoFactorBackupCode
 from app.models.user import User
 from app.core.config import settings
-from app.core.security import encrypt_data, decrypt_data
+from app.core.security import encrypt_data, decrypt_data, hash_backup_code
 from app.core.logging import app_logger as logger
+from app.core.response_cache import TWO_FACTOR_STATUS, response_cache
+from app.services.activity_buffer import activity_buffer
+from app.services.qr_code import QRFormat, render_qr_code_async
 
 
 class TwoFactorAuthService:
@@ -25,16 +26,17 @@ class TwoFactorAuthService:
     def __init__(self):
         self.issuer_name = settings.PROJECT_NAME
     
-    async def setup_2fa(self, db: AsyncSession, user_id: int) -> Tuple[str, str, List[str]]:
+    async def setup_2fa(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        qr_format: QRFormat = "png"
+    ) -> Tuple[str, Union[str, List[str]], List[str]]:
         """
         Setup 2FA for a user
-        Returns: (secret, qr_code_data_url, backup_codes)
+        Returns: (secret, qr_code, backup_codes), where qr_code is a PNG or
+        SVG data URL, or the module matrix for qr_format="matrix"
         """
-        # Check if 2FA already exists
-        existing_2fa = await self.get_2fa_by_user_id(db, user_id)
-        if existing_2fa and existing_2fa.is_enabled:
-            raise ValueError("2FA is already enabled for this user")
-        
         # Get user for email
         user = await db.get(User, user_id)
         if not user:
@@ -43,27 +45,29 @@ class TwoFactorAuthService:
         # Generate secret
         secret = pyotp.random_base32()
         
-        # Generate backup codes
-        backup_codes = [
-            f"{secrets.token_hex(3)}-{secrets.token_hex(3)}"
-            for _ in range(8)
-        ]
-        
-        # Create or update 2FA record
-        if existing_2fa:
-            existing_2fa.secret = encrypt_data(secret)
-            existing_2fa.backup_codes = encrypt_data(json.dumps(backup_codes))
-            existing_2fa.is_enabled = False
-            existing_2fa.updated_at = datetime.utcnow()
-        else:
-            two_fa = TwoFactorAuth(
-                user_id=user_id,
-                secret=encrypt_data(secret),
-                backup_codes=encrypt_data(json.dumps(backup_codes)),
-                is_enabled=False
-            )
-            db.add(two_fa)
+        # Create or reset the 2FA record in one statement, leaving an
+        # already enabled record untouched
+        encrypted_secret = encrypt_data(secret)
+        two_fa = await upsert(
+            db,
+            TwoFactorAuth,
+            values={
+                "user_id": user_id,
+                "secret": encrypted_secret,
+                "is_enabled": False
+            },
+            conflict_columns=["user_id"],
+            set_={
+                "secret": encrypted_secret,
+                "is_enabled": False,
+                "updated_at": datetime.utcnow()
+            },
+            where=TwoFactorAuth.is_enabled.is_(False)
+        )
+        if two_fa.is_enabled:
+            raise ValueError("2FA is already enabled for this user")
         
+        backup_codes = await self._replace_backup_codes(db, two_fa)
         await db.commit()
         
         # Generate QR code
@@ -72,22 +76,12 @@ class TwoFactorAuthService:
             issuer_name=self.issuer_name
         )
         
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(totp_uri)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buf = io.BytesIO()
-        img.save(buf, format='PNG')
-        buf.seek(0)
-        
-        # Convert to data URL
-        qr_code_data = base64.b64encode(buf.getvalue()).decode()
-        qr_code_data_url = f"data:image/png;base64,{qr_code_data}"
+        # CPU bound, rendered on a worker thread
+        qr_code = await render_qr_code_async(totp_uri, qr_format)
         
         logger.info(f"2FA setup initiated for user {user_id}")
         
-        return secret, qr_code_data_url, backup_codes
+        return secret, qr_code, backup_codes
     
     async def enable_2fa(self, db: AsyncSession, user_id: int, code: str) -> bool:
         """Enable 2FA after verifying the code"""
@@ -103,12 +97,14 @@ class TwoFactorAuthService:
         if not self.verify_totp(secret, code):
             return False
         
-        # Enable 2FA
+        # Enable 2FA, keeping the flag on the user row in step
         two_fa.is_enabled = True
         two_fa.enabled_at = datetime.utcnow()
         two_fa.updated_at = datetime.utcnow()
+        await self._set_user_flag(db, user_id, True)
         
         await db.commit()
+        response_cache.invalidate(user_id, TWO_FACTOR_STATUS)
         logger.info(f"2FA enabled for user {user_id}")
         
         return True
@@ -121,7 +117,9 @@ class TwoFactorAuthService:
         
         # Delete 2FA record
         await db.delete(two_fa)
+        await self._set_user_flag(db, user_id, False)
         await db.commit()
+        response_cache.invalidate(user_id, TWO_FACTOR_STATUS)
         
         logger.info(f"2FA disabled for user {user_id}")
         return True
@@ -140,23 +138,28 @@ class TwoFactorAuthService:
         # Try TOTP code first
         secret = decrypt_data(two_fa.secret)
         if self.verify_totp(secret, code):
-            # Update last used
-            two_fa.last_used_at = datetime.utcnow()
-            await db.commit()
+            # Update last used (written behind)
+            activity_buffer.touch(TwoFactorAuth, two_fa.id, "last_used_at")
             return True
         
-        # Try backup codes
-        if two_fa.backup_codes:
-            backup_codes = json.loads(decrypt_data(two_fa.backup_codes))
-            if code in backup_codes:
-                # Remove used backup code
-                backup_codes.remove(code)
-                two_fa.backup_codes = encrypt_data(json.dumps(backup_codes))
-                two_fa.last_used_at = datetime.utcnow()
-                await db.commit()
-                
-                logger.info(f"Backup code used for user {user_id}")
-                return True
+        # Try backup codes: finding and consuming an unused code is one
+        # indexed UPDATE, so a code cannot be spent twice concurrently
+        result = await db.execute(
+            update(TwoFactorBackupCode)
+            .where(
+                TwoFactorBackupCode.two_factor_auth_id == two_fa.id,
+                TwoFactorBackupCode.code_hash == hash_backup_code(user_id, code),
+                TwoFactorBackupCode.used_at.is_(None)
+            )
+            .values(used_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            await db.commit()
+            activity_buffer.touch(TwoFactorAuth, two_fa.id, "last_used_at")
+            
+            logger.info(f"Backup code used for user {user_id}")
+            return True
         
         return False
     
@@ -170,13 +173,7 @@ class TwoFactorAuthService:
         if not two_fa or not two_fa.is_enabled:
             raise ValueError("2FA not enabled for this user")
         
-        # Generate new backup codes
-        backup_codes = [
-            f"{secrets.token_hex(3)}-{secrets.token_hex(3)}"
-            for _ in range(8)
-        ]
-        
-        two_fa.backup_codes = encrypt_data(json.dumps(backup_codes))
+        backup_codes = await self._replace_backup_codes(db, two_fa)
         two_fa.updated_at = datetime.utcnow()
         
         await db.commit()
@@ -184,20 +181,49 @@ class TwoFactorAuthService:
         
         return backup_codes
     
+    async def _replace_backup_codes(self, db: AsyncSession, two_fa: TwoFactorAuth) -> List[str]:
+        """Generate new backup codes, replacing the stored hashes in one bulk insert"""
+        backup_codes = [
+            f"{secrets.token_hex(3)}-{secrets.token_hex(3)}"
+            for _ in range(8)
+        ]
+        
+        await db.execute(
+            delete(TwoFactorBackupCode).where(TwoFactorBackupCode.two_factor_auth_id == two_fa.id)
+        )
+        await db.execute(insert(TwoFactorBackupCode), [
+            {"two_factor_auth_id": two_fa.id, "code_hash": hash_backup_code(two_fa.user_id, code)}
+            for code in backup_codes
+        ])
+        return backup_codes
+    
     async def get_2fa_by_user_id(
         self, 
         db: AsyncSession, 
         user_id: int
     ) -> Optional[TwoFactorAuth]:
         """Get 2FA record by user ID"""
-        query = select(TwoFactorAuth).where(TwoFactorAuth.user_id == user_id)
+        query = lambda_stmt(lambda: select(TwoFactorAuth).where(TwoFactorAuth.user_id == user_id))
         result = await db.execute(query)
         return result.scalar_one_or_none()
     
     async def is_2fa_enabled(self, db: AsyncSession, user_id: int) -> bool:
-        """Check if 2FA is enabled for a user"""
-        two_fa = await self.get_2fa_by_user_id(db, user_id)
-        return two_fa is not None and two_fa.is_enabled
+        """Check if 2FA is enabled for a user
+        
+        Callers that already hold the User should read
+        ``user.two_factor_enabled`` instead of querying again.
+        """
+        query = lambda_stmt(lambda: select(User.two_factor_enabled).where(User.id == user_id))
+        result = await db.execute(query)
+        return bool(result.scalar_one_or_none())
+    
+    async def _set_user_flag(self, db: AsyncSession, user_id: int, enabled: bool) -> None:
+        """Update ``users.two_factor_enabled`` in the caller's transaction"""
+        await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(two_factor_enabled=enabled)
+        )
     
     def verify_totp(self, secret: str, code: str) -> bool:
         """Verify TOTP code"""
@@ -1,10 +1,13 @@
 from typing import Optional, List
-from datetime import datetime
-from sqlalchemy import select, update
+from sqlalchemy import select, or_, lambda_stmt
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_password_hash, verify_password
 from app.core.logging import app_logger as logger
+from app.core.pagination import Cursor
+from app.core.response_cache import response_cache
+from app.services.activity_buffer import activity_buffer
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
@@ -14,13 +17,14 @@ async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
     return result.scalar_one_or_none()
 
 
+# lambda_stmt: the statement is cached per call site, only bound values change
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
-    result = await db.execute(select(User).filter(User.email == email))
+    result = await db.execute(lambda_stmt(lambda: select(User).where(User.email == email)))
     return result.scalar_one_or_none()
 
 
 async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
-    result = await db.execute(select(User).filter(User.username == username))
+    result = await db.execute(lambda_stmt(lambda: select(User).where(User.username == username)))
     return result.scalar_one_or_none()
 
 
@@ -29,12 +33,94 @@ async def get_user_by_phone(db: AsyncSession, phone: str) -> Optional[User]:
     return result.scalar_one_or_none()
 
 
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
-    result = await db.execute(select(User).offset(skip).limit(limit))
+async def get_users(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Cursor] = None
+) -> List[User]:
+    """List users ordered by (created_at, id)
+    
+    Pass ``cursor`` (the position of the last user of the previous page) for
+    keyset pagination; ``skip`` is only kept for backward compatibility.
+    """
+    query = select(User).order_by(User.created_at, User.id).limit(limit)
+    if cursor:
+        created_at, user_id = cursor
+        # The redundant lower bound lets the planner use a range scan on the index
+        query = query.where(
+            User.created_at >= created_at,
+            or_(User.created_at > created_at, User.id > user_id)
+        )
+    else:
+        query = query.offset(skip)
+    
+    result = await db.execute(query)
     return result.scalars().all()
 
 
+UNIQUE_USER_FIELDS = ("email", "username", "phone")
+
+
+class DuplicateUserError(ValueError):
+    """Raised when a unique user field is already registered"""
+    
+    def __init__(self, field: str):
+        super().__init__(f"{field} already registered")
+        self.field = field
+
+
+async def get_conflicting_fields(
+    db: AsyncSession,
+    email: str,
+    username: str,
+    phone: Optional[str] = None
+) -> List[str]:
+    """Return which of email, username and phone are already taken, in one query"""
+    conditions = [User.email == email, User.username == username]
+    if phone:
+        conditions.append(User.phone == phone)
+    
+    result = await db.execute(
+        select(User.email, User.username, User.phone).where(or_(*conditions))
+    )
+    taken = set()
+    for row in result:
+        if row.email == email:
+            taken.add("email")
+        if row.username == username:
+            taken.add("username")
+        if phone and row.phone == phone:
+            taken.add("phone")
+    
+    return [field for field in UNIQUE_USER_FIELDS if field in taken]
+
+
+def _duplicate_field(error: IntegrityError) -> Optional[str]:
+    """Map a unique constraint violation on users to the offending field"""
+    message = str(error.orig)
+    # MySQL: "Duplicate entry '...' for key 'users.ix_users_email'"
+    if "for key" in message:
+        message = message.rsplit("for key", 1)[1]
+    
+    for field in UNIQUE_USER_FIELDS:
+        # SQLite: "UNIQUE constraint failed: users.email"
+        if f"users.{field}" in message or f"ix_users_{field}" in message or f"'{field}'" in message:
+            return field
+    return None
+
+
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    """Create a user, raises DuplicateUserError if a unique field is taken
+    
+    Taken fields are found with one query before the password is hashed, so
+    duplicate signups do not cost a bcrypt round. A unique constraint
+    violation from a concurrent signup is mapped back to the field.
+    """
+    conflicts = await get_conflicting_fields(db, user.email, user.username, user.phone)
+    if conflicts:
+        raise DuplicateUserError(conflicts[0])
+    
     hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
@@ -48,8 +134,17 @@ async def create_user(db: AsyncSession, user: UserCreate) -> User:
         is_verified=user.is_verified
     )
     db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        field = _duplicate_field(e)
+        if field is None:
+            conflicts = await get_conflicting_fields(db, user.email, user.username, user.phone)
+            if not conflicts:
+                raise
+            field = conflicts[0]
+        raise DuplicateUserError(field) from e
     
     logger.info(f"Created new user: {user.email} (ID: {db_user.id})")
     return db_user
@@ -57,6 +152,7 @@ async def create_user(db: AsyncSession, user: UserCreate) -> User:
 
 async def update_user(db: AsyncSession, user: User, user_update: UserUpdate) -> User:
     update_data = user_update.model_dump(exclude_unset=True)
+    previous_email = user.email
     if "password" in update_data:
         hashed_password = get_password_hash(update_data["password"])
         del update_data["password"]
@@ -67,7 +163,11 @@ async def update_user(db: AsyncSession, user: User, user_update: UserUpdate) ->
     
     db.add(user)
     await db.commit()
-    await db.refresh(user)
+    if user.email != previous_email:
+        # The old address may be registered by someone else
+        response_cache.forget_subject(previous_email)
+    if not user.is_active:
+        response_cache.invalidate_user(user.id)
     return user
 
 
@@ -80,26 +180,13 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
         logger.warning(f"Authentication failed: Invalid password for user {email}")
         return None
     
-    # Update last login
-    await db.execute(
-        update(User)
-        .where(User.id == user.id)
-        .values(last_login=datetime.utcnow())
-    )
-    await db.commit()
-    
     logger.info(f"User authenticated successfully: {email}")
     return user
 
 
 async def update_last_login(db: AsyncSession, user_id: int) -> None:
-    """Update user's last login timestamp"""
-    await db.execute(
-        update(User)
-        .where(User.id == user_id)
-        .values(last_login=datetime.utcnow())
-    )
-    await db.commit()
+    """Update user's last login timestamp (written behind by the activity buffer)"""
+    activity_buffer.touch(User, user_id, "last_login")
 
 
 async def create_user_oauth(
@@ -136,7 +223,6 @@ async def create_user_oauth(
     )
     db.add(db_user)
     await db.commit()
-    await db.refresh(db_user)
     
     logger.info(f"Created new OAuth user: {email} (ID: {db_user.id})")
     return db_user
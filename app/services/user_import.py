@@ -0,0 +1,236 @@
+"""
+Bulk user import from CSV or JSONL files
+
+Records are streamed from the file in batches. Plaintext passwords are hashed
+in a process pool while the previous batch is being inserted, and each batch
+is written with a single executemany ``INSERT`` that skips rows whose email,
+username or phone already exists. After every committed batch the number of
+records consumed is saved to a checkpoint file, so an interrupted import
+resumes where it stopped; re-importing a batch is harmless because duplicates
+are ignored.
+"""
+import asyncio
+import csv
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.logging import app_logger as logger
+from app.core.security import pwd_context
+from app.db.database import db_manager
+from app.models.user import User
+from app.schemas.user import UserBase
+
+IMPORT_BATCH_SIZE = 5000
+BOOLEAN_FIELDS = ("is_active", "is_superuser", "is_verified")
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+@dataclass
+class ImportStats:
+    """Progress of one import, also what the checkpoint file stores"""
+
+    source: str
+    # Records consumed from the file, including skipped and invalid ones
+    processed: int = 0
+    inserted: int = 0
+    # Already registered (email, username or phone taken)
+    duplicates: int = 0
+    invalid: int = 0
+    hashed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def read_records(path: str, file_format: Optional[str] = None) -> Iterator[Dict]:
+    """Stream records from a CSV (with a header row) or JSONL file"""
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a chunk of passwords; runs inside the worker processes"""
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def prepare_record(record: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Validate a record and map it to ``users`` columns
+
+    Returns ``(row, password)``: ``row`` is None when the record is invalid,
+    and ``password`` is the plaintext still to be hashed when the record has
+    no ``hashed_password``.
+    """
+    data = {key: value for key, value in record.items() if value not in (None, "")}
+    for field in BOOLEAN_FIELDS:
+        if isinstance(data.get(field), str):
+            data[field] = data[field].strip().lower() in TRUE_VALUES
+
+    hashed_password = data.pop("hashed_password", None)
+    password = data.pop("password", None)
+    if hashed_password is not None and not pwd_context.identify(hashed_password):
+        return None, None
+    if hashed_password is None and not password:
+        return None, None
+
+    try:
+        user = UserBase.model_validate(data)
+    except ValidationError:
+        return None, None
+
+    row = user.model_dump()
+    row["hashed_password"] = hashed_password
+    return row, None if hashed_password else password
+
+
+def load_checkpoint(path: str, source: str) -> ImportStats:
+    """Stats saved by an earlier run over the same source, or fresh ones"""
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as checkpoint:
+            saved = json.load(checkpoint)
+        if saved.get("source") == source:
+            return ImportStats(**saved)
+        logger.warning(f"Ignoring checkpoint {path}: it belongs to {saved.get('source')}")
+    return ImportStats(source=source)
+
+
+def save_checkpoint(path: str, stats: ImportStats) -> None:
+    """Write the checkpoint atomically so a crash never leaves half a file"""
+    with open(f"{path}.tmp", "w", encoding="utf-8") as checkpoint:
+        json.dump(asdict(stats), checkpoint)
+    os.replace(f"{path}.tmp", path)
+
+
+class UserImporter:
+    """Import users in batches, hashing passwords off the event loop"""
+
+    def __init__(
+        self,
+        session_maker: Optional[async_sessionmaker] = None,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        workers: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        progress: Optional[Callable[[ImportStats], None]] = None
+    ):
+        self.session_maker = session_maker or db_manager.async_session_maker
+        self.batch_size = batch_size
+        # 0 hashes in this process, which is only sensible for small files
+        self.workers = os.cpu_count() if workers is None else workers
+        self.checkpoint_path = checkpoint_path
+        self.progress = progress
+
+    async def run(self, path: str, file_format: Optional[str] = None) -> ImportStats:
+        source = os.path.abspath(path)
+        stats = load_checkpoint(self.checkpoint_path, source) if self.checkpoint_path else ImportStats(source=source)
+        if stats.processed:
+            logger.info(f"Resuming import of {path} after {stats.processed} records")
+
+        records = read_records(path, file_format)
+        # Records consumed before the checkpoint are read but not processed again
+        for _ in islice(records, stats.processed):
+            pass
+
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+        started = time.monotonic() - stats.elapsed
+        pending = None
+        try:
+            pending = self._next_batch(records, pool)
+            while True:
+                count, rows, invalid, hashed = await pending
+                if not count:
+                    break
+                # Hash the next batch while this one is written
+                pending = self._next_batch(records, pool)
+                inserted = await self._insert(rows)
+
+                stats.processed += count
+                stats.inserted += inserted
+                stats.duplicates += len(rows) - inserted
+                stats.invalid += invalid
+                stats.hashed += hashed
+                stats.elapsed = time.monotonic() - started
+                if self.checkpoint_path:
+                    save_checkpoint(self.checkpoint_path, stats)
+                if self.progress:
+                    self.progress(stats)
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        logger.info(
+            f"Imported {stats.inserted} users from {path} "
+            f"({stats.duplicates} duplicates, {stats.invalid} invalid, {stats.rate:.0f} records/s)"
+        )
+        return stats
+
+    def _next_batch(self, records: Iterator[Dict], pool: Optional[Executor]) -> asyncio.Task:
+        batch = list(islice(records, self.batch_size))
+        return asyncio.ensure_future(self._prepare_batch(batch, pool))
+
+    async def _prepare_batch(self, batch: List[Dict], pool: Optional[Executor]):
+        """Validate a batch and fill in hashes, returns (count, rows, invalid, hashed)"""
+        rows, to_hash = [], []
+        invalid = 0
+        for record in batch:
+            row, password = prepare_record(record)
+            if row is None:
+                invalid += 1
+                continue
+            if password is not None:
+                to_hash.append((row, password))
+            rows.append(row)
+
+        if to_hash:
+            passwords = [password for _, password in to_hash]
+            if pool is None:
+                hashes = hash_passwords(passwords)
+            else:
+                # One chunk per worker keeps pickling overhead per batch low
+                size = -(-len(passwords) // self.workers)
+                loop = asyncio.get_running_loop()
+                chunks = await asyncio.gather(*(
+                    loop.run_in_executor(pool, hash_passwords, passwords[i:i + size])
+                    for i in range(0, len(passwords), size)
+                ))
+                hashes = [hashed for chunk in chunks for hashed in chunk]
+            for (row, _), hashed in zip(to_hash, hashes):
+                row["hashed_password"] = hashed
+
+        return len(batch), rows, invalid, len(to_hash)
+
+    async def _insert(self, rows: List[Dict]) -> int:
+        """Insert a batch with one executemany, returns the rows actually inserted"""
+        if not rows:
+            return 0
+        now = datetime.utcnow()
+        for row in rows:
+            row["created_at"] = row["updated_at"] = now
+
+        async with self.session_maker() as db:
+            dialect = db.get_bind().dialect.name
+            stmt = insert(User.__table__).prefix_with("OR IGNORE" if dialect == "sqlite" else "IGNORE")
+            result = await db.execute(stmt, rows)
+            await db.commit()
+        return result.rowcount
+
+
+__all__ = ["UserImporter", "ImportStats", "read_records", "prepare_record", "hash_passwords"]
@@ -0,0 +1,56 @@
+"""
+Run scheduled jobs out of process, e.g. from cron
+
+    python -m app.tasks list
+    python -m app.tasks run cleanup [--force]
+
+`run` claims the job's lease like the in-app scheduler does, so a cron run
+and running workers never execute the same interval twice. `--force` skips
+the lease. Set SCHEDULER_ENABLED=false to leave jobs to cron entirely.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.db.database import db_manager
+from app.tasks.scheduler import scheduler
+
+
+async def run(name: str, force: bool) -> int:
+    await db_manager.initialize()
+    try:
+        await db_manager.create_tables()
+        ran = await scheduler.run_job(name, force=force, session_maker=db_manager.async_session_maker)
+    finally:
+        await db_manager.close()
+
+    metrics = scheduler.metrics[name]
+    if not ran:
+        print(f"{name}: skipped, another worker holds the lease")
+        return 0
+    if metrics.last_error:
+        print(f"{name}: failed after {metrics.last_duration:.2f}s: {metrics.last_error}")
+        return 1
+    print(f"{name}: {metrics.last_rows} rows in {metrics.last_duration:.2f}s")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tasks", description="Run background jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List registered jobs")
+    run_parser = commands.add_parser("run", help="Run a job once")
+    run_parser.add_argument("job", choices=sorted(scheduler.jobs))
+    run_parser.add_argument("--force", action="store_true", help="Run even if another worker holds the lease")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for job in scheduler.jobs.values():
+            print(f"{job.name}\tevery {job.interval:g}s (jitter {job.jitter:g}s)")
+        return 0
+
+    return asyncio.run(run(args.job, args.force))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
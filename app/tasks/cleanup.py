@@ -1,42 +1,50 @@
-import asyncio
-from datetime import datetime
+import time
+from functools import partial
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import settings
 from app.db.database import db_manager
 from app.services.refresh_token import refresh_token_service
 from app.services.password_reset import password_reset_service
 from app.services.device_management import device_management_service
+from app.services.email_verification import email_verification_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def cleanup_expired_tokens():
-    """Background task to cleanup expired tokens"""
-    while True:
-        try:
-            async with db_manager.async_session_maker() as db:
-                # Cleanup refresh tokens
-                refresh_count = await refresh_token_service.cleanup_expired_tokens(db)
-                if refresh_count > 0:
-                    logger.info(f"Cleaned up {refresh_count} expired refresh tokens")
-                
-                # Cleanup password reset tokens
-                reset_count = await password_reset_service.cleanup_expired_tokens(db)
-                if reset_count > 0:
-                    logger.info(f"Cleaned up {reset_count} expired password reset tokens")
-                
-                # Cleanup inactive devices (older than 90 days)
-                device_count = await device_management_service.cleanup_inactive_devices(db, days=90)
-                if device_count > 0:
-                    logger.info(f"Cleaned up {device_count} inactive devices")
-        except Exception as e:
-            logger.error(f"Error cleaning up expired tokens: {e}")
-        
-        # Run every hour
-        await asyncio.sleep(3600)
+async def run_cleanup(
+    session_maker: Optional[async_sessionmaker] = None,
+    time_budget: Optional[float] = None
+) -> Dict[str, int]:
+    """Run every cleanup routine once and return the rows deleted by each
 
+    The routines share one time budget; once it is spent the remaining
+    routines are skipped and their backlog waits for the next run.
+    """
+    session_maker = session_maker or db_manager.async_session_maker
+    budget = settings.CLEANUP_TIME_BUDGET if time_budget is None else time_budget
+    deadline = time.monotonic() + budget
 
-def start_background_tasks():
-    """Start all background tasks"""
-    asyncio.create_task(cleanup_expired_tokens())
-    logger.info("Background tasks started")
+    routines = [
+        # Expired and revoked refresh tokens
+        ("refresh_tokens", refresh_token_service.cleanup_expired_tokens),
+        # Password reset tokens older than 7 days
+        ("password_resets", password_reset_service.cleanup_expired_tokens),
+        # Verified or expired email verification tokens
+        ("email_verifications", email_verification_service.cleanup_stale_verifications),
+        # Devices inactive for 90 days
+        ("devices", partial(device_management_service.cleanup_inactive_devices, days=90)),
+    ]
 
+    counts = {}
+    async with session_maker() as db:
+        for name, routine in routines:
+            if time.monotonic() >= deadline:
+                logger.warning(f"Cleanup time budget exhausted, skipping {name}")
+                continue
+            counts[name] = await routine(db, deadline=deadline)
+            if counts[name] > 0:
+                logger.info(f"Cleaned up {counts[name]} {name}")
+
+    return counts
@@ -0,0 +1,102 @@
+"""
+Login history retention: archive expired monthly partitions, then drop them
+"""
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection, async_sessionmaker
+
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.db.database import db_manager
+from app.db.partitions import add_months, login_history_partitions, month_start
+
+ARCHIVE_CHUNK_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _write_lines(archive, rows) -> None:
+    archive.write("".join(json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in rows))
+
+
+async def archive_partition(conn: AsyncConnection, name: str, archive_dir: str) -> int:
+    """Stream one partition to ``<archive_dir>/<name>.ndjson.gz``, returns the row count
+
+    The archive is written to a temporary file and renamed once complete, so a
+    file with the final name is always a full copy of the partition.
+    """
+    table, month_filter = await conn.run_sync(login_history_partitions.month_rows, name)
+    archive_name = login_history_partitions.name_for(login_history_partitions.month_of(name))
+    path = os.path.join(archive_dir, f"{archive_name}.ndjson.gz")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    count = 0
+    archive = gzip.open(f"{path}.tmp", "wt", encoding="utf-8")
+    try:
+        result = await conn.stream(select(table).where(month_filter).order_by(table.c.id))
+        async for rows in result.partitions(ARCHIVE_CHUNK_SIZE):
+            # Compression runs off the event loop
+            await asyncio.to_thread(_write_lines, archive, rows)
+            count += len(rows)
+    finally:
+        archive.close()
+    os.replace(f"{path}.tmp", path)
+    return count
+
+
+async def run_login_history_retention(
+    session_maker: Optional[async_sessionmaker] = None,
+    retention_months: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """Archive and drop login history months older than the retention window
+
+    Keeps the current month plus ``retention_months`` before it and returns
+    the rows archived per dropped partition. Does nothing unless
+    LOGIN_HISTORY_PARTITIONING is enabled.
+    """
+    session_maker = session_maker or db_manager.audit_session_maker
+    retention_months = settings.LOGIN_HISTORY_RETENTION_MONTHS if retention_months is None else retention_months
+    archive_dir = archive_dir or settings.LOGIN_HISTORY_ARCHIVE_DIR
+    now = now or datetime.utcnow()
+    cutoff = add_months(month_start(now), -retention_months)
+
+    archived = {}
+    async with session_maker() as db:
+        conn = await db.connection()
+        if not await conn.run_sync(login_history_partitions.enabled):
+            return archived
+
+        if conn.dialect.name == "mysql":
+            # Keep a partition ready for next month's rows
+            await conn.run_sync(login_history_partitions.mysql_add_months, add_months(now, 1))
+            await db.commit()
+
+        names = await (await db.connection()).run_sync(login_history_partitions.list)
+        for name in names:
+            if login_history_partitions.month_of(name) >= cutoff:
+                continue
+            # Each commit releases the connection, so take it again per partition
+            conn = await db.connection()
+            archived[name] = await archive_partition(conn, name, archive_dir)
+            await conn.run_sync(login_history_partitions.drop, name)
+            await db.commit()
+            logger.info(f"Archived {archived[name]} login history rows from {name}")
+
+    return archived
+
+
+async def login_history_retention_job(session_maker: async_sessionmaker) -> Dict[str, int]:
+    """Scheduler entry point; login history lives in the audit database"""
+    return await run_login_history_retention(db_manager.audit_session_maker or session_maker)
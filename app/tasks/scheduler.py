@@ -0,0 +1,217 @@
+"""
+Cluster-safe background job scheduler
+"""
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.core.logging import app_logger as logger
+from app.db.upsert import upsert
+from app.models.job_lease import JobLease
+from app.tasks.cleanup import run_cleanup
+from app.tasks.retention import login_history_retention_job
+
+JobFunc = Callable[[async_sessionmaker], Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    name: str
+    func: JobFunc
+    interval: float  # seconds between runs across the whole cluster
+    jitter: float = 0.0  # random extra delay per worker before claiming
+
+
+@dataclass
+class JobMetrics:
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0  # due, but another worker held the lease
+    rows: int = 0
+    last_rows: int = 0
+    last_duration: float = 0.0
+    last_run_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+
+def _count_rows(result: Any) -> int:
+    """Jobs return a row count or a dict of row counts"""
+    if isinstance(result, dict):
+        return sum(value for value in result.values() if isinstance(value, int))
+    if isinstance(result, int):
+        return result
+    return 0
+
+
+class JobScheduler:
+    """Run registered jobs on an interval, once per interval per cluster
+
+    Every worker runs the scheduler loop, but before running a due job it
+    claims the job's ``job_leases`` row by moving ``expires_at`` one interval
+    ahead, which only succeeds if the previous lease has expired. The losers
+    skip the run and wait for the new expiry. Run time and rows touched per
+    job are kept in ``metrics``.
+    """
+
+    def __init__(self, max_sleep: float = 60.0):
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics: Dict[str, JobMetrics] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._next_run: Dict[str, float] = {}
+        self._max_sleep = max_sleep
+        self._session_maker: Optional[async_sessionmaker] = None
+        self._task = None
+
+    @property
+    def jobs(self) -> Dict[str, Job]:
+        return dict(self._jobs)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def register(self, name: str, func: JobFunc, interval: float, jitter: float = 0.0) -> Job:
+        """Register a job; ``func`` is called with a session maker"""
+        job = Job(name=name, func=func, interval=interval, jitter=jitter)
+        self._jobs[name] = job
+        self.metrics[name] = JobMetrics()
+        return job
+
+    async def start(self, session_maker: async_sessionmaker):
+        """Start the scheduler loop"""
+        self._session_maker = session_maker
+        now = time.monotonic()
+        for job in self._jobs.values():
+            self._next_run[job.name] = now + random.uniform(0, job.jitter)
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Job scheduler started with jobs: {', '.join(self._jobs) or 'none'}")
+
+    async def stop(self):
+        """Cancel the loop, interrupting a job that is still running"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Job scheduler stopped")
+
+    async def _loop(self):
+        """Background task to run due jobs"""
+        while True:
+            try:
+                now = time.monotonic()
+                for name, due in list(self._next_run.items()):
+                    if due <= now:
+                        # Fallback if the claim itself fails; a claim reschedules precisely
+                        self._next_run[name] = now + self._jobs[name].interval
+                        await self.run_job(name)
+
+                wake = min(self._next_run.values(), default=now + self._max_sleep)
+                await asyncio.sleep(min(max(wake - time.monotonic(), 0), self._max_sleep))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in job scheduler: {e}")
+                await asyncio.sleep(1)
+
+    async def claim(self, name: str, interval: float, session_maker: Optional[async_sessionmaker] = None) -> Optional[datetime]:
+        """Claim the lease for the next run of ``name``
+
+        Returns the new lease expiry if this worker won the claim, otherwise
+        None. The expiry is when the next run may start anywhere in the cluster.
+        """
+        session_maker = session_maker or self._session_maker
+        claim_id = f"{self.holder}/{uuid.uuid4().hex[:8]}"
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=interval)
+
+        async with session_maker() as db:
+            lease = await upsert(
+                db,
+                JobLease,
+                values={"name": name, "holder": claim_id, "expires_at": expires_at},
+                conflict_columns=["name"],
+                set_={"holder": claim_id, "expires_at": expires_at},
+                where=JobLease.expires_at <= now
+            )
+            await db.commit()
+
+        if lease.holder != claim_id:
+            self._defer(name, lease.expires_at)
+            return None
+        return expires_at
+
+    def _defer(self, name: str, until: datetime):
+        """Schedule the next local attempt for when the lease expires"""
+        job = self._jobs.get(name)
+        if job is None:
+            return
+        wait = max((until.replace(tzinfo=None) - datetime.utcnow()).total_seconds(), 0)
+        self._next_run[name] = time.monotonic() + wait + random.uniform(0, job.jitter)
+
+    async def run_job(self, name: str, force: bool = False, session_maker: Optional[async_sessionmaker] = None) -> bool:
+        """Run ``name`` now if this worker can claim it (always with ``force``)
+
+        Returns whether the job ran.
+        """
+        job = self._jobs[name]
+        session_maker = session_maker or self._session_maker
+        metrics = self.metrics[name]
+
+        if not force:
+            expires_at = await self.claim(name, job.interval, session_maker)
+            if expires_at is None:
+                metrics.skipped += 1
+                return False
+            self._defer(name, expires_at)
+
+        started = time.perf_counter()
+        metrics.last_run_at = datetime.utcnow()
+        try:
+            result = await job.func(session_maker)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.failures += 1
+            metrics.last_error = str(e)
+            logger.error(f"Job {name} failed: {e}")
+            return True
+        finally:
+            metrics.runs += 1
+            metrics.last_duration = time.perf_counter() - started
+
+        metrics.last_rows = _count_rows(result)
+        metrics.rows += metrics.last_rows
+        metrics.last_error = None
+        logger.info(f"Job {name} finished in {metrics.last_duration:.2f}s, {metrics.last_rows} rows")
+        return True
+
+
+# Global scheduler with the application's jobs
+scheduler = JobScheduler()
+scheduler.register(
+    "cleanup",
+    run_cleanup,
+    interval=settings.CLEANUP_INTERVAL,
+    jitter=settings.SCHEDULER_JITTER
+)
+scheduler.register(
+    "login_history_retention",
+    login_history_retention_job,
+    interval=24 * 3600,
+    jitter=settings.SCHEDULER_JITTER
+)
+
+
+__all__ = ["scheduler", "JobScheduler", "Job", "JobMetrics"]
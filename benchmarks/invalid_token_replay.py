@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Invalid-token replay benchmark
+
+Replays authenticated requests carrying garbage, expired and wrong-type bearer
+tokens against a file-backed SQLite database and reports how many database
+sessions were opened and how many pool connections were checked out. Every
+request is rejected with 401, so both counts should stay at zero.
+
+Usage: python -m benchmarks.invalid_token_replay [--requests 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.core.config import settings
+
+
+ENDPOINTS = [
+    ("GET", "/api/v1/users/me", None),
+    ("GET", "/api/v1/devices/devices", None),
+    ("GET", "/api/v1/devices/login-history", None),
+    ("POST", "/api/v1/auth/logout", {"token": "irrelevant"}),
+]
+
+
+async def run(requests: int):
+    workdir = tempfile.mkdtemp(prefix="invalid-token-bench-")
+    settings.DATABASE_TYPE = "sqlite"
+    settings.SQLITE_URL = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    settings.RATE_LIMIT_ENABLED = False
+    settings.EMAIL_ENABLED = False
+    settings.ENVIRONMENT = "benchmark"
+
+    from app.core.security import create_access_token, create_refresh_token
+    from app.db.database import db_manager, get_db
+    from app.main import app
+
+    await db_manager.initialize()
+    await db_manager.create_tables()
+
+    counters = {"sessions": 0, "checkouts": 0}
+
+    async def counting_get_db():
+        counters["sessions"] += 1
+        async with db_manager.async_session_maker() as session:
+            yield session
+
+    def on_checkout(*args):
+        counters["checkouts"] += 1
+
+    app.dependency_overrides[get_db] = counting_get_db
+    event.listen(db_manager.engine.sync_engine, "checkout", on_checkout)
+
+    tokens = [
+        "not-a-jwt",
+        create_access_token({"sub": "ghost@example.com"}, expires_delta=timedelta(seconds=-1)),
+        create_refresh_token({"sub": "ghost@example.com"}),
+    ]
+
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        started = time.perf_counter()
+        for i in range(requests):
+            method, path, body = ENDPOINTS[i % len(ENDPOINTS)]
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            response = await client.request(method, path, json=body, headers=headers)
+            assert response.status_code == 401, response.text
+        elapsed = time.perf_counter() - started
+
+    app.dependency_overrides.pop(get_db, None)
+    await db_manager.close()
+
+    print(f"requests:          {requests} (all rejected with 401)")
+    print(f"throughput:        {requests / elapsed:.1f} req/s")
+    print(f"sessions opened:   {counters['sessions']}")
+    print(f"pool checkouts:    {counters['checkouts']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Login benchmark
+
+Replays successful /api/v1/auth/login requests against a file-backed SQLite
+database and reports latency percentiles plus SQL statements and commits per
+login.
+
+Usage: python -m benchmarks.login [--requests 200] [--concurrency 1]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.core.config import settings
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(requests: int, concurrency: int):
+    workdir = tempfile.mkdtemp(prefix="login-bench-")
+    settings.DATABASE_TYPE = "sqlite"
+    settings.SQLITE_URL = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    settings.RATE_LIMIT_ENABLED = False
+    settings.EMAIL_ENABLED = False
+    settings.ENVIRONMENT = "benchmark"
+    
+    from app.db.database import db_manager
+    from app.main import app
+    from app.schemas.user import UserCreate
+    from app.services.user import create_user
+    
+    await db_manager.initialize()
+    await db_manager.create_tables()
+    
+    async with db_manager.async_session_maker() as db:
+        await create_user(db, UserCreate(
+            email="bench@example.com",
+            username="bench",
+            password="benchpassword",
+            is_verified=True
+        ))
+    
+    counters = {"statements": 0, "commits": 0}
+    
+    def on_execute(*args):
+        counters["statements"] += 1
+    
+    def on_commit(*args):
+        counters["commits"] += 1
+    
+    event.listen(db_manager.engine.sync_engine, "before_cursor_execute", on_execute)
+    event.listen(db_manager.engine.sync_engine, "commit", on_commit)
+    
+    login_data = {"email": "bench@example.com", "password": "benchpassword"}
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        async def login(i: int):
+            headers = {"User-Agent": f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/{100 + i % 20}.0"}
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/auth/login", json=login_data, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.text
+        
+        # Warm up caches and the connection pool
+        await login(0)
+        latencies.clear()
+        counters.update(statements=0, commits=0)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    
+    await db_manager.close()
+    
+    print(f"logins:            {requests} (concurrency {concurrency})")
+    print(f"throughput:        {requests / elapsed:.1f} logins/s")
+    print(f"latency p50:       {statistics.median(latencies):.2f} ms")
+    print(f"latency p99:       {percentile(latencies, 99):.2f} ms")
+    print(f"statements/login:  {counters['statements'] / requests:.2f}")
+    print(f"commits/login:     {counters['commits'] / requests:.2f}")
+    print("note: latency includes one bcrypt verification per login")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
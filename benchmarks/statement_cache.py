@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Statement construction microbenchmark
+
+Compares the per-call Python overhead of building a fresh ``select()`` for the
+hot lookups against the cached ``lambda_stmt`` form used by the services.
+Both variants run the same query against an in-memory SQLite database so the
+difference is ORM/Core overhead, not I/O.
+
+Usage: python -m benchmarks.statement_cache [--calls 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, lambda_stmt
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.models import User, UserDevice
+
+
+def build_select(email):
+    return select(User).where(User.email == email)
+
+
+def build_lambda(email):
+    return lambda_stmt(lambda: select(User).where(User.email == email))
+
+
+def build_device_select(user_id, device_id):
+    return select(UserDevice).where(UserDevice.user_id == user_id, UserDevice.device_id == device_id)
+
+
+def build_device_lambda(user_id, device_id):
+    return lambda_stmt(lambda: select(UserDevice).where(
+        UserDevice.user_id == user_id,
+        UserDevice.device_id == device_id
+    ))
+
+
+def report(name, calls, seconds):
+    print(f"{name:<42} {seconds / calls * 1e6:8.2f} us/call")
+
+
+def run(calls: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    
+    with Session(engine) as db:
+        db.add(User(email="bench@example.com", username="bench", hashed_password="x"))
+        db.commit()
+        
+        print("construct + cache key")
+        for name, build in (("select()", build_select), ("lambda_stmt()", build_lambda)):
+            seconds = timeit.timeit(lambda: build("bench@example.com")._generate_cache_key(), number=calls)
+            report(f"  user by email, {name}", calls, seconds)
+        for name, build in (("select()", build_device_select), ("lambda_stmt()", build_device_lambda)):
+            seconds = timeit.timeit(lambda: build(1, "device")._generate_cache_key(), number=calls)
+            report(f"  device by id, {name}", calls, seconds)
+        
+        print("construct + execute")
+        for name, build in (("select()", build_select), ("lambda_stmt()", build_lambda)):
+            seconds = timeit.timeit(
+                lambda: db.execute(build("bench@example.com")).scalar_one_or_none(),
+                number=calls
+            )
+            report(f"  user by email, {name}", calls, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.calls)
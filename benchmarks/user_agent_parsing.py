@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+User-agent parsing microbenchmark
+
+Replays a login-like stream of User-Agent headers, drawn from a corpus of
+common browsers with a skewed (Zipf) popularity, through the uncached path
+register_device used to take (two ``user_agents.parse`` calls per login) and
+through the cached ``parse_user_agent``. Reports time per login and the cache
+hit rate.
+
+Usage: python -m benchmarks.user_agent_parsing [--logins 20000] [--unique 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_agents import parse
+
+from app.core.user_agent import clear_user_agent_cache, parse_user_agent, user_agent_cache_stats
+
+TEMPLATES = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{minor}.{patch} Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:{major}.0) Gecko/20100101 Firefox/{major}.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS {minor}_{patch} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{minor}.{patch} Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPad; CPU OS {minor}_{patch} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{minor}.{patch} Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android {minor}; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android {minor}; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Mobile Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36 Edg/{major}.0.{build}.{patch}",
+]
+
+
+def corpus(unique: int, rng: random.Random):
+    """``unique`` distinct headers across the templates"""
+    agents = []
+    while len(agents) < unique:
+        template = TEMPLATES[len(agents) % len(TEMPLATES)]
+        agents.append(template.format(
+            major=rng.randint(100, 125),
+            minor=rng.randint(10, 17),
+            build=rng.randint(4000, 6500),
+            patch=rng.randint(0, 200)
+        ))
+    return agents
+
+
+def uncached(user_agent):
+    # generate_device_id and parse_user_agent each parsed the header
+    parse(user_agent)
+    parse(user_agent)
+
+
+def run(logins: int, unique: int):
+    rng = random.Random(42)
+    agents = corpus(unique, rng)
+    weights = [1 / rank for rank in range(1, unique + 1)]
+    stream = rng.choices(agents, weights=weights, k=logins)
+
+    for name, func in (("uncached, 2 parses", uncached), ("cached parse_user_agent", parse_user_agent)):
+        clear_user_agent_cache()
+        started = time.perf_counter()
+        for user_agent in stream:
+            func(user_agent)
+        seconds = time.perf_counter() - started
+        print(f"{name:<26} {seconds / logins * 1e6:8.2f} us/login  ({logins / seconds:,.0f} logins/s)")
+
+    stats = user_agent_cache_stats()
+    print(f"cache: {stats['hits']} hits, {stats['misses']} misses, hit rate {stats['hit_rate']:.1%}, size {stats['size']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20000)
+    parser.add_argument("--unique", type=int, default=200)
+    args = parser.parse_args()
+    run(args.logins, args.unique)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Bulk user import script
+Streams users from a CSV or JSONL file into the database
+
+Each record needs email and username plus either a plaintext `password` or a
+bcrypt `hashed_password`; full_name, phone, avatar_url, is_active,
+is_superuser and is_verified are optional. Users whose email, username or
+phone already exist are skipped.
+
+Usage: python import_users.py users.csv [--checkpoint users.ckpt] [--batch-size 5000] [--workers 8]
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.db.database import db_manager
+from app.services.user_import import IMPORT_BATCH_SIZE, ImportStats, UserImporter
+
+
+def report(stats: ImportStats) -> None:
+    print(
+        f"\r📥 {stats.processed:,} records | {stats.inserted:,} inserted | "
+        f"{stats.duplicates:,} duplicates | {stats.invalid:,} invalid | {stats.rate:,.0f} records/s",
+        end="",
+        flush=True
+    )
+
+
+async def import_users(args) -> ImportStats:
+    await db_manager.initialize()
+    try:
+        await db_manager.create_tables()
+        importer = UserImporter(
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            progress=report
+        )
+        stats = await importer.run(args.path, args.format)
+    finally:
+        await db_manager.close()
+
+    print(f"\n🎉 Imported {stats.inserted:,} users in {stats.elapsed:.1f}s ({stats.hashed:,} passwords hashed)")
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import users from a CSV or JSONL file")
+    parser.add_argument("path", help="CSV file with a header row, or JSONL with one user per line")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    parser.add_argument("--checkpoint", help="Progress file; rerun with the same file to resume")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per INSERT and commit")
+    parser.add_argument("--workers", type=int, help="Password hashing processes (default: CPU count, 0: inline)")
+    args = parser.parse_args(argv)
+
+    asyncio.run(import_users(args))
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n⚠️ Import interrupted, rerun with the same --checkpoint to resume.")
+        sys.exit(1)
@@ -1,5 +1,7 @@
+import pytest
 import pytest_asyncio
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from typing import AsyncGenerator
 
@@ -11,6 +13,7 @@ settings.EMAIL_ENABLED = False
 settings.RATE_LIMIT_ENABLED = False
 
 # Now import the app and database modules
+from app.core.cache import clear_caches
 from app.db.database import Base, get_db
 from app.main import app
 
@@ -29,6 +32,36 @@ TestingSessionLocal = async_sessionmaker(
 )
 
 
+class StatementRecorder:
+    """Record the SQL statements and commits issued against the test engine"""
+    
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+    
+    def _commit(self, conn):
+        self.commits += 1
+    
+    def __enter__(self):
+        event.listen(test_engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(test_engine.sync_engine, "commit", self._commit)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(test_engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(test_engine.sync_engine, "commit", self._commit)
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty in-process caches"""
+    clear_caches()
+    yield
+
+
 async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
     async with TestingSessionLocal() as session:
         yield session
@@ -51,6 +84,21 @@ async def async_client():
     await test_engine.dispose()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def db_session() -> AsyncGenerator[AsyncSession, None]:
+    """Create a database session for service-level tests"""
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async with TestingSessionLocal() as session:
+        yield session
+    
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    
+    await test_engine.dispose()
+
+
 @pytest_asyncio.fixture
 async def test_user(async_client: AsyncClient):
     """Create a test user"""
@@ -0,0 +1,114 @@
+"""
+Minimal MaxMind DB writer for test fixtures
+
+Writes an IPv4 database in the MaxMind DB 2.0 format (24-bit records) from a
+mapping of CIDR networks to records, so GeoIP tests run offline without a
+real GeoLite2 file. Networks must not overlap.
+"""
+import ipaddress
+import struct
+import time
+from typing import Any, Dict
+
+METADATA_MARKER = b"\xab\xcd\xefMaxMind.com"
+
+
+class UInt16(int):
+    pass
+
+
+class UInt64(int):
+    pass
+
+
+def _control(type_: int, size: int) -> bytes:
+    if type_ <= 7:
+        first, extended = type_ << 5, b""
+    else:
+        first, extended = 0, bytes([type_ - 7])
+    if size < 29:
+        return bytes([first | size]) + extended
+    if size < 285:
+        return bytes([first | 29]) + extended + bytes([size - 29])
+    if size < 65821:
+        return bytes([first | 30]) + extended + (size - 285).to_bytes(2, "big")
+    return bytes([first | 31]) + extended + (size - 65821).to_bytes(3, "big")
+
+
+def _uint(type_: int, value: int) -> bytes:
+    payload = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return _control(type_, len(payload)) + payload
+
+
+def encode(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _control(14, int(value))
+    if isinstance(value, UInt16):
+        return _uint(5, value)
+    if isinstance(value, UInt64):
+        return _uint(9, value)
+    if isinstance(value, int):
+        return _uint(6, value)
+    if isinstance(value, float):
+        return _control(3, 8) + struct.pack(">d", value)
+    if isinstance(value, str):
+        payload = value.encode("utf-8")
+        return _control(2, len(payload)) + payload
+    if isinstance(value, dict):
+        return _control(7, len(value)) + b"".join(encode(key) + encode(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return _control(11, len(value)) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def write_mmdb(path, networks: Dict[str, Dict[str, Any]], database_type: str = "GeoLite2-City") -> None:
+    root = [None, None]
+    for cidr, record in networks.items():
+        network = ipaddress.ip_network(cidr)
+        bits, length = int(network.network_address), network.prefixlen
+        node = root
+        for depth in range(length):
+            bit = (bits >> (31 - depth)) & 1
+            if depth == length - 1:
+                node[bit] = record
+            else:
+                if not isinstance(node[bit], list):
+                    node[bit] = [None, None]
+                node = node[bit]
+
+    nodes = [root]
+    for node in nodes:
+        nodes.extend(child for child in node if isinstance(child, list))
+    index = {id(node): number for number, node in enumerate(nodes)}
+
+    data = b""
+    offsets = {}
+
+    def record_value(child) -> int:
+        nonlocal data
+        if child is None:
+            return len(nodes)
+        if isinstance(child, list):
+            return index[id(child)]
+        if id(child) not in offsets:
+            offsets[id(child)] = len(data)
+            data += encode(child)
+        return len(nodes) + 16 + offsets[id(child)]
+
+    tree = b"".join(
+        record_value(node[0]).to_bytes(3, "big") + record_value(node[1]).to_bytes(3, "big")
+        for node in nodes
+    )
+    metadata = {
+        "node_count": len(nodes),
+        "record_size": UInt16(24),
+        "ip_version": UInt16(4),
+        "database_type": database_type,
+        "languages": ["en"],
+        "binary_format_major_version": UInt16(2),
+        "binary_format_minor_version": UInt16(0),
+        "build_epoch": UInt64(int(time.time())),
+        "description": {"en": "Test fixture"},
+    }
+    with open(path, "wb") as output:
+        output.write(tree + b"\x00" * 16 + data + METADATA_MARKER + encode(metadata))
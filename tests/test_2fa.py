@@ -3,6 +3,9 @@ from httpx import AsyncClient
 import pyotp
 import json
 
+from app.models.user import User
+from tests.conftest import TestingSessionLocal
+
 
 @pytest.mark.asyncio
 async def test_2fa_status_not_enabled(authenticated_client: AsyncClient):
@@ -33,6 +36,31 @@ async def test_2fa_setup(authenticated_client: AsyncClient):
     return data["secret"]
 
 
+@pytest.mark.asyncio
+async def test_2fa_setup_svg_and_matrix(authenticated_client: AsyncClient):
+    """Test 2FA setup with the SVG and matrix QR code formats"""
+    response = await authenticated_client.post("/api/v1/2fa/setup?qr_format=svg")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["qr_code"].startswith("data:image/svg+xml,")
+    assert data["qr_matrix"] is None
+    
+    response = await authenticated_client.post("/api/v1/2fa/setup?qr_format=matrix")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["qr_code"] is None
+    rows = data["qr_matrix"]
+    size = len(rows)
+    assert size >= 21
+    bits = [format(int(row, 16), f"0{len(row) * 4}b")[:size] for row in rows]
+    # Finder pattern in the top left corner
+    assert bits[0][:7] == "1111111"
+    assert bits[1][:7] == "1000001"
+    
+    response = await authenticated_client.post("/api/v1/2fa/setup?qr_format=gif")
+    assert response.status_code == 422
+
+
 @pytest.mark.asyncio
 async def test_2fa_enable(authenticated_client: AsyncClient):
     """Test enabling 2FA"""
@@ -55,6 +83,24 @@ async def test_2fa_enable(authenticated_client: AsyncClient):
     assert status_response.json()["enabled"] is True
 
 
+@pytest.mark.asyncio
+async def test_2fa_status_etag_invalidated_on_enable(authenticated_client: AsyncClient):
+    """Test the cached 2FA status is replaced once 2FA is enabled"""
+    status_response = await authenticated_client.get("/api/v1/2fa/status")
+    etag = status_response.headers["ETag"]
+    
+    response = await authenticated_client.get("/api/v1/2fa/status", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    
+    setup_response = await authenticated_client.post("/api/v1/2fa/setup")
+    code = pyotp.TOTP(setup_response.json()["secret"]).now()
+    await authenticated_client.post("/api/v1/2fa/enable", json={"code": code})
+    
+    response = await authenticated_client.get("/api/v1/2fa/status", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["enabled"] is True
+
+
 @pytest.mark.asyncio
 async def test_2fa_enable_invalid_code(authenticated_client: AsyncClient):
     """Test enabling 2FA with invalid code"""
@@ -160,6 +206,48 @@ async def test_2fa_disable(authenticated_client: AsyncClient):
     assert status_response.json()["enabled"] is False
 
 
+@pytest.mark.asyncio
+async def test_2fa_user_flag_follows_enable_and_disable(authenticated_client: AsyncClient, test_user):
+    """users.two_factor_enabled is kept in sync by enable and disable"""
+    user_id = test_user["user"]["id"]
+    
+    async def user_flag():
+        async with TestingSessionLocal() as session:
+            return (await session.get(User, user_id)).two_factor_enabled
+    
+    setup_response = await authenticated_client.post("/api/v1/2fa/setup")
+    assert await user_flag() is False
+    
+    code = pyotp.TOTP(setup_response.json()["secret"]).now()
+    await authenticated_client.post("/api/v1/2fa/enable", json={"code": code})
+    assert await user_flag() is True
+    
+    await authenticated_client.post("/api/v1/2fa/disable")
+    assert await user_flag() is False
+
+
+@pytest.mark.asyncio
+async def test_login_on_trusted_device_still_requires_2fa(authenticated_client: AsyncClient, test_user):
+    """Test a trusted device does not skip 2FA for a user who enabled it"""
+    setup_response = await authenticated_client.post("/api/v1/2fa/setup")
+    code = pyotp.TOTP(setup_response.json()["secret"]).now()
+    await authenticated_client.post("/api/v1/2fa/enable", json={"code": code})
+    
+    devices = (await authenticated_client.get("/api/v1/devices/devices")).json()
+    for device in devices:
+        await authenticated_client.post(f"/api/v1/devices/devices/{device['device_id']}/trust")
+    
+    response = await authenticated_client.post("/api/v1/auth/login", json={
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["requires_2fa"] is True
+    assert data["device_id"] in {device["device_id"] for device in devices}
+    assert "refresh_token" not in data
+
+
 @pytest.mark.asyncio
 async def test_login_with_2fa(async_client: AsyncClient, test_user):
     """Test login flow with 2FA enabled"""
@@ -209,4 +297,23 @@ async def test_login_with_2fa(async_client: AsyncClient, test_user):
     final_data = verify_response.json()
     assert "access_token" in final_data
     assert "refresh_token" in final_data
-    assert final_data["token_type"] == "bearer"
\ No newline at end of file
+    assert final_data["token_type"] == "bearer"
+
+@pytest.mark.asyncio
+async def test_partial_token_only_verifies_2fa(authenticated_client: AsyncClient, async_client: AsyncClient, test_user):
+    """Test the partial 2FA token is not an access token, and an access token cannot verify 2FA"""
+    setup_response = await authenticated_client.post("/api/v1/2fa/setup")
+    totp = pyotp.TOTP(setup_response.json()["secret"])
+    await authenticated_client.post("/api/v1/2fa/enable", json={"code": totp.now()})
+    
+    response = await async_client.post("/api/v1/auth/login", json={
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    })
+    partial_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    response = await async_client.get("/api/v1/users/me", headers=partial_headers)
+    assert response.status_code == 401
+    
+    response = await authenticated_client.post("/api/v1/auth/verify-2fa", params={"code": totp.now()})
+    assert response.status_code == 401
@@ -0,0 +1,55 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.services.activity_buffer import ActivityBuffer
+from app.services.user import create_user
+from tests.conftest import TestingSessionLocal, StatementRecorder
+
+
+async def create_users(db, count):
+    users = []
+    for i in range(count):
+        users.append(await create_user(db, UserCreate(
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            password="password123"
+        )))
+    return users
+
+
+def test_touches_are_coalesced_per_row():
+    """Repeated touches keep only the newest timestamp per row"""
+    buffer = ActivityBuffer(flush_interval=60)
+    first = datetime(2024, 1, 1, 12, 0, 0)
+    
+    buffer.touch(User, 1, "last_login", first + timedelta(seconds=5))
+    buffer.touch(User, 1, "last_login", first)
+    buffer.touch(User, 2, "last_login", first)
+    
+    assert buffer.pending_count == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_one_batched_update(db_session):
+    """Pending timestamps are written with a single UPDATE ... CASE"""
+    users = await create_users(db_session, 3)
+    buffer = ActivityBuffer(flush_interval=60)
+    stamps = {user.id: datetime(2024, 1, 1, 12, 0, i) for i, user in enumerate(users)}
+    for user_id, at in stamps.items():
+        buffer.touch(User, user_id, "last_login", at)
+    
+    with StatementRecorder() as recorder:
+        updated = await buffer.flush(TestingSessionLocal)
+    
+    assert updated == 3
+    assert buffer.pending_count == 0
+    updates = [statement for statement, _ in recorder.statements if statement.startswith("UPDATE")]
+    assert len(updates) == 1
+    assert "CASE" in updates[0]
+    
+    db_session.expire_all()
+    for user in users:
+        await db_session.refresh(user)
+        assert user.last_login.replace(tzinfo=None) == stamps[user.id]
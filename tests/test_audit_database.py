@@ -0,0 +1,72 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.database import DatabaseManager, db_manager
+from app.db.migrations import create_audit_tables
+from app.models.login_history import LoginHistory
+from tests.conftest import TestingSessionLocal
+
+
+@pytest_asyncio.fixture
+async def audit_engine(tmp_path, monkeypatch):
+    """Route audit data to a separate SQLite database for the test"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/audit.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(create_audit_tables)
+    
+    monkeypatch.setattr(db_manager, "audit_engine", engine)
+    monkeypatch.setattr(db_manager, "audit_session_maker", async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    ))
+    yield engine
+    await engine.dispose()
+
+
+async def _history_count(session_maker):
+    async with session_maker() as db:
+        return await db.scalar(select(func.count()).select_from(LoginHistory))
+
+
+@pytest.mark.asyncio
+async def test_login_history_goes_to_audit_database(async_client: AsyncClient, test_user, audit_engine):
+    """Test login attempts are written to and read from the audit database"""
+    login_data = {"email": test_user["user"]["email"], "password": test_user["password"]}
+    response = await async_client.post("/api/v1/auth/login", json=login_data)
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    
+    response = await async_client.post("/api/v1/auth/login", json={**login_data, "password": "wrong"})
+    assert response.status_code == 401
+    
+    assert await _history_count(db_manager.audit_session_maker) == 2
+    assert await _history_count(TestingSessionLocal) == 0
+    
+    response = await async_client.get(
+        "/api/v1/devices/login-history", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert [record["status"] for record in response.json()] == ["failed", "success"]
+
+
+@pytest.mark.asyncio
+async def test_manager_creates_separate_audit_engine(tmp_path, monkeypatch):
+    """Test DatabaseManager builds its own engine and tables for audit data"""
+    monkeypatch.setattr(settings, "SQLITE_URL", f"sqlite+aiosqlite:///{tmp_path}/main.db")
+    monkeypatch.setattr(settings, "AUDIT_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path}/audit.db")
+    
+    manager = DatabaseManager()
+    await manager.initialize()
+    try:
+        await manager.create_tables()
+        assert manager.audit_engine is not manager.engine
+        assert manager.audit_session_maker is not manager.async_session_maker
+        
+        async with manager.audit_engine.connect() as conn:
+            tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        assert tables == ["login_history"]
+    finally:
+        await manager.close()
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.models.login_history import LoginHistory
+from app.services import audit
+from app.services.audit import LoginHistoryIngestor
+from tests.conftest import TestingSessionLocal, StatementRecorder
+
+
+def make_record(i):
+    return {
+        "user_id": 1,
+        "device_id": None,
+        "ip_address": f"10.0.0.{i}",
+        "user_agent": "pytest",
+        "location": None,
+        "login_method": "password",
+        "status": "failed",
+        "failure_reason": "wrong_password",
+        "created_at": datetime.utcnow()
+    }
+
+
+async def stored_ips(db):
+    result = await db.execute(select(LoginHistory.ip_address).order_by(LoginHistory.id))
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_records_are_bulk_inserted_in_batches(db_session):
+    """Queued records are written with one INSERT per batch"""
+    ingestor = LoginHistoryIngestor(max_queue_size=100, batch_size=5, batch_timeout=60)
+    await ingestor.start(TestingSessionLocal)
+    
+    with StatementRecorder() as recorder:
+        for i in range(7):
+            await ingestor.submit(make_record(i))
+        await ingestor.stop()
+    
+    inserts = [statement for statement, _ in recorder.statements if statement.startswith("INSERT")]
+    assert len(inserts) == 2
+    assert ingestor.written == 7
+    assert await stored_ips(db_session) == [f"10.0.0.{i}" for i in range(7)]
+
+
+@pytest.mark.asyncio
+async def test_drop_newest_overflow_policy(db_session):
+    """Records beyond the queue size are dropped with drop_newest"""
+    ingestor = LoginHistoryIngestor(
+        max_queue_size=2, batch_size=10, batch_timeout=60, overflow_policy="drop_newest"
+    )
+    await ingestor.start(TestingSessionLocal)
+    
+    accepted = [await ingestor.submit(make_record(i)) for i in range(5)]
+    await ingestor.stop()
+    
+    assert accepted == [True, True, False, False, False]
+    assert ingestor.dropped == 3
+    assert await stored_ips(db_session) == ["10.0.0.0", "10.0.0.1"]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_overflow_policy(db_session):
+    """The oldest queued records are evicted with drop_oldest"""
+    ingestor = LoginHistoryIngestor(
+        max_queue_size=2, batch_size=10, batch_timeout=60, overflow_policy="drop_oldest"
+    )
+    await ingestor.start(TestingSessionLocal)
+    
+    for i in range(5):
+        await ingestor.submit(make_record(i))
+    await ingestor.stop()
+    
+    assert ingestor.dropped == 3
+    assert await stored_ips(db_session) == ["10.0.0.3", "10.0.0.4"]
+
+
+def failing_writes(monkeypatch, failures):
+    """Make the next ``failures`` batch writes raise, as during a database outage"""
+    write = audit.write_login_history
+    calls = {"failed": 0}
+    
+    async def flaky_write(db, records):
+        if failures is None or calls["failed"] < failures:
+            calls["failed"] += 1
+            raise OperationalError("INSERT", {}, Exception("database is unavailable"))
+        await write(db, records)
+    
+    monkeypatch.setattr(audit, "write_login_history", flaky_write)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried(db_session, monkeypatch):
+    """A batch that fails to write is retried instead of being lost"""
+    calls = failing_writes(monkeypatch, failures=2)
+    ingestor = LoginHistoryIngestor(max_queue_size=100, batch_size=3, batch_timeout=60, retry_delay=0.01)
+    await ingestor.start(TestingSessionLocal)
+    
+    for i in range(3):
+        await ingestor.submit(make_record(i))
+    while ingestor.written < 3:
+        await asyncio.sleep(0.01)
+    await ingestor.stop()
+    
+    assert calls["failed"] == 2
+    assert ingestor.dropped == 0
+    assert await stored_ips(db_session) == ["10.0.0.0", "10.0.0.1", "10.0.0.2"]
+
+
+@pytest.mark.asyncio
+async def test_failing_batch_is_dropped_by_drop_oldest(db_session, monkeypatch):
+    """With drop_oldest, a batch that still fails once the queue is full is dropped and counted"""
+    failing_writes(monkeypatch, failures=None)
+    ingestor = LoginHistoryIngestor(
+        max_queue_size=2, batch_size=1, batch_timeout=60, overflow_policy="drop_oldest", retry_delay=0.01
+    )
+    await ingestor.start(TestingSessionLocal)
+    
+    await ingestor.submit(make_record(0))
+    await asyncio.sleep(0.05)
+    # Still retrying the first record while the queue fills up
+    assert ingestor.dropped == 0
+    for i in range(1, 3):
+        await ingestor.submit(make_record(i))
+    while ingestor.dropped == 0:
+        await asyncio.sleep(0.01)
+    assert ingestor.dropped == 1
+    
+    await ingestor.stop()
+    assert ingestor.dropped == 3
+    assert ingestor.written == 0
@@ -38,7 +38,24 @@ async def test_register_duplicate_email(async_client: AsyncClient, test_user):
     
     response = await async_client.post("/api/v1/auth/register", json=user_data)
     assert response.status_code == 400
-    assert "already registered" in response.json()["detail"]
+    assert response.json()["detail"] == "Email already registered"
+
+
+@pytest.mark.asyncio
+async def test_register_duplicate_skips_password_hash(async_client: AsyncClient, test_user, monkeypatch):
+    """Test a duplicate registration is rejected before the password is hashed"""
+    def fail(password):
+        raise AssertionError("password hashed for a duplicate signup")
+    monkeypatch.setattr("app.services.user.get_password_hash", fail)
+    
+    user_data = {
+        "email": test_user["user"]["email"],
+        "username": "anotheruser",
+        "password": "password123"
+    }
+    
+    response = await async_client.post("/api/v1/auth/register", json=user_data)
+    assert response.status_code == 400
 
 
 @pytest.mark.asyncio
@@ -52,7 +69,77 @@ async def test_register_duplicate_username(async_client: AsyncClient, test_user)
     
     response = await async_client.post("/api/v1/auth/register", json=user_data)
     assert response.status_code == 400
-    assert "already registered" in response.json()["detail"]
+    assert response.json()["detail"] == "Username already registered"
+
+
+@pytest.mark.asyncio
+async def test_register_duplicate_phone(async_client: AsyncClient):
+    """Test registration with duplicate phone number"""
+    user_data = {
+        "email": "first@example.com",
+        "username": "firstuser",
+        "password": "password123",
+        "phone": "+1234567890"
+    }
+    response = await async_client.post("/api/v1/auth/register", json=user_data)
+    assert response.status_code == 200
+    
+    user_data.update(email="second@example.com", username="seconduser")
+    response = await async_client.post("/api/v1/auth/register", json=user_data)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Phone number already registered"
+
+
+@pytest.mark.asyncio
+async def test_register_checks_uniqueness_in_one_query(async_client: AsyncClient):
+    """Test registration looks up taken fields with a single query before inserting"""
+    from tests.conftest import StatementRecorder
+    
+    with StatementRecorder() as recorder:
+        response = await async_client.post("/api/v1/auth/register", json={
+            "email": "fast@example.com",
+            "username": "fastuser",
+            "password": "password123"
+        })
+    assert response.status_code == 200
+    
+    statements = [statement for statement, _ in recorder.statements]
+    first_insert = next(i for i, statement in enumerate(statements) if statement.startswith("INSERT INTO users"))
+    assert sum("FROM users" in statement for statement in statements[:first_insert]) == 1
+
+
+@pytest.mark.asyncio
+async def test_register_race_maps_integrity_error(async_client: AsyncClient, test_user, monkeypatch):
+    """Test a signup that loses the race to a concurrent one still gets a field error"""
+    async def no_conflicts(*args):
+        return []
+    monkeypatch.setattr("app.services.user.get_conflicting_fields", no_conflicts)
+    
+    response = await async_client.post("/api/v1/auth/register", json={
+        "email": "racer@example.com",
+        "username": test_user["user"]["username"],
+        "password": "password123"
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already registered"
+
+
+@pytest.mark.asyncio
+async def test_get_conflicting_fields(db_session):
+    """Test the combined uniqueness query reports every conflicting field"""
+    from app.schemas.user import UserCreate
+    from app.services import user as user_service
+    
+    await user_service.create_user(db_session, UserCreate(
+        email="taken@example.com", username="taken", password="password123", phone="+100"
+    ))
+    
+    assert await user_service.get_conflicting_fields(
+        db_session, "taken@example.com", "other", "+100"
+    ) == ["email", "phone"]
+    assert await user_service.get_conflicting_fields(
+        db_session, "free@example.com", "free", None
+    ) == []
 
 
 @pytest.mark.asyncio
@@ -73,6 +160,23 @@ async def test_login_success(async_client: AsyncClient, test_user):
     assert "requires_2fa" not in data or data.get("requires_2fa") is False
 
 
+@pytest.mark.asyncio
+async def test_login_single_transaction(async_client: AsyncClient, test_user):
+    """Test a successful login commits exactly once"""
+    from tests.conftest import StatementRecorder
+    
+    login_data = {
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    }
+    
+    with StatementRecorder() as recorder:
+        response = await async_client.post("/api/v1/auth/login", json=login_data)
+    
+    assert response.status_code == 200
+    assert recorder.commits == 1
+
+
 @pytest.mark.asyncio
 async def test_login_wrong_password(async_client: AsyncClient, test_user):
     """Test login with wrong password"""
@@ -125,6 +229,27 @@ async def test_refresh_token(async_client: AsyncClient, test_user):
     assert data["token_type"] == "bearer"
 
 
+@pytest.mark.asyncio
+async def test_refresh_token_stored_as_digest(async_client: AsyncClient, test_user):
+    """Test refresh tokens are stored as SHA-256 digests, not plaintext"""
+    import hashlib
+    from sqlalchemy import select
+    from app.models.refresh_token import RefreshToken
+    from tests.conftest import TestingSessionLocal
+    
+    login_response = await async_client.post("/api/v1/auth/login", json={
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    })
+    refresh_token = login_response.json()["refresh_token"]
+    
+    async with TestingSessionLocal() as db:
+        stored = (await db.execute(select(RefreshToken))).scalars().all()
+    
+    assert len(stored) == 1
+    assert stored[0].token_hash == hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
 @pytest.mark.asyncio
 async def test_logout(async_client: AsyncClient, test_user):
     """Test logout endpoint"""
@@ -196,3 +321,35 @@ async def test_rate_limiting(async_client: AsyncClient):
         response = await async_client.post("/api/v1/auth/login", json=login_data)
         # With rate limiting disabled, all requests should get 401 (wrong password)
         assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_opens_no_session(async_client: AsyncClient):
+    """Test that bad bearer tokens are rejected before a DB session is opened"""
+    from app.core.security import create_refresh_token
+    from app.db.database import get_db
+    from app.main import app
+    from tests.conftest import override_get_db
+    
+    opened = []
+    
+    async def counting_get_db():
+        opened.append(1)
+        async for session in override_get_db():
+            yield session
+    
+    app.dependency_overrides[get_db] = counting_get_db
+    try:
+        refresh = create_refresh_token({"sub": "ghost@example.com"})
+        for token in ("garbage", refresh):
+            headers = {"Authorization": f"Bearer {token}"}
+            response = await async_client.get("/api/v1/users/me", headers=headers)
+            assert response.status_code == 401
+            response = await async_client.post(
+                "/api/v1/auth/logout", json={"token": "x"}, headers=headers
+            )
+            assert response.status_code == 401
+    finally:
+        app.dependency_overrides[get_db] = override_get_db
+    
+    assert opened == []
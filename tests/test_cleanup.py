@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.security import hash_token
+from app.db.bulk import delete_in_chunks
+from app.models.email_verification import EmailVerification
+from app.models.refresh_token import RefreshToken
+from app.schemas.user import UserCreate
+from app.services import user as user_service
+from app.tasks.cleanup import run_cleanup
+from tests.conftest import StatementRecorder, TestingSessionLocal
+
+
+async def _seed_tokens(db, user_id, expired=0, revoked=0, live=0):
+    now = datetime.utcnow()
+    rows = (
+        [(now - timedelta(days=1), True)] * expired
+        + [(now + timedelta(days=1), False)] * revoked
+        + [(now + timedelta(days=1), True)] * live
+    )
+    for i, (expires_at, is_active) in enumerate(rows):
+        db.add(RefreshToken(
+            token_hash=hash_token(f"token-{i}"),
+            user_id=user_id,
+            expires_at=expires_at,
+            is_active=is_active
+        ))
+    await db.commit()
+
+
+async def _count(db, model):
+    return await db.scalar(select(func.count()).select_from(model))
+
+
+@pytest.mark.asyncio
+async def test_delete_in_chunks_commits_per_chunk(db_session):
+    """Test chunked deletes commit once per batch and leave live rows alone"""
+    user = await user_service.create_user(db_session, UserCreate(
+        email="cleanup@example.com", username="cleanup", password="password123"
+    ))
+    await _seed_tokens(db_session, user.id, expired=15, revoked=10, live=3)
+    
+    with StatementRecorder() as recorder:
+        deleted = await delete_in_chunks(
+            db_session, RefreshToken, RefreshToken.expires_at <= datetime.utcnow(),
+            batch_size=4, pause=0
+        )
+    
+    assert deleted == 15
+    assert recorder.commits == 4
+    assert await _count(db_session, RefreshToken) == 13
+
+
+@pytest.mark.asyncio
+async def test_delete_in_chunks_stops_at_deadline(db_session):
+    """Test a spent time budget stops after the current chunk"""
+    user = await user_service.create_user(db_session, UserCreate(
+        email="cleanup@example.com", username="cleanup", password="password123"
+    ))
+    await _seed_tokens(db_session, user.id, expired=10)
+    
+    deleted = await delete_in_chunks(
+        db_session, RefreshToken, RefreshToken.expires_at <= datetime.utcnow(),
+        batch_size=4, pause=0, deadline=time.monotonic()
+    )
+    
+    assert deleted == 4
+    assert await _count(db_session, RefreshToken) == 6
+
+
+@pytest.mark.asyncio
+async def test_run_cleanup_purges_revoked_and_stale_rows(db_session):
+    """Test the cleanup run removes expired/revoked tokens and stale verifications"""
+    user = await user_service.create_user(db_session, UserCreate(
+        email="cleanup@example.com", username="cleanup", password="password123"
+    ))
+    other = await user_service.create_user(db_session, UserCreate(
+        email="pending@example.com", username="pending", password="password123"
+    ))
+    await _seed_tokens(db_session, user.id, expired=3, revoked=2, live=1)
+    db_session.add_all([
+        EmailVerification(
+            user_id=user.id, token="verified",
+            expires_at=datetime.utcnow() + timedelta(hours=1), verified_at=datetime.utcnow()
+        ),
+        EmailVerification(
+            user_id=other.id, token="pending",
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        ),
+    ])
+    await db_session.commit()
+    
+    counts = await run_cleanup(TestingSessionLocal)
+    
+    assert counts["refresh_tokens"] == 5
+    assert counts["email_verifications"] == 1
+    assert await _count(db_session, RefreshToken) == 1
+    remaining = await db_session.scalars(select(EmailVerification.token))
+    assert remaining.all() == ["pending"]
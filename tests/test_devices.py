@@ -1,6 +1,8 @@
 import pytest
 from httpx import AsyncClient
 
+from app.core.response_cache import response_cache
+
 
 @pytest.mark.asyncio
 async def test_get_user_devices(authenticated_client: AsyncClient):
@@ -143,6 +145,41 @@ async def test_login_history_pagination(authenticated_client: AsyncClient):
         assert data[0]["id"] != data2[0]["id"]
 
 
+@pytest.mark.asyncio
+async def test_login_history_cursor_pagination(authenticated_client: AsyncClient):
+    """Test login history keyset pagination with X-Next-Cursor"""
+    for i in range(4):
+        await authenticated_client.post("/api/v1/auth/login", json={
+            "email": "test@example.com",
+            "password": "wrongpassword"
+        })
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await authenticated_client.get("/api/v1/devices/login-history", params=params)
+        assert response.status_code == 200
+        seen.extend(entry["id"] for entry in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    
+    # Every record exactly once, newest first
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+    assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_login_history_invalid_cursor(authenticated_client: AsyncClient):
+    """Test malformed cursors are rejected"""
+    response = await authenticated_client.get("/api/v1/devices/login-history?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_failed_login_tracking(async_client: AsyncClient, test_user):
     """Test that failed login attempts are tracked"""
@@ -167,4 +204,148 @@ async def test_failed_login_tracking(async_client: AsyncClient, test_user):
     # Check for failed attempt
     failed_attempts = [h for h in history if h["status"] == "failed"]
     assert len(failed_attempts) > 0
-    assert failed_attempts[0]["failure_reason"] == "wrong_password"
\ No newline at end of file
+    assert failed_attempts[0]["failure_reason"] == "wrong_password"
+
+def test_user_agent_parsing_is_cached():
+    """Test the device id and device info share one cached parse"""
+    from app.core.user_agent import clear_user_agent_cache, user_agent_cache_stats
+    from app.services.device_management import device_management_service
+    
+    clear_user_agent_cache()
+    user_agent = "Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148"
+    device_id = device_management_service.generate_device_id(user_agent, "127.0.0.1")
+    info = device_management_service.parse_user_agent(user_agent)
+    
+    assert len(device_id) == 32
+    assert info["device_type"] == "mobile"
+    assert info["device_name"] == f"{info['browser']} on iOS"
+    stats = user_agent_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_device_touch_is_throttled(db_session):
+    """Test repeat logins skip the device write until the IP changes or the device is trusted"""
+    from app.schemas.user import UserCreate
+    from app.services import user as user_service
+    from app.services.device_management import device_management_service
+    from tests.conftest import StatementRecorder
+    
+    user = await user_service.create_user(db_session, UserCreate(
+        email="throttle@example.com", username="throttle", password="password123"
+    ))
+    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0"
+    first = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    
+    with StatementRecorder() as recorder:
+        repeat = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    # Read back, not written
+    assert len(recorder.statements) == 1
+    assert recorder.statements[0][0].startswith("SELECT")
+    assert repeat.device_id == first.device_id
+    
+    with StatementRecorder() as recorder:
+        moved = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.2")
+    assert recorder.commits == 1
+    assert moved.ip_address == "10.0.0.2"
+    
+    await device_management_service.trust_device(db_session, user.id, first.device_id)
+    device = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.2")
+    assert device.is_trusted is True
+
+
+@pytest.mark.asyncio
+async def test_throttled_device_sees_changes_from_other_workers(db_session):
+    """Test a throttled repeat login reads trust and removal made elsewhere"""
+    from sqlalchemy import delete, update
+    from app.models.user_device import UserDevice
+    from app.schemas.user import UserCreate
+    from app.services import user as user_service
+    from app.services.device_management import device_management_service
+    
+    user = await user_service.create_user(db_session, UserCreate(
+        email="workers@example.com", username="workers", password="password123"
+    ))
+    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0"
+    first = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    device_key = (UserDevice.user_id == user.id, UserDevice.device_id == first.device_id)
+    
+    # Another worker trusts, then untrusts the device, leaving this worker's cache alone
+    await db_session.execute(update(UserDevice).where(*device_key).values(is_trusted=True))
+    await db_session.commit()
+    device = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    assert device.is_trusted is True
+    
+    await db_session.execute(update(UserDevice).where(*device_key).values(is_trusted=False))
+    await db_session.commit()
+    device = await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    assert device.is_trusted is False
+    
+    # Another worker removes it: the login registers it again
+    await db_session.execute(delete(UserDevice).where(*device_key))
+    await db_session.commit()
+    await device_management_service.register_device(db_session, user.id, user_agent, "10.0.0.1")
+    assert await device_management_service.get_device(db_session, user.id, first.device_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_device_list_etag(authenticated_client: AsyncClient):
+    """Test If-None-Match gets 304 without queries until a write invalidates the list"""
+    from tests.conftest import StatementRecorder
+    
+    response = await authenticated_client.get("/api/v1/devices/devices")
+    etag = response.headers["ETag"]
+    device_id = response.json()[0]["device_id"]
+    
+    with StatementRecorder() as recorder:
+        response = await authenticated_client.get("/api/v1/devices/devices", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert recorder.statements == []
+    
+    await authenticated_client.post(f"/api/v1/devices/devices/{device_id}/trust")
+    response = await authenticated_client.get("/api/v1/devices/devices", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["is_trusted"] is True
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_gets_no_304(authenticated_client: AsyncClient):
+    """Test deactivating a user drops their cached responses"""
+    response = await authenticated_client.get("/api/v1/devices/devices")
+    etag = response.headers["ETag"]
+    
+    response = await authenticated_client.put("/api/v1/users/me", json={"is_active": False})
+    assert response.status_code == 200
+    
+    response = await authenticated_client.get("/api/v1/devices/devices", headers={"If-None-Match": etag})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_reused_email_is_not_served_previous_owner_cache(authenticated_client: AsyncClient, test_user):
+    """Test an account registered with someone's old email never gets their cached responses"""
+    devices = (await authenticated_client.get("/api/v1/devices/devices")).json()
+    await authenticated_client.post(f"/api/v1/devices/devices/{devices[0]['device_id']}/trust")
+    response = await authenticated_client.get("/api/v1/devices/devices")
+    assert response.json()[0]["is_trusted"] is True
+    
+    response = await authenticated_client.put("/api/v1/users/me", json={"email": "moved@example.com"})
+    assert response.status_code == 200
+    
+    authenticated_client.headers = {}
+    login_data = {"email": test_user["user"]["email"], "password": "otherpassword123"}
+    response = await authenticated_client.post("/api/v1/auth/register", json={**login_data, "username": "newowner"})
+    assert response.status_code == 200
+    token = (await authenticated_client.post("/api/v1/auth/login", json=login_data)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    response = await authenticated_client.get("/api/v1/devices/devices", headers=headers)
+    assert response.json()[0]["is_trusted"] is False
+    
+    # A mapping still pointing at the previous owner (e.g. on another worker)
+    # finds their entry, which is not served
+    response_cache.subjects.set(test_user["user"]["email"], test_user["user"]["id"])
+    response = await authenticated_client.get("/api/v1/devices/devices", headers=headers)
+    assert response.json()[0]["is_trusted"] is False
@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import select
+
+from app.models.login_history import LoginHistory
+from app.models.user_device import UserDevice
+from app.schemas.user import UserCreate
+from app.services import user as user_service
+from app.services.activity_buffer import activity_buffer
+from app.services.device_management import device_management_service
+from app.services.geoip import GeoIPService, geoip_service
+from tests.conftest import TestingSessionLocal
+from tests.mmdb import write_mmdb
+
+NETWORKS = {
+    "81.2.69.0/24": {
+        "city": {"names": {"en": "London"}},
+        "country": {"iso_code": "GB", "names": {"en": "United Kingdom"}},
+    },
+    "89.160.20.0/24": {
+        "country": {"iso_code": "SE", "names": {"en": "Sweden"}},
+    },
+}
+
+
+@pytest.fixture
+def geoip_path(tmp_path):
+    path = tmp_path / "GeoLite2-City-Test.mmdb"
+    write_mmdb(path, NETWORKS)
+    return str(path)
+
+
+@pytest.fixture
+def global_geoip(geoip_path):
+    geoip_service.open(geoip_path)
+    yield geoip_service
+    geoip_service.close()
+    geoip_service.database_path = ""
+
+
+def test_lookup_formats_and_caches(geoip_path):
+    """Test lookups resolve city and country and repeat lookups hit the cache"""
+    service = GeoIPService(geoip_path, cache_size=10)
+
+    assert service.lookup("81.2.69.160") == "London, United Kingdom"
+    assert service.lookup("89.160.20.112") == "Sweden"
+    assert service.lookup("8.8.8.8") is None
+    assert service.lookup("81.2.69.160") == "London, United Kingdom"
+    assert service.cache.stats()["hits"] == 1
+
+    # Private, malformed and IPv6 (against an IPv4 database) addresses
+    assert service.lookup("192.168.1.10") is None
+    assert service.lookup("unknown") is None
+    assert service.lookup("2001:db8::1") is None
+    service.close()
+
+
+def test_lookup_without_database():
+    """Test a missing database disables lookups instead of failing"""
+    assert GeoIPService("", cache_size=10).lookup("81.2.69.160") is None
+    assert GeoIPService("/nonexistent/GeoLite2-City.mmdb", cache_size=10).lookup("81.2.69.160") is None
+
+
+@pytest.mark.asyncio
+async def test_device_and_login_history_get_location(db_session, global_geoip):
+    """Test devices get their location when the activity buffer flushes, inline logins on insert"""
+    user = await user_service.create_user(db_session, UserCreate(
+        email="geo@example.com", username="geo", password="password123"
+    ))
+
+    device = await device_management_service.register_device(
+        db_session, user.id, "Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0", "81.2.69.160"
+    )
+    await device_management_service.record_login_attempt(
+        db_session, user_id=user.id, ip_address="89.160.20.112", user_agent="test",
+        login_method="password", status="success"
+    )
+    # The device is not resolved on the request path
+    assert device.location is None
+    locations = (await db_session.scalars(select(LoginHistory.location))).all()
+    assert locations == ["Sweden"]
+
+    await activity_buffer.flush(TestingSessionLocal)
+    db_session.expire_all()
+    assert (await db_session.scalar(select(UserDevice.location))) == "London, United Kingdom"
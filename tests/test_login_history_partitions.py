@@ -0,0 +1,185 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, insert, text
+
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.db.migrations import migrate_login_history_partitions
+from app.models.login_history import LoginHistory
+from app.schemas.user import UserCreate
+from app.services import user as user_service
+from app.services.audit import write_login_history
+from app.services.device_management import device_management_service
+from app.tasks.retention import run_login_history_retention
+from tests.conftest import StatementRecorder, TestingSessionLocal
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    monkeypatch.setattr(settings, "LOGIN_HISTORY_PARTITIONING", True)
+
+
+def _record(user_id, created_at, status="success"):
+    return {
+        "user_id": user_id,
+        "ip_address": "10.0.0.1",
+        "login_method": "password",
+        "status": status,
+        "created_at": created_at
+    }
+
+
+async def _tables(db):
+    conn = await db.connection()
+    names = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    return sorted(name for name in names if name.startswith("login_history_"))
+
+
+async def _user(db):
+    return await user_service.create_user(db, UserCreate(
+        email="history@example.com", username="history", password="password123"
+    ))
+
+
+@pytest.mark.asyncio
+async def test_records_are_written_to_monthly_tables(db_session, partitioned):
+    """Test writes land in per-month tables with ids unique across months"""
+    user = await _user(db_session)
+    await write_login_history(db_session, [
+        _record(user.id, datetime(2026, 9, 30, 23, 59)),
+        _record(user.id, datetime(2026, 10, 1, 0, 1)),
+    ])
+    # A month created later still hands out ids above the existing ones
+    await write_login_history(db_session, [_record(user.id, datetime(2026, 8, 15))])
+    await db_session.commit()
+    
+    assert await _tables(db_session) == ["login_history_202608", "login_history_202609", "login_history_202610"]
+    history = await device_management_service.get_login_history(db_session, user.id)
+    assert [record.created_at.month for record in history] == [10, 9, 8]
+    assert len({record.id for record in history}) == 3
+    assert history[2].id > history[0].id
+
+
+@pytest.mark.asyncio
+async def test_history_pages_across_partitions(db_session, partitioned):
+    """Test cursor pagination walks partitions newest first"""
+    user = await _user(db_session)
+    start = datetime(2026, 8, 25)
+    await write_login_history(db_session, [
+        _record(user.id, start + timedelta(days=3 * i)) for i in range(12)
+    ])
+    await db_session.commit()
+    
+    seen = []
+    cursor = None
+    while True:
+        page = await device_management_service.get_login_history(db_session, user.id, limit=5, cursor=cursor)
+        seen.extend(record.created_at for record in page)
+        if len(page) < 5:
+            break
+        cursor = decode_cursor(encode_cursor(page[-1].created_at, page[-1].id))
+    
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == 12
+    
+    offset_page = await device_management_service.get_login_history(db_session, user.id, limit=4, offset=6)
+    assert [record.created_at for record in offset_page] == seen[6:10]
+
+
+@pytest.mark.asyncio
+async def test_recent_failed_attempts_reads_current_months_only(db_session, partitioned):
+    """Test failed-attempt counting only touches partitions in the window"""
+    user = await _user(db_session)
+    now = datetime.utcnow()
+    await write_login_history(db_session, [
+        _record(user.id, now - timedelta(minutes=5), status="failed"),
+        _record(user.id, now - timedelta(days=70), status="failed"),
+    ])
+    await db_session.commit()
+    
+    with StatementRecorder() as recorder:
+        assert await device_management_service.get_recent_failed_attempts(db_session, user.id) == 1
+    assert len(recorder.statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_retention_archives_and_drops_old_months(db_session, partitioned, tmp_path):
+    """Test expired months are streamed to gzipped NDJSON and dropped"""
+    user = await _user(db_session)
+    await write_login_history(db_session, [
+        _record(user.id, datetime(2026, 1, 10)),
+        _record(user.id, datetime(2026, 1, 20)),
+        _record(user.id, datetime(2026, 9, 1)),
+        _record(user.id, datetime(2026, 10, 1)),
+    ])
+    await db_session.commit()
+    
+    archived = await run_login_history_retention(
+        TestingSessionLocal, retention_months=3, archive_dir=str(tmp_path), now=datetime(2026, 10, 19)
+    )
+    
+    assert archived == {"login_history_202601": 2}
+    assert await _tables(db_session) == ["login_history_202609", "login_history_202610"]
+    with gzip.open(tmp_path / "login_history_202601.ndjson.gz", "rt") as archive:
+        rows = [json.loads(line) for line in archive]
+    assert [row["created_at"] for row in rows] == ["2026-01-10T00:00:00", "2026-01-20T00:00:00"]
+
+
+@pytest.mark.asyncio
+async def test_migration_moves_legacy_rows(db_session, partitioned):
+    """Test enabling partitioning moves existing rows into monthly tables"""
+    user = await _user(db_session)
+    await db_session.execute(insert(LoginHistory), [
+        _record(user.id, datetime(2026, 9, 3)),
+        _record(user.id, datetime(2026, 10, 3)),
+    ])
+    await db_session.commit()
+    
+    conn = await db_session.connection()
+    await conn.run_sync(migrate_login_history_partitions)
+    await db_session.commit()
+    
+    assert await _tables(db_session) == ["login_history_202609", "login_history_202610"]
+    remaining = await db_session.scalar(text("SELECT COUNT(*) FROM login_history"))
+    assert remaining == 0
+    history = await device_management_service.get_login_history(db_session, user.id)
+    assert len(history) == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_login_history_across_partitions(db_session, partitioned):
+    """Test a user's history is deleted from every month table"""
+    user = await _user(db_session)
+    await write_login_history(db_session, [
+        _record(user.id, datetime(2026, 8, 15)),
+        _record(user.id, datetime(2026, 9, 15)),
+        _record(user.id + 1, datetime(2026, 9, 16)),
+    ])
+    await db_session.commit()
+    
+    assert await device_management_service.delete_login_history(db_session, user.id) == 2
+    assert await device_management_service.get_login_history(db_session, user.id) == []
+    assert len(await device_management_service.get_login_history(db_session, user.id + 1)) == 1
+
+
+def test_mysql_partition_statements_start_at_oldest_row():
+    """Test the MySQL conversion creates a partition per month from the oldest row"""
+    from app.db.partitions import login_history_partitions
+    
+    statements = login_history_partitions.mysql_partition_statements(
+        ["login_history_ibfk_1"], datetime(2026, 8, 20, 12, 30), datetime(2026, 11, 1)
+    )
+    
+    assert statements == [
+        "ALTER TABLE login_history DROP FOREIGN KEY login_history_ibfk_1",
+        "ALTER TABLE login_history DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)",
+        "ALTER TABLE login_history PARTITION BY RANGE (TO_DAYS(created_at)) ("
+        "PARTITION p202608 VALUES LESS THAN (TO_DAYS('2026-09-01')), "
+        "PARTITION p202609 VALUES LESS THAN (TO_DAYS('2026-10-01')), "
+        "PARTITION p202610 VALUES LESS THAN (TO_DAYS('2026-11-01')), "
+        "PARTITION p202611 VALUES LESS THAN (TO_DAYS('2026-12-01')), "
+        "PARTITION p_future VALUES LESS THAN MAXVALUE)",
+    ]
@@ -0,0 +1,155 @@
+import hashlib
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app.db import migrations
+from app.db.migrations import run_migrations
+
+
+def index_names(conn, table):
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+@pytest.mark.asyncio
+async def test_missing_indexes_are_created(db_session):
+    """Indexes added to models are created on existing tables"""
+    conn = await db_session.connection()
+    await conn.execute(text("DROP INDEX ix_login_history_user_created"))
+    assert "ix_login_history_user_created" not in await conn.run_sync(index_names, "login_history")
+    
+    await conn.run_sync(run_migrations)
+    
+    assert "ix_login_history_user_created" in await conn.run_sync(index_names, "login_history")
+
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_migrated_to_digests(db_session, monkeypatch):
+    """Legacy plaintext refresh tokens are replaced by their SHA-256 digests"""
+    # Several backfill batches
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+    conn = await db_session.connection()
+    await conn.execute(text("DROP TABLE refresh_tokens"))
+    await conn.execute(text(
+        "CREATE TABLE refresh_tokens ("
+        "id INTEGER PRIMARY KEY, token VARCHAR(255) NOT NULL, user_id INTEGER NOT NULL, "
+        "device_info VARCHAR(255), ip_address VARCHAR(45), is_active BOOLEAN NOT NULL, "
+        "expires_at DATETIME NOT NULL, created_at DATETIME NOT NULL, last_used_at DATETIME)"
+    ))
+    await conn.execute(text("CREATE UNIQUE INDEX ix_refresh_tokens_token ON refresh_tokens (token)"))
+    await conn.execute(
+        text(
+            "INSERT INTO refresh_tokens (token, user_id, is_active, expires_at, created_at) "
+            "VALUES (:token, 1, 1, '2099-01-01 00:00:00', '2024-01-01 00:00:00')"
+        ),
+        [{"token": f"legacy-token-{i}"} for i in range(3)]
+    )
+    
+    await conn.run_sync(run_migrations)
+    
+    columns = await conn.run_sync(
+        lambda sync_conn: {column["name"]: column for column in inspect(sync_conn).get_columns("refresh_tokens")}
+    )
+    assert "token" not in columns
+    assert columns["token_hash"]["nullable"] is False
+    assert "ix_refresh_tokens_token_hash" in await conn.run_sync(index_names, "refresh_tokens")
+    
+    from app.services.refresh_token import refresh_token_service
+    for i in range(3):
+        stored = await refresh_token_service.get_refresh_token(db_session, f"legacy-token-{i}")
+        assert stored is not None
+        assert stored.token_hash == hashlib.sha256(f"legacy-token-{i}".encode()).hexdigest()
+    
+    foreign_keys = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_foreign_keys("refresh_tokens"))
+    assert [foreign_key["referred_table"] for foreign_key in foreign_keys] == ["users"]
+
+
+@pytest.mark.asyncio
+async def test_backup_codes_migrated_to_hashed_rows(db_session, test_user):
+    """Legacy encrypted backup code blobs become one hashed row per code"""
+    import json
+    from app.core.security import encrypt_data
+    from app.services.two_factor_auth import two_factor_auth_service
+    
+    user_id = test_user["user"]["id"]
+    conn = await db_session.connection()
+    await conn.execute(text("ALTER TABLE two_factor_auth ADD COLUMN backup_codes VARCHAR(1000)"))
+    await conn.execute(
+        text(
+            "INSERT INTO two_factor_auth (user_id, secret, backup_codes, is_enabled, created_at, updated_at) "
+            "VALUES (:user_id, :secret, :codes, 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+        ),
+        {
+            "user_id": user_id,
+            "secret": encrypt_data("JBSWY3DPEHPK3PXP"),
+            "codes": encrypt_data(json.dumps(["aaaaaa-111111", "bbbbbb-222222"]))
+        }
+    )
+    
+    await conn.run_sync(run_migrations)
+    
+    columns = await conn.run_sync(
+        lambda sync_conn: {column["name"] for column in inspect(sync_conn).get_columns("two_factor_auth")}
+    )
+    assert "backup_codes" not in columns
+    stored = (await conn.execute(text("SELECT code_hash FROM two_factor_backup_codes"))).scalars().all()
+    assert len(stored) == 2
+    assert "aaaaaa-111111" not in stored
+    
+    assert await two_factor_auth_service.verify_2fa(db_session, user_id, "aaaaaa-111111")
+    assert not await two_factor_auth_service.verify_2fa(db_session, user_id, "aaaaaa-111111")
+    assert await two_factor_auth_service.verify_2fa(db_session, user_id, "bbbbbb-222222")
+
+
+@pytest.mark.asyncio
+async def test_user_two_factor_flag_backfilled(db_session):
+    """users.two_factor_enabled is added and set for users with 2FA enabled"""
+    conn = await db_session.connection()
+    await conn.execute(text("ALTER TABLE users DROP COLUMN two_factor_enabled"))
+    await conn.execute(
+        text(
+            "INSERT INTO users (id, email, username, hashed_password, is_active, is_superuser, is_verified, created_at) "
+            "VALUES (:id, :email, :username, 'x', 1, 0, 0, '2024-01-01 00:00:00')"
+        ),
+        [{"id": i, "email": f"user{i}@example.com", "username": f"user{i}"} for i in (1, 2)]
+    )
+    await conn.execute(text(
+        "INSERT INTO two_factor_auth (user_id, secret, is_enabled, created_at, updated_at) "
+        "VALUES (1, 'secret', 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+    ))
+    
+    await conn.run_sync(run_migrations)
+    
+    rows = (await conn.execute(text("SELECT id, two_factor_enabled FROM users"))).all()
+    assert {row.id: bool(row.two_factor_enabled) for row in rows} == {1: True, 2: False}
+
+
+@pytest.mark.asyncio
+async def test_legacy_user_created_at_normalized(db_session):
+    """Second-precision created_at values are paged correctly after migrating"""
+    from app.services.user import get_users
+    
+    conn = await db_session.connection()
+    await conn.execute(
+        text(
+            "INSERT INTO users (id, email, username, hashed_password, is_active, is_superuser, is_verified, created_at) "
+            "VALUES (:id, :email, :username, 'x', 1, 0, 0, :created_at)"
+        ),
+        [
+            # Legacy CURRENT_TIMESTAMP format, then a client-side stamp within the same second
+            {"id": 1, "email": "a@example.com", "username": "a", "created_at": "2024-01-01 00:00:00"},
+            {"id": 2, "email": "b@example.com", "username": "b", "created_at": "2024-01-01 00:00:00.500000"},
+            {"id": 3, "email": "c@example.com", "username": "c", "created_at": "2024-01-01 00:00:00"},
+        ]
+    )
+    
+    await conn.run_sync(run_migrations)
+    
+    seen, cursor = [], None
+    while True:
+        page = await get_users(db_session, limit=1, cursor=cursor)
+        if not page:
+            break
+        seen.append(page[0].id)
+        cursor = (page[0].created_at, page[0].id)
+    assert seen == [1, 3, 2]
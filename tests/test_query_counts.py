@@ -0,0 +1,71 @@
+import pytest
+from httpx import AsyncClient
+
+from tests.conftest import StatementRecorder
+
+
+# Exact SQL statements issued per request. A change here means an endpoint
+# gained or lost a round trip; update the number deliberately.
+EXPECTED_STATEMENTS = {
+    "register": 3,
+    # Includes rebuilding the risk profile from login history once per worker
+    "login": 5,
+    "repeat_login": 4,
+    "refresh": 5,
+    "me": 1,
+    "update_me": 2,
+    "devices": 2,
+    "devices_cached": 1,
+    "login_history": 2,
+    "logout": 3,
+}
+
+
+async def _count(recorder_fn):
+    with StatementRecorder() as recorder:
+        response = await recorder_fn()
+    assert response.status_code == 200, response.text
+    return len(recorder.statements), response
+
+
+@pytest.mark.asyncio
+async def test_statements_per_endpoint(async_client: AsyncClient):
+    """Test the number of SQL statements issued by the main endpoints"""
+    counts = {}
+    
+    counts["register"], _ = await _count(lambda: async_client.post("/api/v1/auth/register", json={
+        "email": "counted@example.com",
+        "username": "counted",
+        "password": "password123"
+    }))
+    counts["login"], response = await _count(lambda: async_client.post("/api/v1/auth/login", json={
+        "email": "counted@example.com",
+        "password": "password123"
+    }))
+    # Same device and IP within DEVICE_TOUCH_INTERVAL: no device write
+    counts["repeat_login"], response = await _count(lambda: async_client.post("/api/v1/auth/login", json={
+        "email": "counted@example.com",
+        "password": "password123"
+    }))
+    tokens = response.json()
+    counts["refresh"], response = await _count(lambda: async_client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    ))
+    tokens = response.json()
+    
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    counts["me"], _ = await _count(lambda: async_client.get("/api/v1/users/me", headers=headers))
+    counts["update_me"], _ = await _count(lambda: async_client.put(
+        "/api/v1/users/me", json={"full_name": "Counted User"}, headers=headers
+    ))
+    counts["devices"], response = await _count(lambda: async_client.get("/api/v1/devices/devices", headers=headers))
+    # Served from the response cache: only the user lookup
+    counts["devices_cached"], _ = await _count(lambda: async_client.get("/api/v1/devices/devices", headers=headers))
+    counts["login_history"], _ = await _count(lambda: async_client.get(
+        "/api/v1/devices/login-history", headers=headers
+    ))
+    counts["logout"], _ = await _count(lambda: async_client.post(
+        "/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers
+    ))
+    
+    assert counts == EXPECTED_STATEMENTS
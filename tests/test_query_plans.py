@@ -0,0 +1,127 @@
+import pytest
+from datetime import datetime
+
+from app.services import user as user_service
+from app.services.refresh_token import refresh_token_service
+from app.services.password_reset import password_reset_service
+from app.services.device_management import device_management_service
+from app.services.email_verification import email_verification_service
+from tests.conftest import StatementRecorder
+
+
+async def explain(db, statement, parameters):
+    """Return the detail column of EXPLAIN QUERY PLAN for a statement"""
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row[3] for row in result]
+
+
+async def assert_indexed(db, recorder, table):
+    """Fail if any recorded statement on ``table`` falls back to a full scan"""
+    statements = [
+        (statement, parameters) for statement, parameters in recorder.statements
+        if f"FROM {table}" in statement
+    ]
+    assert statements, f"No statement against {table} was recorded"
+    
+    for statement, parameters in statements:
+        plan = await explain(db, statement, parameters)
+        assert not any(step.startswith(f"SCAN {table}") for step in plan), (
+            f"Full table scan on {table}:\n{statement}\n{plan}"
+        )
+        assert any(step.startswith(f"SEARCH {table}") for step in plan), (
+            f"No index used on {table}:\n{statement}\n{plan}"
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_user_by_email_plan(db_session):
+    with StatementRecorder() as recorder:
+        await user_service.get_user_by_email(db_session, "test@example.com")
+    await assert_indexed(db_session, recorder, "users")
+
+
+@pytest.mark.asyncio
+async def test_get_refresh_token_plan(db_session):
+    with StatementRecorder() as recorder:
+        await refresh_token_service.get_refresh_token(db_session, "token")
+    await assert_indexed(db_session, recorder, "refresh_tokens")
+
+
+@pytest.mark.asyncio
+async def test_get_user_active_tokens_plan(db_session):
+    with StatementRecorder() as recorder:
+        await refresh_token_service.get_user_active_tokens(db_session, 1)
+    await assert_indexed(db_session, recorder, "refresh_tokens")
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_refresh_tokens_plan(db_session):
+    with StatementRecorder() as recorder:
+        await refresh_token_service.cleanup_expired_tokens(db_session)
+    await assert_indexed(db_session, recorder, "refresh_tokens")
+
+
+@pytest.mark.asyncio
+async def test_cleanup_email_verifications_plan(db_session):
+    with StatementRecorder() as recorder:
+        await email_verification_service.cleanup_stale_verifications(db_session)
+    await assert_indexed(db_session, recorder, "email_verifications")
+
+
+@pytest.mark.asyncio
+async def test_cleanup_password_resets_plan(db_session):
+    with StatementRecorder() as recorder:
+        await password_reset_service.cleanup_expired_tokens(db_session)
+    await assert_indexed(db_session, recorder, "password_resets")
+
+
+@pytest.mark.asyncio
+async def test_get_device_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.get_device(db_session, 1, "device")
+    await assert_indexed(db_session, recorder, "user_devices")
+
+
+@pytest.mark.asyncio
+async def test_get_user_devices_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.get_user_devices(db_session, 1)
+    await assert_indexed(db_session, recorder, "user_devices")
+
+
+@pytest.mark.asyncio
+async def test_cleanup_inactive_devices_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.cleanup_inactive_devices(db_session)
+    await assert_indexed(db_session, recorder, "user_devices")
+
+
+@pytest.mark.asyncio
+async def test_get_login_history_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.get_login_history(db_session, 1)
+    await assert_indexed(db_session, recorder, "login_history")
+
+
+@pytest.mark.asyncio
+async def test_get_recent_failed_attempts_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.get_recent_failed_attempts(db_session, 1)
+    await assert_indexed(db_session, recorder, "login_history")
+
+
+@pytest.mark.asyncio
+async def test_get_login_history_cursor_plan(db_session):
+    with StatementRecorder() as recorder:
+        await device_management_service.get_login_history(
+            db_session, 1, cursor=(datetime.utcnow(), 100)
+        )
+    await assert_indexed(db_session, recorder, "login_history")
+
+
+@pytest.mark.asyncio
+async def test_get_users_cursor_plan(db_session):
+    with StatementRecorder() as recorder:
+        await user_service.get_users(db_session, cursor=(datetime.utcnow(), 100))
+    await assert_indexed(db_session, recorder, "users")
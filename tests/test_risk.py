@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+from app.models.user_device import UserDevice
+from app.schemas.user import UserCreate
+from app.services import user as user_service
+from app.services.device_management import device_management_service
+from app.services.risk import LoginProfile, risk_service
+from tests.conftest import StatementRecorder, TestingSessionLocal
+
+NOON = datetime(2026, 10, 19, 12, 0)
+
+
+def _profile(logins=5, device_id="known-device", ip_address="81.2.69.10", at=NOON):
+    profile = LoginProfile()
+    for _ in range(logins):
+        profile.observe(device_id, ip_address, at)
+    return profile
+
+
+@pytest.mark.asyncio
+async def test_known_login_scores_zero_without_queries():
+    """Test a familiar device, network and hour score zero from the cached profile"""
+    risk_service.profiles.set(1, _profile())
+    device = UserDevice(device_id="known-device", is_trusted=False)
+    
+    with StatementRecorder() as recorder:
+        risk = await risk_service.assess(None, 1, device, "81.2.69.200", at=NOON)
+    
+    assert (risk.score, risk.reasons) == (0, [])
+    assert recorder.statements == []
+
+
+@pytest.mark.asyncio
+async def test_new_device_and_network_require_2fa():
+    """Test an unfamiliar device on a new network at an odd hour crosses the 2FA threshold"""
+    risk_service.profiles.set(1, _profile())
+    
+    new_device = UserDevice(device_id="other", is_trusted=False)
+    risk = await risk_service.assess(None, 1, new_device, "203.0.113.5", at=NOON.replace(hour=3))
+    assert risk.reasons == ["new_device", "new_network", "unusual_hour"]
+    assert risk.requires_2fa and not risk.blocked
+    
+    # A trusted device is not new, and failed attempts add up
+    for _ in range(3):
+        risk_service.record_failure(1)
+    trusted_device = UserDevice(device_id="other", is_trusted=True)
+    risk = await risk_service.assess(None, 1, trusted_device, "203.0.113.5", at=NOON)
+    assert risk.reasons == ["new_network", "failed_attempts"]
+    assert risk.score == 45
+
+
+@pytest.mark.asyncio
+async def test_profile_is_rebuilt_from_login_history(db_session):
+    """Test a profile missing from the cache is loaded once from login history"""
+    user = await user_service.create_user(db_session, UserCreate(
+        email="risk@example.com", username="risk", password="password123"
+    ))
+    for status in ("success", "success", "success", "failed"):
+        await device_management_service.record_login_attempt(
+            db_session, user_id=user.id, ip_address="81.2.69.10", user_agent="test",
+            login_method="password", status=status, device_id="known-device"
+        )
+    
+    # One query on the first login this worker sees for the user, none after
+    with StatementRecorder() as recorder:
+        profile = await risk_service.get_profile(db_session, user.id)
+    assert len(recorder.statements) == 1
+    assert (profile.logins, profile.failures) == (3, 1)
+    assert list(profile.devices) == ["known-device"]
+    assert list(profile.networks) == ["81.2.69.0/24"]
+    
+    with StatementRecorder() as recorder:
+        assert await risk_service.get_profile(db_session, user.id) is profile
+    assert recorder.statements == []
+
+
+@pytest.mark.asyncio
+async def test_high_risk_login_is_blocked(async_client: AsyncClient, test_user, monkeypatch):
+    """Test a login scoring above the block threshold is refused and recorded"""
+    monkeypatch.setattr(settings, "RISK_BLOCK_THRESHOLD", 50)
+    user_id = test_user["user"]["id"]
+    risk_service.profiles.set(user_id, _profile(ip_address="203.0.113.5"))
+    
+    response = await async_client.post("/api/v1/auth/login", json={
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    })
+    assert response.status_code == 403
+    
+    async with TestingSessionLocal() as db:
+        history = await device_management_service.get_login_history(db, user_id)
+    assert [(record.status, record.failure_reason) for record in history] == [("blocked", "high_risk")]
+
+
+@pytest.mark.asyncio
+async def test_risky_login_without_2fa_is_not_challenged(async_client: AsyncClient, test_user):
+    """Test a user without 2FA logging in from a new device and network still gets tokens"""
+    user_id = test_user["user"]["id"]
+    risk_service.profiles.set(user_id, _profile(ip_address="203.0.113.5"))
+    
+    response = await async_client.post("/api/v1/auth/login", json={
+        "email": test_user["user"]["email"],
+        "password": test_user["password"]
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert "refresh_token" in data
+    assert "requires_2fa" not in data
+    
+    async with TestingSessionLocal() as db:
+        history = await device_management_service.get_login_history(db, user_id)
+    assert [record.status for record in history] == ["success"]
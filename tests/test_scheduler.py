@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.models.job_lease import JobLease
+from app.tasks.scheduler import JobScheduler
+from tests.conftest import TestingSessionLocal
+
+
+def _scheduler(calls, result=3, interval=3600):
+    scheduler = JobScheduler()
+    
+    async def job(session_maker):
+        calls.append(session_maker)
+        return result
+    
+    scheduler.register("sweep", job, interval=interval)
+    return scheduler
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_runs_each_interval(db_session):
+    """Test the lease lets a single scheduler run a job per interval"""
+    calls = []
+    first, second = _scheduler(calls), _scheduler(calls)
+    second.holder = "other-host:1"
+    
+    assert await first.run_job("sweep", session_maker=TestingSessionLocal)
+    assert not await second.run_job("sweep", session_maker=TestingSessionLocal)
+    assert not await first.run_job("sweep", session_maker=TestingSessionLocal)
+    
+    assert len(calls) == 1
+    assert second.metrics["sweep"].skipped == 1
+    lease = await db_session.scalar(select(JobLease).where(JobLease.name == "sweep"))
+    assert lease.holder.startswith(first.holder)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_can_be_claimed(db_session):
+    """Test another worker takes over once the lease has expired"""
+    calls = []
+    first, second = _scheduler(calls, interval=0), _scheduler(calls, interval=0)
+    second.holder = "other-host:1"
+    
+    assert await first.run_job("sweep", session_maker=TestingSessionLocal)
+    assert await second.run_job("sweep", session_maker=TestingSessionLocal)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_force_bypasses_lease_and_metrics_recorded(db_session):
+    """Test forced runs skip the lease and metrics capture rows and failures"""
+    calls = []
+    scheduler = _scheduler(calls, result={"a": 2, "b": 5})
+    
+    assert await scheduler.run_job("sweep", session_maker=TestingSessionLocal)
+    assert await scheduler.run_job("sweep", force=True, session_maker=TestingSessionLocal)
+    
+    metrics = scheduler.metrics["sweep"]
+    assert metrics.runs == 2
+    assert metrics.last_rows == 7
+    assert metrics.rows == 14
+    
+    async def broken(session_maker):
+        raise RuntimeError("boom")
+    
+    scheduler.register("broken", broken, interval=60)
+    assert await scheduler.run_job("broken", session_maker=TestingSessionLocal)
+    assert scheduler.metrics["broken"].failures == 1
+    assert scheduler.metrics["broken"].last_error == "boom"
+
+
+@pytest.mark.asyncio
+async def test_start_and_stop(db_session):
+    """Test the loop runs due jobs and stops cleanly"""
+    calls = []
+    scheduler = _scheduler(calls)
+    
+    await scheduler.start(TestingSessionLocal)
+    for _ in range(50):
+        if calls:
+            break
+        await asyncio.sleep(0.01)
+    await scheduler.stop()
+    
+    assert len(calls) == 1
+    assert not scheduler.is_running
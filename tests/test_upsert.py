@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.core.security import decrypt_data
+from app.db.upsert import upsert
+from app.models.two_factor_auth import TwoFactorAuth
+from app.models.user_device import UserDevice
+from app.schemas.user import UserCreate
+from app.services import user as user_service
+from app.services.device_management import device_management_service
+from app.services.email_verification import email_verification_service
+from app.services.two_factor_auth import two_factor_auth_service
+from tests.conftest import StatementRecorder
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0"
+
+
+async def _create_user(db):
+    return await user_service.create_user(db, UserCreate(
+        email="upsert@example.com", username="upsert", password="password123"
+    ))
+
+
+@pytest.mark.asyncio
+async def test_upsert_inserts_then_updates(db_session):
+    """Test the helper inserts a new row and updates it in place on conflict"""
+    user = await _create_user(db_session)
+    values = {
+        "user_id": user.id,
+        "device_id": "device-1",
+        "device_name": "Chrome on Windows",
+        "device_type": "desktop",
+        "ip_address": "10.0.0.1"
+    }
+    
+    first = await upsert(db_session, UserDevice, values, ["user_id", "device_id"], {"ip_address": "10.0.0.1"})
+    second = await upsert(db_session, UserDevice, values, ["user_id", "device_id"], {"ip_address": "10.0.0.2"})
+    
+    assert first is second
+    assert second.ip_address == "10.0.0.2"
+    count = await db_session.scalar(select(func.count()).select_from(UserDevice))
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_register_device_single_statement(db_session):
+    """Test device registration is one statement for new and known devices"""
+    user = await _create_user(db_session)
+    
+    for ip_address in ("10.0.0.1", "10.0.0.2"):
+        with StatementRecorder() as recorder:
+            device = await device_management_service.register_device(db_session, user.id, USER_AGENT, ip_address)
+        statements = [statement for statement, _ in recorder.statements]
+        assert len(statements) == 1
+        assert "ON CONFLICT" in statements[0]
+    
+    assert device.ip_address == "10.0.0.2"
+    assert device.is_trusted is False
+
+
+@pytest.mark.asyncio
+async def test_create_verification_token_replaces_token(db_session):
+    """Test re-issuing a verification token keeps a single row with the new token"""
+    user = await _create_user(db_session)
+    
+    first = await email_verification_service.create_verification_token(db_session, user.id)
+    first_token = first.token
+    second = await email_verification_service.create_verification_token(db_session, user.id)
+    
+    assert second.id == first.id
+    assert second.token != first_token
+
+
+@pytest.mark.asyncio
+async def test_setup_2fa_keeps_enabled_record(db_session):
+    """Test setup resets a pending 2FA record but refuses to touch an enabled one"""
+    user = await _create_user(db_session)
+    
+    first_secret, _, _ = await two_factor_auth_service.setup_2fa(db_session, user.id)
+    second_secret, _, _ = await two_factor_auth_service.setup_2fa(db_session, user.id)
+    assert first_secret != second_secret
+    
+    two_fa = await two_factor_auth_service.get_2fa_by_user_id(db_session, user.id)
+    assert decrypt_data(two_fa.secret) == second_secret
+    two_fa.is_enabled = True
+    await db_session.commit()
+    
+    with pytest.raises(ValueError):
+        await two_factor_auth_service.setup_2fa(db_session, user.id)
+    
+    two_fa = await two_factor_auth_service.get_2fa_by_user_id(db_session, user.id)
+    assert two_fa.is_enabled
+    assert decrypt_data(two_fa.secret) == second_secret
+    count = await db_session.scalar(select(func.count()).select_from(TwoFactorAuth))
+    assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_portable_upsert_fallback(db_session):
+    """Test the UPDATE-then-INSERT path used on backends without a native upsert"""
+    from app.db.upsert import _update_or_insert
+    
+    user = await _create_user(db_session)
+    values = {
+        "user_id": user.id,
+        "device_id": "device-1",
+        "device_name": "Chrome on Windows",
+        "device_type": "desktop",
+        "ip_address": "10.0.0.1"
+    }
+    key = ["user_id", "device_id"]
+    
+    await _update_or_insert(db_session, UserDevice, values, key, {"ip_address": "10.0.0.1"})
+    await _update_or_insert(db_session, UserDevice, values, key, {"ip_address": "10.0.0.2"})
+    # Rejected by ``where``: the insert collides and the row is left as is
+    await _update_or_insert(
+        db_session, UserDevice, values, key, {"ip_address": "10.0.0.3"},
+        where=UserDevice.is_trusted.is_(True)
+    )
+    
+    devices = (await db_session.scalars(select(UserDevice))).all()
+    assert [device.ip_address for device in devices] == ["10.0.0.2"]
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.security import get_password_hash, verify_password
+from app.models.user import User
+from app.services.user_import import UserImporter
+from tests.conftest import StatementRecorder, TestingSessionLocal
+
+HASHED = get_password_hash("imported-password")
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+@pytest.mark.asyncio
+async def test_import_batches_and_skips_duplicates(db_session, tmp_path):
+    """Test rows are inserted with one statement per batch and duplicates are skipped"""
+    source = tmp_path / "users.jsonl"
+    records = [
+        {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": HASHED}
+        for i in range(10)
+    ]
+    records.append({"email": "user3@example.com", "username": "other", "hashed_password": HASHED})
+    records.append({"email": "not-an-email", "username": "bad", "hashed_password": HASHED})
+    _write_jsonl(source, records)
+
+    importer = UserImporter(session_maker=TestingSessionLocal, batch_size=4, workers=0)
+    with StatementRecorder() as recorder:
+        stats = await importer.run(str(source))
+
+    assert (stats.processed, stats.inserted, stats.duplicates, stats.invalid) == (12, 10, 1, 1)
+    inserts = [statement for statement, _ in recorder.statements if statement.startswith("INSERT")]
+    assert len(inserts) == 3
+    assert await db_session.scalar(select(func.count()).select_from(User)) == 10
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_from_checkpoint(db_session, tmp_path):
+    """Test a rerun with the same checkpoint only processes the remaining records"""
+    source = tmp_path / "users.csv"
+    lines = ["email,username,hashed_password,is_verified"]
+    lines += [f"user{i}@example.com,user{i},{HASHED},yes" for i in range(6)]
+    source.write_text("\n".join(lines) + "\n")
+    checkpoint = tmp_path / "import.ckpt"
+    checkpoint.write_text(json.dumps({"source": str(source), "processed": 4, "inserted": 4}))
+
+    importer = UserImporter(
+        session_maker=TestingSessionLocal, batch_size=10, workers=0, checkpoint_path=str(checkpoint)
+    )
+    stats = await importer.run(str(source))
+
+    assert (stats.processed, stats.inserted) == (6, 6)
+    assert json.loads(checkpoint.read_text())["processed"] == 6
+    usernames = (await db_session.scalars(select(User.username).order_by(User.username))).all()
+    assert usernames == ["user4", "user5"]
+    user = await db_session.scalar(select(User).where(User.username == "user4"))
+    assert user.is_verified is True
+
+
+@pytest.mark.asyncio
+async def test_import_hashes_plaintext_passwords_in_worker_processes(db_session, tmp_path):
+    """Test plaintext passwords are hashed by the process pool"""
+    source = tmp_path / "users.jsonl"
+    _write_jsonl(source, [
+        {"email": f"plain{i}@example.com", "username": f"plain{i}", "password": f"secret-{i}"}
+        for i in range(3)
+    ])
+
+    stats = await UserImporter(session_maker=TestingSessionLocal, workers=2).run(str(source))
+
+    assert (stats.inserted, stats.hashed) == (3, 3)
+    user = await db_session.scalar(select(User).where(User.username == "plain1"))
+    assert verify_password("secret-1", user.hashed_password)
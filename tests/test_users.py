@@ -1,3 +1,6 @@
+import csv
+import gzip
+import json
 import pytest
 from httpx import AsyncClient
 import io
@@ -82,6 +85,30 @@ async def test_list_users_admin(async_client: AsyncClient, admin_user):
     assert len(users) >= 1
 
 
+@pytest.mark.asyncio
+async def test_list_users_cursor_pagination(async_client: AsyncClient, admin_user, test_user):
+    """Test listing users page by page with X-Next-Cursor"""
+    login_response = await async_client.post("/api/v1/auth/login", json={
+        "email": admin_user["user"].email,
+        "password": admin_user["password"]
+    })
+    token = login_response.json()["access_token"]
+    async_client.headers = {"Authorization": f"Bearer {token}"}
+    
+    response = await async_client.get("/api/v1/users/", params={"limit": 1})
+    assert response.status_code == 200
+    first_page = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+    
+    response = await async_client.get("/api/v1/users/", params={"limit": 1, "cursor": cursor})
+    assert response.status_code == 200
+    second_page = response.json()
+    assert "X-Next-Cursor" not in response.headers
+    
+    assert len(first_page) == len(second_page) == 1
+    assert first_page[0]["id"] != second_page[0]["id"]
+
+
 @pytest.mark.asyncio
 async def test_get_user_by_id_admin(async_client: AsyncClient, admin_user, test_user):
     """Test get specific user by admin"""
@@ -105,6 +132,52 @@ async def test_get_user_by_id_admin(async_client: AsyncClient, admin_user, test_
     assert data["email"] == test_user["user"]["email"]
 
 
+@pytest.mark.asyncio
+async def test_export_users_ndjson(async_client: AsyncClient, admin_user, test_user):
+    """Test exporting users as NDJSON without password hashes"""
+    login_response = await async_client.post("/api/v1/auth/login", json={
+        "email": admin_user["user"].email,
+        "password": admin_user["password"]
+    })
+    token = login_response.json()["access_token"]
+    async_client.headers = {"Authorization": f"Bearer {token}"}
+    
+    response = await async_client.get("/api/v1/users/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["email"] for user in users] == [admin_user["user"].email, test_user["user"]["email"]]
+    assert "hashed_password" not in users[0]
+
+
+@pytest.mark.asyncio
+async def test_export_users_csv_gzip_filtered(async_client: AsyncClient, admin_user, test_user):
+    """Test a filtered, gzip-compressed CSV export"""
+    login_response = await async_client.post("/api/v1/auth/login", json={
+        "email": admin_user["user"].email,
+        "password": admin_user["password"]
+    })
+    token = login_response.json()["access_token"]
+    async_client.headers = {"Authorization": f"Bearer {token}"}
+    
+    response = await async_client.get(
+        "/api/v1/users/export", params={"format": "csv", "gzip": True, "is_superuser": False}
+    )
+    assert response.status_code == 200
+    assert 'filename="users.csv.gz"' in response.headers["content-disposition"]
+    
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert [row["username"] for row in rows] == [test_user["user"]["username"]]
+
+
+@pytest.mark.asyncio
+async def test_export_users_requires_superuser(authenticated_client: AsyncClient):
+    """Test regular users cannot export"""
+    response = await authenticated_client.get("/api/v1/users/export")
+    assert response.status_code == 403
+
+
 @pytest.mark.asyncio
 async def test_upload_avatar(authenticated_client: AsyncClient):
     """Test avatar upload"""